@@ -13,25 +13,17 @@ exec > >(tee -a results/RUNME.log) 2>&1
 
 OUT_DIR="data"
 GEO_ID="GSE198250"
-ENA_BROWSER_TOOLS_DIR="code/enaBrowserTools"
-
-# Check if enaBrowserTools directory exists, if not exit with an error message
-if [ ! -d "$ENA_BROWSER_TOOLS_DIR" ]; then
-    echo "The code/enaBrowserTools directory does not exist. Please clone the repository to code/ before running this script."
-    exit 1
-fi
+CONCURRENCY=8
 
 mkdir -p "$OUT_DIR"
 
-# Run Python script to get list of SRX IDs
+# Run Python script to get list of SRX IDs (read from the metadata snapshot data/GSE198250_samples.tsv after the first run)
 echo "Fetching SRX IDs for GEO ID: $GEO_ID"
 SRX_LIST=$(python3 code/getSRX_geoparse.py --geo_id "$GEO_ID" --dest_dir "$OUT_DIR")
 
-# Download FASTQ files for each SRX ID
-for SRX in $SRX_LIST; do
-    echo "Downloading $SRX"
-    python $ENA_BROWSER_TOOLS_DIR/python3/enaDataGet.py -f fastq -d "$OUT_DIR" "$SRX"
-done
+# Download FASTQ files for all SRX IDs, $CONCURRENCY files at a time, resuming partial downloads and verifying checksums
+echo "Downloading $SRX_LIST"
+python3 code/download_samples.py --srx_ids $SRX_LIST --dest_dir "$OUT_DIR" --concurrency "$CONCURRENCY"
 
 # Print completion message with timestamp
 echo
@@ -0,0 +1,163 @@
+"""
+Downloads the FASTQ files of SRA experiments (SRX) from ENA, with several files downloaded concurrently by a pool of threads.
+
+The FASTQ files of each experiment (their URLs, MD5 checksums and sizes) are listed from the ENA Portal API, and saved to a manifest (TSV),
+from which they are read on later runs. Each file is downloaded to <FILE>.part, resumed with an HTTP range request from the end of a partial
+download left by an interrupted run, and renamed to its final name only once its size and MD5 checksum are verified; files already downloaded
+are skipped. Failed downloads are retried, resuming from where they stopped (or from the start after a checksum mismatch).
+
+The files are written with the structure of enaBrowserTools (enaDataGet.py):
+    <DEST_DIR>/<SRX>/<SRR>/<FILE>.fastq.gz
+
+Usage:
+    python download_samples.py --srx_ids <SRX> [<SRX>...] --dest_dir <DEST_DIR> [--manifest <MANIFEST_TSV>] [--concurrency <N>] [--retries <N>] [--portal_url <URL>]
+
+Arguments:
+    --srx_ids       SRX IDs of the experiments to download (e.g. the output of getSRX_geoparse.py)
+    --dest_dir      Directory for the downloaded files
+    --manifest      Manifest of the files to download (default: <DEST_DIR>/download_manifest.tsv)
+    --concurrency   Maximum number of files downloaded at the same time (default: 4)
+    --retries       Number of retries of a failed download (default: 3)
+    --portal_url    ENA Portal API file report endpoint (default: https://www.ebi.ac.uk/ena/portal/api/filereport)
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import hashlib
+import io
+import os
+import urllib.parse
+import urllib.request
+
+PORTAL_URL = "https://www.ebi.ac.uk/ena/portal/api/filereport"
+MANIFEST_COLUMNS = ['srx', 'srr', 'url', 'md5', 'bytes']
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT = 60
+
+# List the FASTQ files of an experiment from the ENA Portal API, with their URLs, MD5 checksums and sizes
+def list_files(srx, portal_url=PORTAL_URL):
+    query = urllib.parse.urlencode({'accession': srx, 'result': 'read_run', 'fields': 'run_accession,fastq_ftp,fastq_md5,fastq_bytes', 'format': 'tsv'})
+    with urllib.request.urlopen(f"{portal_url}?{query}", timeout=TIMEOUT) as response:
+        report = response.read().decode()
+
+    files = []
+    for run in csv.DictReader(io.StringIO(report), delimiter='\t'):
+        # Runs with several files (e.g. paired-end) list them separated by ';'
+        for url, md5, size in zip(run['fastq_ftp'].split(';'), run['fastq_md5'].split(';'), run['fastq_bytes'].split(';')):
+            if not url:
+                continue
+            # ENA FTP paths are also served over HTTPS
+            url = url if '://' in url else f"https://{url}"
+            files.append({'srx': srx, 'srr': run['run_accession'], 'url': url, 'md5': md5, 'bytes': int(size)})
+    if not files:
+        raise ValueError(f"No FASTQ files found for {srx}")
+    return files
+
+# Write the files to download to the manifest, through a temporary file so that an interrupted run leaves no partial manifest
+def write_manifest(manifest_file, files):
+    with open(manifest_file + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS, delimiter='\t', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(files)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+def read_manifest(manifest_file):
+    with open(manifest_file, newline='') as f:
+        return [dict(entry, bytes=int(entry['bytes'])) for entry in csv.DictReader(f, delimiter='\t')]
+
+# Get the files to download for the experiments, from the manifest, listing from ENA (and adding to the manifest) the experiments not in it
+def get_files(srx_ids, manifest_file, portal_url=PORTAL_URL):
+    files = read_manifest(manifest_file) if os.path.exists(manifest_file) else []
+    listed = {entry['srx'] for entry in files}
+    missing = [srx for srx in srx_ids if srx not in listed]
+    if missing:
+        for srx in missing:
+            print(f"Listing files of {srx}")
+            files.extend(list_files(srx, portal_url))
+        write_manifest(manifest_file, files)
+    return [entry for entry in files if entry['srx'] in srx_ids]
+
+def get_file_path(dest_dir, entry):
+    return os.path.join(dest_dir, entry['srx'], entry['srr'], os.path.basename(urllib.parse.urlparse(entry['url']).path))
+
+# Get the MD5 hash of the partial download of a file, to be updated with the rest of the file
+def hash_part(part_file):
+    md5 = hashlib.md5()
+    with open(part_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5
+
+# Download a file to <FILE>.part, resuming a partial download with a range request, and rename it once its size and checksum are verified
+def download_file(entry, dest_dir):
+    path = get_file_path(dest_dir, entry)
+    if os.path.exists(path):
+        return path, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_file = path + '.part'
+    offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+
+    if offset < entry['bytes']:
+        request = urllib.request.Request(entry['url'], headers={'Range': f"bytes={offset}-"} if offset else {})
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            # A server not supporting range requests sends the whole file (200 instead of 206): the download starts again
+            if offset and response.status != 206:
+                offset = 0
+            md5 = hash_part(part_file) if offset else hashlib.md5()
+            with open(part_file, 'ab' if offset else 'wb') as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    f.write(chunk)
+                    md5.update(chunk)
+    else:
+        md5 = hash_part(part_file)
+
+    size = os.path.getsize(part_file)
+    if size != entry['bytes'] or md5.hexdigest() != entry['md5']:
+        # A complete file with the wrong checksum cannot be resumed, while a short one (e.g. a dropped connection) can
+        if size >= entry['bytes']:
+            os.remove(part_file)
+        raise ValueError(f"Verification failed for {entry['url']}: {size} of {entry['bytes']} bytes, MD5 {md5.hexdigest()} (expected {entry['md5']})")
+    os.replace(part_file, path)
+    return path, True
+
+# Download a file, retrying failed downloads
+def download_with_retries(entry, dest_dir, retries):
+    for attempt in range(retries + 1):
+        try:
+            path, downloaded = download_file(entry, dest_dir)
+            print(f"{'Downloaded' if downloaded else 'Skipping (already downloaded)'} {path}")
+            return path
+        except (OSError, ValueError) as error:
+            print(f"Attempt {attempt + 1} of {retries + 1} failed for {entry['url']}: {error}")
+            if attempt == retries:
+                raise
+
+# Download all files in a pool of concurrency threads (the downloads wait on the network, which releases the GIL), and get the files that failed
+def download_all(files, dest_dir, concurrency, retries):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(download_with_retries, entry, dest_dir, retries) for entry in files]
+    return [entry for entry, future in zip(files, futures) if future.exception() is not None]
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the FASTQ files of SRA experiments from ENA concurrently, with resume and checksum verification.")
+    parser.add_argument('--srx_ids', nargs='+', required=True, help="SRX IDs of the experiments to download")
+    parser.add_argument('--dest_dir', required=True, help="Directory for the downloaded files")
+    parser.add_argument('--manifest', default=None, help="Manifest of the files to download (default: <dest_dir>/download_manifest.tsv)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Maximum number of files downloaded at the same time (default: 4)")
+    parser.add_argument('--retries', type=int, default=3, help="Number of retries of a failed download (default: 3)")
+    parser.add_argument('--portal_url', default=PORTAL_URL, help="ENA Portal API file report endpoint")
+    args = parser.parse_args()
+
+    os.makedirs(args.dest_dir, exist_ok=True)
+    manifest_file = args.manifest or os.path.join(args.dest_dir, 'download_manifest.tsv')
+    files = get_files(args.srx_ids, manifest_file, args.portal_url)
+
+    print(f"Downloading {len(files)} files of {len(args.srx_ids)} experiments, {args.concurrency} at a time")
+    failed = download_all(files, args.dest_dir, args.concurrency, args.retries)
+    if failed:
+        raise SystemExit(f"Failed to download {len(failed)} files: {', '.join(entry['url'] for entry in failed)}")
+    print(f"All {len(files)} files downloaded to {args.dest_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
 """
 Extracts SRX IDs for ChimeCLIP experiments (excluding mouse, enrichment, and over-expression) from a GEO Series using GEOparse.
 
+The selected samples (GSM, title and SRX) are saved to a metadata snapshot (TSV), from which the SRX IDs are read on later runs instead of
+fetching and parsing the GEO Series again. Remove the snapshot, or use --refresh, to fetch the GEO Series again.
+
 Usage:
-    python getSRX_geoparse.py --geo_id <GSE_ID> --dest_dir <DEST_DIR>
+    python getSRX_geoparse.py --geo_id <GSE_ID> --dest_dir <DEST_DIR> [--snapshot <SNAPSHOT_TSV>] [--refresh]
 
 Arguments:
     --geo_id     GEO Series accession ID (e.g. GSE198250)
     --dest_dir   Directory for GEOparse cache/files
+    --snapshot   Metadata snapshot of the selected samples (default: <DEST_DIR>/<GSE_ID>_samples.tsv)
+    --refresh    Fetch the GEO Series again, and overwrite the snapshot
 """
 
 import argparse
+import csv
+import os
 import GEOparse
 
-def generate_srx_list(geo_series, dest_directory):
+SNAPSHOT_COLUMNS = ['gsm', 'title', 'srx']
+
+def get_samples(geo_series, dest_directory):
     gse = GEOparse.get_GEO(geo=geo_series, destdir=dest_directory)
-    srx_list = []
+    samples = []
     substrings_to_exclude = ["MusLiver", "C9", "Enriched", "oe"] # excluding experiments involving mouse tissue/cells and enrichment/over-expression
 
     for gsm_name, gsm in gse.gsms.items():
@@ -23,17 +32,41 @@ def generate_srx_list(geo_series, dest_directory):
             # Extract SRX from the SRA link
             sra_link = gsm.metadata['relation'][1] # the second relation is the SRA link
             srx = sra_link.split('=')[-1] # the SRX is the last part of the URL following '='
-            srx_list.append(srx)
+            samples.append({'gsm': gsm_name, 'title': title, 'srx': srx})
+
+    return samples
+
+# Write the selected samples to the metadata snapshot, through a temporary file so that an interrupted run leaves no partial snapshot
+def write_snapshot(snapshot_file, samples):
+    with open(snapshot_file + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SNAPSHOT_COLUMNS, delimiter='\t', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(samples)
+    os.replace(snapshot_file + '.tmp', snapshot_file)
+
+def read_snapshot(snapshot_file):
+    with open(snapshot_file, newline='') as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+def generate_srx_list(geo_series, dest_directory, snapshot_file=None, refresh=False):
+    snapshot_file = snapshot_file or os.path.join(dest_directory, f"{geo_series}_samples.tsv")
+    if os.path.exists(snapshot_file) and not refresh:
+        samples = read_snapshot(snapshot_file)
+    else:
+        samples = get_samples(geo_series, dest_directory)
+        write_snapshot(snapshot_file, samples)
 
-    return " ".join(srx_list)
+    return " ".join(sample['srx'] for sample in samples)
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--geo_id", required=True, help="GEO accession ID (e.g., GSE198250)")
     parser.add_argument("--dest_dir", required=True, help="Destination directory for GEOparse cache/files")
+    parser.add_argument("--snapshot", default=None, help="Metadata snapshot of the selected samples (default: <dest_dir>/<geo_id>_samples.tsv)")
+    parser.add_argument("--refresh", action='store_true', help="Fetch the GEO Series again, and overwrite the snapshot")
 
     args = parser.parse_args()
-    print(generate_srx_list(args.geo_id, args.dest_dir))
+    print(generate_srx_list(args.geo_id, args.dest_dir, args.snapshot, args.refresh))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
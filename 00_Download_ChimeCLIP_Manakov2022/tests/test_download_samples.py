@@ -0,0 +1,118 @@
+"""
+Checks the downloads of download_samples.py against a local HTTP server (http.server) that serves FASTQ files with range requests, and a
+file report in the format of the ENA Portal API (given by --portal_url): the resume of a partial download from its end, the rejection of a
+file with the wrong MD5 checksum, and a whole run from the file report to the verified files.
+
+Usage:
+    python -m pytest tests/test_download_samples.py
+"""
+
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import sys
+import threading
+import pytest
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+sys.path.insert(0, CODE_DIR)
+
+from download_samples import download_file, download_all, read_manifest, main
+
+# Contents of the served files, by path
+FILES = {
+    '/fastq/SRR001/SRR001.fastq.gz': bytes(range(256)) * 300,
+    '/fastq/SRR002/SRR002_1.fastq.gz': b'@read\nACGT\n+\nFFFF\n' * 1000,
+    '/fastq/SRR002/SRR002_2.fastq.gz': b'@read\nTGCA\n+\nFFFF\n' * 1000,
+}
+
+# Serve the files, whole (200) or from the start of a range request (206), corrupted if the server is told so, and the file report of an
+# experiment at /filereport; the range headers of the requests are recorded
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.ranges.append(self.headers.get('Range'))
+        if self.path.startswith('/filereport'):
+            self.send_body(200, self.server.report.encode())
+            return
+        if self.path not in FILES:
+            self.send_error(404)
+            return
+        data = FILES[self.path]
+        if self.server.corrupt:
+            data = data[:-1] + bytes([data[-1] ^ 1])
+        offset = int(self.headers['Range'][len('bytes='):-1]) if self.headers.get('Range') else 0
+        self.send_body(206 if offset else 200, data[offset:])
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.ranges, httpd.corrupt = [], False
+    base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.report = '\t'.join(['run_accession', 'fastq_ftp', 'fastq_md5', 'fastq_bytes']) + '\n' + ''.join(
+        f"{srr}\t{';'.join(base_url + path for path in paths)}\t{';'.join(hashlib.md5(FILES[path]).hexdigest() for path in paths)}\t"
+        f"{';'.join(str(len(FILES[path])) for path in paths)}\n"
+        for srr, paths in [('SRR001', ['/fastq/SRR001/SRR001.fastq.gz']), ('SRR002', ['/fastq/SRR002/SRR002_1.fastq.gz', '/fastq/SRR002/SRR002_2.fastq.gz'])])
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, base_url
+    httpd.shutdown()
+    httpd.server_close()
+
+# Get the manifest entry of a served file
+def get_entry(base_url, path):
+    return {'srx': 'SRX001', 'srr': 'SRR001', 'url': base_url + path, 'md5': hashlib.md5(FILES[path]).hexdigest(), 'bytes': len(FILES[path])}
+
+def test_resume_partial_download(server, tmp_path):
+    httpd, base_url = server
+    path = '/fastq/SRR001/SRR001.fastq.gz'
+    entry = get_entry(base_url, path)
+    file_path = tmp_path / 'SRX001' / 'SRR001' / 'SRR001.fastq.gz'
+    os.makedirs(file_path.parent)
+    (tmp_path / 'SRX001' / 'SRR001' / 'SRR001.fastq.gz.part').write_bytes(FILES[path][:10000])
+
+    assert download_file(entry, str(tmp_path)) == (str(file_path), True)
+    assert httpd.ranges == ['bytes=10000-']
+    assert file_path.read_bytes() == FILES[path]
+    assert not os.path.exists(str(file_path) + '.part')
+
+    # A downloaded file is skipped
+    assert download_file(entry, str(tmp_path)) == (str(file_path), False)
+    assert len(httpd.ranges) == 1
+
+def test_reject_corrupted_file(server, tmp_path):
+    httpd, base_url = server
+    httpd.corrupt = True
+    entry = get_entry(base_url, '/fastq/SRR001/SRR001.fastq.gz')
+    file_path = tmp_path / 'SRX001' / 'SRR001' / 'SRR001.fastq.gz'
+
+    with pytest.raises(ValueError, match='Verification failed'):
+        download_file(entry, str(tmp_path))
+    # The complete but corrupted download is removed, so that a retry starts again from the start
+    assert not os.path.exists(file_path)
+    assert not os.path.exists(str(file_path) + '.part')
+
+    # Every retry is rejected, and the file is reported as failed
+    assert download_all([entry], str(tmp_path), concurrency=2, retries=2) == [entry]
+    assert httpd.ranges == [None] * 4
+    assert not os.path.exists(file_path)
+
+def test_download_from_file_report(server, tmp_path, monkeypatch):
+    httpd, base_url = server
+    dest_dir = tmp_path / 'data'
+    monkeypatch.setattr(sys, 'argv', ['download_samples.py', '--srx_ids', 'SRX001', '--dest_dir', str(dest_dir), '--concurrency', '2',
+                                      '--portal_url', f"{base_url}/filereport"])
+    main()
+
+    for path in FILES:
+        srr = path.split('/')[2]
+        assert (dest_dir / 'SRX001' / srr / os.path.basename(path)).read_bytes() == FILES[path]
+    assert [entry['url'] for entry in read_manifest(str(dest_dir / 'download_manifest.tsv'))] == [base_url + path for path in FILES]
@@ -3,11 +3,10 @@
 #SBATCH --account=ssamm10 
 #SBATCH --job-name=pp_raw_chimeCLIP
 #SBATCH --ntasks=1
-#SBATCH --cpus-per-task=30
-#SBATCH --array=1-20%5
+#SBATCH --cpus-per-task=40
 #SBATCH --nice=500
-#SBATCH --output=pp_%A_%a.out
-#SBATCH --error=pp_%A_%a.err
+#SBATCH --output=pp_%j.out
+#SBATCH --error=pp_%j.err
 
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
@@ -15,6 +14,8 @@ trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 IN_DIR="data/"
 OUT_DIR="results/"
 RAW_FILE_LIST="$OUT_DIR/raw_chimeCLIP_file_list.txt"
+# Number of cores of each sample pipeline; as many samples as fit in the cores of the job are processed at the same time
+CORES_PER_SAMPLE=8
 
 if [[ ! -f "$RAW_FILE_LIST" ]]; then
     echo "Generating file list of raw chimeric eCLIP FASTQ files..."
@@ -22,12 +23,14 @@ if [[ ! -f "$RAW_FILE_LIST" ]]; then
     echo "File list generated: $RAW_FILE_LIST"
 fi
 
-# Read FASTQ filename from the list based on the SLURM array job index
-RAW_FILE_NAME=$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$RAW_FILE_LIST")
-RAW_FILE="$IN_DIR/$RAW_FILE_NAME"
-BASE_NAME=$(basename "$RAW_FILE" .fastq.gz)
+# Read FASTQ filenames from the list
+RAW_FILES=()
+while read -r RAW_FILE_NAME; do
+    RAW_FILES+=("$IN_DIR/$RAW_FILE_NAME")
+done < "$RAW_FILE_LIST"
 
-# Create required directories
-mkdir -p "$OUT_DIR/$BASE_NAME/temp" "$OUT_DIR/$BASE_NAME/logs"
-
-bash code/preprocess_raw_chimeCLIP.sh -i "$RAW_FILE" -o "$OUT_DIR"
\ No newline at end of file
+python3 code/preprocess_samples.py \
+    --ifiles "${RAW_FILES[@]}" \
+    --out_dir "$OUT_DIR" \
+    --cores "${SLURM_CPUS_PER_TASK:-$(nproc)}" \
+    --cores_per_sample "$CORES_PER_SAMPLE"
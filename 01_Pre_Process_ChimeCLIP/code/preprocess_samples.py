@@ -0,0 +1,190 @@
+"""
+Preprocesses raw chimeric eCLIP FASTQ files by extracting 5' UMI, trimming 3' adapters, and removing 3' UMI, as preprocess_raw_chimeCLIP.sh,
+for several samples at a time.
+Reproduces pipeline from Manakov et al., 2022 (chim-eCLIP, Yeo Lab).
+
+The three steps of a sample run as one pipeline (umi_tools extract | cutadapt | cutadapt), connected by pipes instead of intermediate
+gzipped FASTQ files, and only the final output is compressed. The final output is written to the temp/ directory of the sample and moved
+to its place once the whole pipeline has succeeded, so that an interrupted run never leaves a partial output behind.
+
+Steps are skipped if their output already exists: samples with a final output are skipped, and the pipeline of a sample starts from the
+intermediate files of preprocess_raw_chimeCLIP.sh left in its temp/ directory, if any (<SAMPLE>.umi.fastq.gz after step 1,
+<SAMPLE>.umi.adapter.fastq after step 2).
+
+Samples are processed concurrently within a total number of cores: each sample pipeline uses --cores_per_sample cores (one for umi_tools,
+the others shared between the two cutadapt steps), and --cores // --cores_per_sample samples run at the same time.
+
+Usage:
+    python preprocess_samples.py --ifiles <INPUT_FASTQ_GZ> [<INPUT_FASTQ_GZ>...] --out_dir <OUTPUT_DIR> [--cores <N>] [--cores_per_sample <N>]
+
+Arguments:
+    --ifiles             Input raw FASTQ files (gzip-compressed)
+    --out_dir            Output directory for the processed files, with <SAMPLE>/temp/, <SAMPLE>/logs/ and <SAMPLE>/<SAMPLE>.pp.fastq.gz per sample
+    --cores              Total number of cores (default: all available CPUs)
+    --cores_per_sample   Number of cores of each sample pipeline (default: 8)
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import shutil
+import subprocess
+
+# REPRODUCED FROM https://github.com/YeoLab/chim-eCLIP AS RECOMMENDED BY MANAKOV ET AL., 2022
+# Regular 3' adapters to be removed from the reads
+ADAPTERS = [
+    'AGATCGGAAG', 'GATCGGAAGA', 'ATCGGAAGAG', 'TCGGAAGAGC', 'CGGAAGAGCA', 'GGAAGAGCAC', 'GAAGAGCACA', 'AAGAGCACAC',
+    'AGAGCACACG', 'GAGCACACGT', 'AGCACACGTC', 'GCACACGTCT', 'CACACGTCTG', 'ACACGTCTGA', 'CACGTCTGAA', 'ACGTCTGAAC',
+    'CGTCTGAACT', 'GTCTGAACTC', 'TCTGAACTCC', 'CTGAACTCCA', 'TGAACTCCAG', 'GAACTCCAGT', 'AACTCCAGTC', 'ACTCCAGTCA',
+]
+
+# Get the default number of cores: the CPUs available to this process
+def default_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Get the name of a sample from its raw FASTQ file name
+def get_sample_name(path):
+    name = os.path.basename(path)
+    return name[:-len('.fastq.gz')] if name.endswith('.fastq.gz') else name
+
+# Split the cores of a sample pipeline between its steps: one for umi_tools (single-threaded), and the others two thirds for adapter trimming
+# and one third for 3' UMI trimming (which also compresses the final output)
+def split_cores(cores_per_sample):
+    adapter_cores = max(1, round((cores_per_sample - 1) * 2 / 3))
+    umi_trim_cores = max(1, cores_per_sample - 1 - adapter_cores)
+    return adapter_cores, umi_trim_cores
+
+# Step 1: Extract the 5' UMI from the reads to the read name
+## Set the random seed to 1 to ensure reproducibility
+## Set the barcode pattern to a 10-nt long UMI with each position being one of any of the four nucleotides
+## Send the log to the standard error, as the standard output is piped into the next step
+def umi_extract_command(in_file):
+    return ['umi_tools', 'extract', '--random-seed', '1', '--stdin', in_file, '--bc-pattern', 'NNNNNNNNNN', '--log2stderr']
+
+# Step 2: Trim the 3' adapters from the reads
+## Set the minimum overlap length for adapter removal to 1
+## Set the input format to fastq
+## Allow IUPAC wildcards also in the reads
+## Number of rounds of adapter matching per read set to 3
+## Set the maximum error rate to 0.1
+## Set the quality cutoff to 6 for trimming the 3' end of the reads
+## Set the minimum length of the reads to 18
+## Set the regular 3' adapters to be removed from the reads
+def adapter_trim_command(in_file, cores):
+    command = ['cutadapt', '-O', '1', '-f', 'fastq', '--match-read-wildcards', '--times', '3', '-e', '0.1', '--quality-cutoff', '6', '-m', '18']
+    for adapter in ADAPTERS:
+        command += ['-a', adapter]
+    return command + ['-j', str(cores), in_file]
+
+# Step 3: Trim the 3' UMI from the reads
+## Set the number of bases to be removed from the 3' end of the reads to 10 (last 10 bases of the reads)
+def umi_trim_command(in_file, out_file, cores):
+    return ['cutadapt', '-u', '-10', '-j', str(cores), '-o', out_file, in_file]
+
+# Run commands as a pipeline, the output of each command being the input of the next one, with the standard error (and, for the last
+# command, the standard output) of each command written to its log file; an error is raised if any command fails
+def run_pipeline(commands, log_files):
+    processes = []
+    logs = [open(log_file, 'w') for log_file in log_files]
+    try:
+        for i, command in enumerate(commands):
+            last = i == len(commands) - 1
+            stdin = processes[-1].stdout if processes else subprocess.DEVNULL
+            processes.append(subprocess.Popen(command, stdin=stdin, stdout=logs[i] if last else subprocess.PIPE, stderr=logs[i]))
+            # The pipe is only read by the next command, so that the previous one gets SIGPIPE if the next one stops
+            if stdin is not subprocess.DEVNULL:
+                stdin.close()
+        return_codes = [process.wait() for process in processes]
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        for log in logs:
+            log.close()
+    failed = [(command[0], code, log_file) for command, code, log_file in zip(commands, return_codes, log_files) if code != 0]
+    if failed:
+        raise RuntimeError("; ".join(f"{name} exited with code {code} (see {log_file})" for name, code, log_file in failed))
+
+# Preprocess a sample, from the last intermediate file of preprocess_raw_chimeCLIP.sh left in its temp/ directory if any, with the steps
+# piped into each other, and get a message on what was done
+def preprocess_sample(in_file, out_dir, cores_per_sample):
+    sample = get_sample_name(in_file)
+    sample_dir = os.path.join(out_dir, sample)
+    temp_dir = os.path.join(sample_dir, 'temp')
+    log_dir = os.path.join(sample_dir, 'logs')
+    out_file = os.path.join(sample_dir, f"{sample}.pp.fastq.gz")
+
+    if os.path.exists(out_file):
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir)
+        return f"{out_file} already exists, skipping."
+
+    os.makedirs(temp_dir, exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+    umi_file = os.path.join(temp_dir, f"{sample}.umi.fastq.gz")
+    adapter_file = os.path.join(temp_dir, f"{sample}.umi.adapter.fastq")
+    tmp_out_file = os.path.join(temp_dir, f"{sample}.pp.fastq.gz")
+    adapter_cores, umi_trim_cores = split_cores(cores_per_sample)
+
+    # The first step whose output does not exist reads the last existing output, and the next steps read from a pipe
+    commands, log_files = [], []
+    if os.path.exists(adapter_file):
+        steps_input = adapter_file
+    else:
+        if os.path.exists(umi_file):
+            adapter_input = umi_file
+        else:
+            commands.append(umi_extract_command(in_file))
+            log_files.append(os.path.join(log_dir, f"{sample}.0_umi_tools.log"))
+            adapter_input = '-'
+        commands.append(adapter_trim_command(adapter_input, adapter_cores))
+        log_files.append(os.path.join(log_dir, f"{sample}.1_cutadapt.log"))
+        steps_input = '-'
+    commands.append(umi_trim_command(steps_input, tmp_out_file, umi_trim_cores))
+    log_files.append(os.path.join(log_dir, f"{sample}.2_cutadapt.log"))
+
+    try:
+        run_pipeline(commands, log_files)
+    except BaseException:
+        if os.path.exists(tmp_out_file):
+            os.remove(tmp_out_file)
+        raise
+
+    os.replace(tmp_out_file, out_file)
+    shutil.rmtree(temp_dir)
+    return f"Preprocessing of {sample} complete ({len(commands)} steps run). Output written to {out_file}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess raw chimeric eCLIP FASTQ files, with the steps of each sample piped and several samples at a time.")
+    parser.add_argument('--ifiles', nargs='+', required=True, help="Input raw FASTQ files (gzip-compressed)")
+    parser.add_argument('--out_dir', required=True, help="Output directory for the processed files")
+    parser.add_argument('--cores', type=int, default=None, help="Total number of cores (default: all available CPUs)")
+    parser.add_argument('--cores_per_sample', type=int, default=8, help="Number of cores of each sample pipeline (default: 8)")
+    args = parser.parse_args()
+
+    cores = args.cores or default_cores()
+    cores_per_sample = max(2, min(args.cores_per_sample, cores))
+    n_parallel = max(1, cores // cores_per_sample)
+    print(f"Preprocessing {len(args.ifiles)} samples, {n_parallel} at a time with {cores_per_sample} cores each")
+
+    failed = []
+    # The work is done by the subprocesses of the pipelines, so threads are enough to run them concurrently
+    with ThreadPoolExecutor(max_workers=n_parallel) as executor:
+        futures = {executor.submit(preprocess_sample, in_file, args.out_dir, cores_per_sample): in_file for in_file in args.ifiles}
+        for future in as_completed(futures):
+            try:
+                print(future.result(), flush=True)
+            except Exception as error:
+                print(f"Preprocessing of {futures[future]} failed: {error}", flush=True)
+                failed.append(futures[future])
+
+    if failed:
+        raise SystemExit(f"Preprocessing failed for {len(failed)} samples: {', '.join(failed)}")
+    print(f"All {len(args.ifiles)} samples preprocessed. Output written to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -12,30 +12,28 @@ mkdir -p results
 
 exec > >(tee -a results/RUNME_1.log) 2>&1
 
+# Concatenates the HybriDetector outputs of all samples in data/ into a single BGZF-compressed (block gzip) dataset, with the samples compressed
+# in parallel, and a sidecar index over the chromosome and start of the rows and over their samples (code/concatenate.py), from which the rows
+# of a chromosome or of a sample can be fetched without decompressing the whole dataset (code/fetch.py).
+
 DATA_DIR="data"
 RESULTS_DIR="results"
-OUTPUT_FILE="${RESULTS_DIR}/AGO2_eCLIP_Manakov2022_full_dataset.tsv"
-
-# Initialize a flag to check if the header has been written
-HEADER_WRITTEN=false
+OUTPUT_FILE="${RESULTS_DIR}/AGO2_eCLIP_Manakov2022_full_dataset.tsv.gz"
 
+INPUT_FILES=()
 for FILE in "$DATA_DIR"/*.unified_length_all_types_unique_high_confidence.tsv; do
   # Check if the file exists and is a regular file or a valid symlink to a regular file
   if [ -f "$FILE" ] || { [ -L "$FILE" ] && [ -f "$(readlink -f "$FILE")" ]; }; then
-    # If the header hasn't been written yet, write it from the first file
-    if [ "$HEADER_WRITTEN" = false ]; then
-        head -n1 "$FILE" > "$OUTPUT_FILE"
-        HEADER_WRITTEN=true
-    fi
-    # Append the content (excluding header) to the output file
-    tail -n+2 "$FILE" >> "$OUTPUT_FILE"
+    INPUT_FILES+=("$FILE")
   else
     # If the file is not a regular file or valid symlink, skip it and print a message
     echo "Skipping "$FILE": Not a regular file or valid symlink."
   fi
 done
-echo "Concatenation of all files in $DATA_DIR completed. Output written to $OUTPUT_FILE"
 
-echo "Compressing the output file to gzip format..."
-gzip -f "$OUTPUT_FILE"
-echo "Compression completed. Output file is now $OUTPUT_FILE_GZ.gz"
\ No newline at end of file
+echo "Concatenating and compressing ${#INPUT_FILES[@]} files in $DATA_DIR..."
+python3 code/concatenate.py \
+    --ifiles "${INPUT_FILES[@]}" \
+    --ofile "$OUTPUT_FILE" \
+    --workers "${SLURM_CPUS_PER_TASK:-1}"
+echo "Concatenation of all files in $DATA_DIR completed. Output written to $OUTPUT_FILE, index written to $OUTPUT_FILE.index.tsv"
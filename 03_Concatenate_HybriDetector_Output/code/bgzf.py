@@ -0,0 +1,89 @@
+"""
+Reading and writing of BGZF (block gzip) files and of their sidecar row index.
+
+A BGZF file is a series of gzip members (blocks) of at most 64 KiB each, which record their own compressed size, so that any gzip reader reads
+the file as a single stream, while a block can be decompressed on its own from its offset in the file. Blocks are written here at row (line)
+boundaries, so that each row starts in a known block, and can be read from there; a row longer than a block continues over the next blocks.
+
+The sidecar index (<FILE>.index.tsv) has one line per block and chromosome of the rows starting in the block, with the sample the rows come from,
+the offset of the block, the number of rows starting in the block (of all chromosomes), and the number of rows and the range of start positions
+of the chromosome in the block:
+    sample    chr    block_offset    block_rows    rows    min_start    max_start
+"""
+
+import csv
+import struct
+import zlib
+
+# Maximum number of uncompressed bytes in a block, as in samtools/htslib, so that a compressed block always fits in 64 KiB
+MAX_BLOCK_DATA = 0xff00
+
+# gzip member header with the BGZF extra field ('BC', holding the total block size minus 1)
+BLOCK_HEADER = struct.Struct('<4BI2BH2BHH')
+BLOCK_HEADER_SIZE = BLOCK_HEADER.size
+BLOCK_TRAILER = struct.Struct('<2I')
+
+# Empty block marking the end of a BGZF file
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+INDEX_COLUMNS = ['sample', 'chr', 'block_offset', 'block_rows', 'rows', 'min_start', 'max_start']
+
+# Get the sidecar index file name of a BGZF file
+def get_index_file_name(path):
+    return f"{path}.index.tsv"
+
+# Compress data (at most MAX_BLOCK_DATA bytes) into a BGZF block
+def compress_block(data, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    block_size = BLOCK_HEADER_SIZE + len(compressed) + BLOCK_TRAILER.size
+    header = BLOCK_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, block_size - 1)
+    return header + compressed + BLOCK_TRAILER.pack(zlib.crc32(data), len(data))
+
+# Read the block at the current position of a binary file, and get its decompressed data, or None at the end of the file
+def read_block(file):
+    header = file.read(BLOCK_HEADER_SIZE)
+    if not header:
+        return None
+    fields = BLOCK_HEADER.unpack(header)
+    if fields[:2] != (0x1f, 0x8b) or fields[8:10] != (ord('B'), ord('C')):
+        raise ValueError(f"Not a BGZF block at offset {file.tell() - len(header)} of {file.name}")
+    body = file.read(fields[11] + 1 - BLOCK_HEADER_SIZE)
+    data = zlib.decompress(body[:-BLOCK_TRAILER.size], -15)
+    crc, size = BLOCK_TRAILER.unpack(body[-BLOCK_TRAILER.size:])
+    if zlib.crc32(data) != crc or len(data) != size:
+        raise ValueError(f"Corrupted BGZF block in {file.name}")
+    return data
+
+# Split rows (lines, as bytes) into block data at row boundaries, and get the data of each block with the rows starting in it; a row longer
+# than a block is written alone over several blocks, the first of which holds its start, so that every block holding row starts begins with one
+def pack_rows(rows, max_block_data=MAX_BLOCK_DATA):
+    data = bytearray()
+    block_rows = []
+    for row in rows:
+        if data and len(data) + len(row) > max_block_data:
+            yield bytes(data), block_rows
+            data, block_rows = bytearray(), []
+        if len(row) > max_block_data:
+            for start in range(0, len(row), max_block_data):
+                yield row[start:start + max_block_data], [row] if start == 0 else []
+            continue
+        block_rows.append(row)
+        data += row
+    if data:
+        yield bytes(data), block_rows
+
+# Write the index entries (dicts of INDEX_COLUMNS) of a BGZF file to its sidecar
+def write_index(path, entries):
+    with open(get_index_file_name(path), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS, delimiter='\t', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(entries)
+
+# Read the index entries of a BGZF file from its sidecar, with the offsets, row counts and start positions as integers (None if missing)
+def read_index(path):
+    with open(get_index_file_name(path), newline='') as f:
+        for entry in csv.DictReader(f, delimiter='\t'):
+            for column in INDEX_COLUMNS[2:]:
+                entry[column] = int(entry[column]) if entry[column] != '' else None
+            yield entry
@@ -0,0 +1,121 @@
+"""
+Concatenates the HybriDetector output files of all samples into a single dataset, with the header of the first file, compressed as BGZF
+(block gzip, see bgzf.py), and builds a sidecar index of the dataset (<OUTPUT>.index.tsv) over the chromosome (chr.g) and start (start.g)
+of the rows, and over the sample they come from.
+
+The output is a valid gzip file, read as before by gunzip, zcat or pandas. With the index, the rows of one chromosome (e.g. the chromosome 1
+test partition) or of one sample are read by seeking to the blocks that hold them, instead of decompressing the whole file (see fetch.py).
+
+The samples are compressed in parallel, each into its own series of blocks in a temporary file, and the blocks are then concatenated in the
+order of the samples.
+
+Usage:
+    python concatenate.py --ifiles <SAMPLE_TSV> [<SAMPLE_TSV>...] --ofile <OUTPUT_TSV_GZ> [--workers <N>] [--level <LEVEL>] [--tmp_dir <DIR>]
+
+Arguments:
+    --ifiles     HybriDetector output files (TSV with a header) of the samples, in the order of concatenation
+    --ofile      Output dataset (BGZF-compressed TSV, e.g. .tsv.gz)
+    --workers    Number of samples compressed in parallel (default: 1)
+    --level      Compression level (default: 6)
+    --tmp_dir    Directory for the temporary compressed samples (default: the directory of the output file)
+"""
+
+import argparse
+from multiprocessing import Pool
+import os
+import shutil
+import tempfile
+from bgzf import EOF_BLOCK, compress_block, pack_rows, write_index
+
+CHR_COLUMN = 'chr.g'
+START_COLUMN = 'start.g'
+
+# Get the name of a sample from its HybriDetector output file name
+def get_sample_name(path):
+    return os.path.basename(path).split('.')[0]
+
+# Get the rows of a sample file, without its header, each ending with a newline
+def read_rows(file):
+    for row in file:
+        yield row if row.endswith(b'\n') else row + b'\n'
+
+# Get the index entries of the rows starting in a block, one per chromosome in order of first appearance
+def index_block(sample, block_offset, rows, chr_index, start_index):
+    entries = {}
+    for row in rows:
+        fields = row.rstrip(b'\r\n').split(b'\t')
+        chromosome = fields[chr_index].decode() if chr_index < len(fields) else ''
+        try:
+            start = int(fields[start_index])
+        except (IndexError, ValueError):
+            start = None
+        entry = entries.setdefault(chromosome, {'sample': sample, 'chr': chromosome, 'block_offset': block_offset, 'block_rows': len(rows),
+                                                'rows': 0, 'min_start': start, 'max_start': start})
+        entry['rows'] += 1
+        if start is not None:
+            entry['min_start'] = start if entry['min_start'] is None else min(entry['min_start'], start)
+            entry['max_start'] = start if entry['max_start'] is None else max(entry['max_start'], start)
+    return list(entries.values())
+
+# Compress the rows of a sample file into BGZF blocks in a temporary file, and get its header, the temporary file, and the index entries and
+# number of rows of the sample, with block offsets relative to the start of the temporary file
+def compress_sample(args):
+    path, tmp_dir, level = args
+    sample = get_sample_name(path)
+    entries = []
+    n_rows = 0
+    offset = 0
+    with open(path, 'rb') as f_in, tempfile.NamedTemporaryFile('wb', dir=tmp_dir, prefix=f"{sample}.", suffix='.bgzf', delete=False) as f_out:
+        header = f_in.readline()
+        columns = header.rstrip(b'\r\n').decode().split('\t')
+        chr_index = columns.index(CHR_COLUMN)
+        start_index = columns.index(START_COLUMN)
+        for data, rows in pack_rows(read_rows(f_in)):
+            block = compress_block(data, level)
+            if rows:
+                entries.extend(index_block(sample, offset, rows, chr_index, start_index))
+                n_rows += len(rows)
+            f_out.write(block)
+            offset += len(block)
+    return header, f_out.name, entries, n_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Concatenate HybriDetector outputs into a BGZF-compressed dataset with a chromosome and sample index.")
+    parser.add_argument('--ifiles', nargs='+', required=True, help="HybriDetector output files of the samples")
+    parser.add_argument('--ofile', required=True, help="Output dataset (BGZF-compressed TSV)")
+    parser.add_argument('--workers', type=int, default=1, help="Number of samples compressed in parallel (default: 1)")
+    parser.add_argument('--level', type=int, default=6, help="Compression level (default: 6)")
+    parser.add_argument('--tmp_dir', type=str, default=None, help="Directory for the temporary compressed samples (default: the directory of the output file)")
+    args = parser.parse_args()
+
+    tmp_dir = args.tmp_dir or os.path.dirname(os.path.abspath(args.ofile))
+    first_header = None
+    index_entries = []
+
+    with Pool(args.workers) as pool, open(args.ofile + '.tmp', 'wb') as f_out:
+        # Samples are compressed in parallel, and appended in order as they are done
+        for ifile, (header, sample_file, entries, n_rows) in zip(args.ifiles, pool.imap(compress_sample, [(ifile, tmp_dir, args.level) for ifile in args.ifiles])):
+            if first_header is None:
+                first_header = header
+                f_out.write(compress_block(header if header.endswith(b'\n') else header + b'\n', args.level))
+            elif header != first_header:
+                print(f"Warning: the header of {ifile} differs from that of {args.ifiles[0]}; its rows are concatenated under the first header.")
+
+            sample_offset = f_out.tell()
+            for entry in entries:
+                entry['block_offset'] += sample_offset
+            index_entries.extend(entries)
+
+            with open(sample_file, 'rb') as f_sample:
+                shutil.copyfileobj(f_sample, f_out)
+            os.remove(sample_file)
+            print(f"Appended {n_rows} rows of {ifile} (sample {get_sample_name(ifile)})")
+
+        f_out.write(EOF_BLOCK)
+
+    os.replace(args.ofile + '.tmp', args.ofile)
+    write_index(args.ofile, index_entries)
+    print(f"Concatenation of {len(args.ifiles)} files completed. Output written to {args.ofile}, index written to {args.ofile}.index.tsv")
+
+if __name__ == "__main__":
+    main()
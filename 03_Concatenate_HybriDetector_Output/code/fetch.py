@@ -0,0 +1,96 @@
+"""
+Fetches the rows of one chromosome (optionally within a range of start positions) and/or of one sample from a BGZF-compressed dataset written
+by concatenate.py, by seeking to the blocks that hold them according to the sidecar index (<DATASET>.index.tsv), instead of decompressing
+the whole dataset. The rows are written with the header of the dataset, in their order in the dataset.
+
+Usage:
+    python fetch.py --ifile <DATASET_TSV_GZ> --ofile <OUTPUT_TSV> [--chr <CHR>] [--start <START>] [--end <END>] [--sample <SAMPLE>]
+
+Arguments:
+    --ifile     BGZF-compressed dataset with its sidecar index (see concatenate.py)
+    --ofile     Output file for the fetched rows (TSV)
+    --chr       Chromosome of the rows to fetch, as in the chr.g column (e.g. 1)
+    --start     Smallest start position (start.g) of the rows to fetch, with --chr (optional)
+    --end       Largest start position (start.g) of the rows to fetch, with --chr (optional)
+    --sample    Sample of the rows to fetch, as named in the index (optional)
+"""
+
+import argparse
+from bgzf import read_block, read_index
+from concatenate import CHR_COLUMN, START_COLUMN
+
+# Get the index entries of the blocks that may hold the rows of a chromosome (within a range of start positions) and/or of a sample
+def select_blocks(path, chromosome=None, start=None, end=None, sample=None):
+    blocks = {}
+    for entry in read_index(path):
+        if sample is not None and entry['sample'] != sample:
+            continue
+        if chromosome is not None:
+            if entry['chr'] != chromosome:
+                continue
+            if start is not None and entry['max_start'] is not None and entry['max_start'] < start:
+                continue
+            if end is not None and entry['min_start'] is not None and entry['min_start'] > end:
+                continue
+        blocks[entry['block_offset']] = entry['block_rows']
+    return sorted(blocks.items())
+
+# Get the header of a dataset, from its first block
+def read_header(file):
+    file.seek(0)
+    return read_block(file)
+
+# Get the rows starting in the block at an offset, reading the next blocks as long as the last row continues in them
+def read_block_rows(file, offset, n_rows):
+    file.seek(offset)
+    data = read_block(file)
+    while data.count(b'\n') < n_rows:
+        data += read_block(file)
+    return data.split(b'\n')[:n_rows]
+
+# Fetch the rows of a chromosome (within a range of start positions) and/or of a sample, and get the header of the dataset, then the rows
+def fetch_rows(path, chromosome=None, start=None, end=None, sample=None):
+    blocks = select_blocks(path, chromosome, start, end, sample)
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        yield header
+        columns = header.rstrip(b'\r\n').decode().split('\t')
+        chr_index = columns.index(CHR_COLUMN)
+        start_index = columns.index(START_COLUMN)
+        chromosome = chromosome.encode() if chromosome is not None else None
+
+        for offset, n_rows in blocks:
+            for row in read_block_rows(f, offset, n_rows):
+                fields = row.split(b'\t')
+                if chromosome is not None:
+                    if fields[chr_index] != chromosome:
+                        continue
+                    if start is not None and int(fields[start_index]) < start:
+                        continue
+                    if end is not None and int(fields[start_index]) > end:
+                        continue
+                yield row + b'\n'
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch the rows of a chromosome and/or a sample from an indexed BGZF-compressed dataset.")
+    parser.add_argument('--ifile', required=True, help="BGZF-compressed dataset with its sidecar index")
+    parser.add_argument('--ofile', required=True, help="Output file for the fetched rows")
+    parser.add_argument('--chr', type=str, default=None, help="Chromosome of the rows to fetch (chr.g)")
+    parser.add_argument('--start', type=int, default=None, help="Smallest start position (start.g) of the rows to fetch, with --chr")
+    parser.add_argument('--end', type=int, default=None, help="Largest start position (start.g) of the rows to fetch, with --chr")
+    parser.add_argument('--sample', type=str, default=None, help="Sample of the rows to fetch")
+    args = parser.parse_args()
+
+    if args.chr is None and args.sample is None:
+        parser.error("at least one of --chr and --sample is required")
+    if args.chr is None and (args.start is not None or args.end is not None):
+        parser.error("--start and --end require --chr")
+
+    n_rows = -1
+    with open(args.ofile, 'wb') as f:
+        for n_rows, row in enumerate(fetch_rows(args.ifile, args.chr, args.start, args.end, args.sample)):
+            f.write(row)
+    print(f"Fetched {n_rows} rows from {args.ifile}. Output written to {args.ofile}")
+
+if __name__ == "__main__":
+    main()
@@ -17,13 +17,12 @@ exec > >(tee -a results/RUNME_1.log) 2>&1
 mkdir -p data
 
 MANAKOV_POS_URL="https://zenodo.org/records/14501607/files/AGO2_eCLIP_Manakov2022_full_dataset.tsv.gz?download=1"
-MANAKOV_POS_GZ="data/AGO2_eCLIP_Manakov2022_positives.tsv.gz"
-MANAKOV_POS="data/AGO2_eCLIP_Manakov2022_positives.tsv"
+MANAKOV_POS="data/AGO2_eCLIP_Manakov2022_positives.tsv.gz"
 
+# The positives are read compressed (see ../shared/compressed_io.py), so they are not gunzipped
 if [[ ! -f "$MANAKOV_POS" ]]; then
     echo "Downloading positives for eCLIP_Manakov2022..."
-    wget --progress=dot:giga -O "$MANAKOV_POS_GZ" "$MANAKOV_POS_URL"
-    gunzip "$MANAKOV_POS_GZ"
+    wget --progress=dot:giga -O "$MANAKOV_POS" "$MANAKOV_POS_URL"
 else
     echo "File $MANAKOV_POS already exists. Skipping download."
 fi
@@ -33,7 +32,7 @@ fi
 echo
 echo "Running post-processing script on $MANAKOV_POS..."
 bash code/post_process.sh \
-    -i data/AGO2_eCLIP_Manakov2022_positives.tsv \
+    -i "$MANAKOV_POS" \
     -o results/ \
     -n results/intermediate/ \
     -t 1,10,100 \
@@ -1,44 +1,78 @@
 """
 Assigns or updates miRNA family annotations for each entry using a reference mature miRNA FASTA file, whenever the current value is missing, empty, or set to '0'.
 
+The mature FASTA file is parsed as a stream (records may span several lines), and the resulting sequence-to-family index is cached as a pickle
+next to it (<MATURE_FA>.index.pkl), rebuilt whenever the size or modification time of the FASTA file changes. The input TSV is processed in
+chunks, filling only the rows that need it, with vectorized string operations.
+
 Usage:
-    python family_assign.py --ifile <INPUT_TSV> --mature <MATURE_FA> --ofile <OUTPUT_TSV>
+    python family_assign.py --ifile <INPUT_TABLE> --mature <MATURE_FA> --ofile <OUTPUT_TABLE> [--chunksize <ROWS>]
 
 Arguments:
-    --ifile     Path to input TSV file
-    --mature    Path to mature miRNA FASTA file (mature.fa downloaded from miRBase)
-    --ofile     Output path for annotated TSV file
+    --ifile       Path to input table file (TSV, or Feather/Parquet by extension, see table_io.py)
+    --mature      Path to mature miRNA FASTA file (mature.fa downloaded from miRBase)
+    --ofile       Output path for annotated table file (TSV, or Feather/Parquet by extension)
+    --chunksize   Number of rows of the input TSV file processed at a time (default: 100000)
 """
 
-import pandas as pd
 import argparse
+import os
+import pickle
+from compressed_io import open_file
+from table_io import read_table_chunks, TableWriter
 
 def filter_and_create_table(data, mature_sequences):
     # ensure the necessary column is present in the data
     if 'noncodingRNA_fam' not in data.columns:
         raise KeyError("The column 'noncodingRNA_fam' is not found in the input data.")
-    
-    # update 'noncodingRNA_fam' based on mature sequences if it is '0'
-    data['noncodingRNA_fam'] = data.apply(
-        lambda row: mature_sequences.get(row['noncodingRNA'].replace('T', 'U'), row['noncodingRNA_fam']) if pd.isna(row['noncodingRNA_fam']) or row['noncodingRNA_fam'] == '' or row['noncodingRNA_fam'] == '0' else row['noncodingRNA_fam'],
-        axis=1
-    )
-    
+
+    # update 'noncodingRNA_fam' based on mature sequences if it is missing, empty or '0', keeping the current value if the sequence is not found
+    families = data['noncodingRNA_fam']
+    to_fill = families.isna() | families.isin(['', '0'])
+    filled = data.loc[to_fill, 'noncodingRNA'].str.replace('T', 'U', regex=False).map(mature_sequences)
+    data.loc[to_fill, 'noncodingRNA_fam'] = filled.fillna(families[to_fill])
+
     # remove 'hsa-' prefix from 'noncodingRNA_fam' values if present
-    data['noncodingRNA_fam'] = data['noncodingRNA_fam'].apply(lambda x: x.replace('hsa-', '') if 'hsa-' in x else x)
-    
+    data['noncodingRNA_fam'] = data['noncodingRNA_fam'].str.replace('hsa-', '', regex=False)
+
     return data
 
+def read_fasta_records(file_path):
+    # stream (name, sequence) records from a FASTA file, with sequences possibly spanning several lines
+    name = None
+    sequence_lines = []
+    with open_file(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if name is not None:
+                    yield name, ''.join(sequence_lines)
+                name = line.split()[0][1:]
+                sequence_lines = []
+            elif line:
+                sequence_lines.append(line)
+    if name is not None:
+        yield name, ''.join(sequence_lines)
+
 def load_mature_sequences(file_path):
-    # load mature sequences from a file and map sequences to their families
-    mature_sequences = {}
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-        for i in range(0, len(lines), 2):
-            header = lines[i].strip()
-            sequence = lines[i+1].strip().replace('T', 'U')
-            family = header.split()[0][1:]
-            mature_sequences[sequence] = family
+    # load mature sequences from a file and map sequences to their families (later records override earlier ones with the same sequence),
+    # from the cached index if it was built from the same version of the file
+    cache_path = f"{file_path}.index.pkl"
+    stat = os.stat(file_path)
+    file_version = (stat.st_size, stat.st_mtime_ns)
+
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache['file_version'] == file_version:
+            return cache['mature_sequences']
+
+    mature_sequences = {sequence.replace('T', 'U'): family for family, sequence in read_fasta_records(file_path)}
+
+    # write the cache atomically, so that an interrupted write never leaves a partial cache
+    with open(cache_path + '.tmp', 'wb') as f:
+        pickle.dump({'file_version': file_version, 'mature_sequences': mature_sequences}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_path + '.tmp', cache_path)
     return mature_sequences
 
 def main():
@@ -47,20 +81,20 @@ def main():
     parser.add_argument('--ifile', help="Input file")
     parser.add_argument('--mature', help="Mature miRNA file")
     parser.add_argument('--ofile', help="Output file")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Number of rows processed at a time")
 
     args = parser.parse_args()
 
     # load mature sequences from the specified file
     mature_sequences = load_mature_sequences(args.mature)
 
-    # read input data from the specified file
-    data = pd.read_csv(args.ifile, sep='\t')
-
-    # process the data to update the 'noncodingRNA_fam' column
-    filtered_table = filter_and_create_table(data, mature_sequences)
+    # read input data from the specified file in chunks, with all values of a TSV file as text so that they are written back unchanged
+    chunks = read_table_chunks(args.ifile, args.chunksize, dtype=str)
 
-    # write the processed data to the specified output file
-    filtered_table.to_csv(args.ofile, sep='\t', index=False)
+    # process each chunk to update the 'noncodingRNA_fam' column, and append it to the specified output file
+    with TableWriter(args.ofile) as writer:
+        for data in chunks:
+            writer.write(filter_and_create_table(data, mature_sequences))
 
 if __name__ == "__main__":
     main()
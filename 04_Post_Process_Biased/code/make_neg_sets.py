@@ -2,81 +2,103 @@
 Generates negative examples for each gene in a sorted input file at a specified ratio, ensuring all negatives have a minimum edit distance from positives.
 Method reproduced from Klimentova et al. (2022) and Hejret et al. (2023). Later found to introduce the miRNA frequency class bias described. 
 
+Several ratios can be generated in a single pass over the input (e.g. --neg_ratio 1,10,100), writing one output file per ratio. Each ratio
+uses its own seeded random generator and 'unsuccessful' carry-over, so the output per ratio is identical to that of a separate run.
+
 Usage:
-    python make_neg_sets.py --ifile <INPUT_TSV> --ofile <OUTPUT_TSV> [--neg_ratio <RATIO>] [--min_required_edit_distance <DIST>]
+    python make_neg_sets.py --ifile <INPUT_TSV> --ofile <OUTPUT_TSV> [--unsorted] [--neg_ratio <RATIO>[,<RATIO>...]] [--min_required_edit_distance <DIST>] [--distance_cache_dir <DIR>] [--distance_cache_radius <DIST>] [--reject_file <REJECT_TSV>] [--write_buffer_size <BYTES>] [--resume] [--checkpoint_file <CKPT>] [--checkpoint_every <BLOCKS>]
 
 Arguments:
-    --ifile                         Input file name (TSV, must be sorted by 'gene' column)
-    --ofile                         Output file for positive and negative examples (TSV)
-    --neg_ratio                     Number of negatives per positive (default: 1; use 'max' for all possible)
+    --ifile                         Input file name (TSV, or Feather/Parquet by extension, see table_io.py; must be sorted by 'gene' column unless --unsorted is given)
+    --unsorted                      Input file is not sorted; genes are visited in sorted order via an index of row byte offsets, built in one scan
+    --ofile                         Output file for positive and negative examples (TSV); must contain '{ratio}' if several ratios are given
+    --neg_ratio                     Number of negatives per positive, or a comma-separated list of them (default: 1; use 'max' for all possible)
     --min_required_edit_distance    Minimum edit distance required between positive and negative miRNAs (default: 3)
+    --distance_cache_dir            Directory for the on-disk miRNA neighbour cache, reused across thresholds and ratios (optional; default: no cache)
+    --distance_cache_radius         Edit distance up to which neighbours are cached when the cache is built (default: 5)
+    --reject_file                   File for the excluded (rejected) positive examples, with a reject_reason column (TSV); may contain '{ratio}' (default: <OUTPUT>.rejected.tsv)
+    --write_buffer_size             Buffer size in bytes of each output file writer (default: 1048576)
+    --resume                        Resume from the checkpoint of an interrupted run, if any, truncating the output files to it; the output is the same as that of an uninterrupted run
+    --checkpoint_file               Checkpoint file, removed once the run completes (default: <OUTPUT>.ckpt, with '{ratio}' replaced by the ratios)
+    --checkpoint_every              Number of gene blocks between checkpoints (default: 1000)
 """
 
 import argparse
-import pandas as pd
+from collections import Counter
+from contextlib import ExitStack
+import numpy as np
+import os
 import random
-from Levenshtein import distance as levenshtein_distance
+from blocks import read_blocks
+from checkpoint import get_checkpoint_file_name, get_file_fingerprint, encode_rng_state, restore_rng_state, get_synced_offset, write_checkpoint, read_checkpoint, truncate_outputs, skip_completed, remove_checkpoint
+from mirna_neighbors import get_neighbor_lists
+from table_io import read_table, tsv_file
 import sys
 import time
 
 # Get allowed mirnas i.e. mirnas that have an edit distance greater than min_allowed_distance from the given mirna
-def precompute_allowed_mirnas(positive_samples_df, min_allowed_distance):
-    unique_mirnas = positive_samples_df['noncodingRNA'].unique()
-    allowed_mirnas = {}
-    
-    for mirna in unique_mirnas:
-        allowed_mirnas[mirna] = [other_mirna for other_mirna in unique_mirnas 
-                                 if mirna != other_mirna and 
-                                 levenshtein_distance(mirna, other_mirna) > min_allowed_distance]
-    return allowed_mirnas
-
-# Get unique pairs of noncodingRNA sequence (seqm) and family
-def get_unique_seqm_fam_pairs(positive_samples_df):
-    unique_seqm_fam_pairs = positive_samples_df[['noncodingRNA', 'noncodingRNA_fam']].drop_duplicates()
-    unique_seqm_fam_pairs_dict = unique_seqm_fam_pairs.set_index('noncodingRNA')['noncodingRNA_fam'].to_dict()
+# Each unique mirna gets a stable id (its position in the sorted unique mirnas), and the allowed relation is stored as a packed boolean matrix,
+# with one bit row per mirna that is cleared for its neighbours, i.e. mirnas within min_allowed_distance including the mirna itself
+# If a cache directory is given, the neighbour lists are loaded from (or saved to) it, up to at least cache_radius
+def precompute_allowed_mirnas(positive_samples_df, min_allowed_distance, cache_dir=None, cache_radius=0):
+    unique_mirnas = np.array(sorted(positive_samples_df['noncodingRNA'].unique()), dtype=object)
+    mirna_ids = {mirna: idx for idx, mirna in enumerate(unique_mirnas)}
+
+    radius = max(min_allowed_distance, cache_radius) if cache_dir is not None else min_allowed_distance
+    indptr, indices, distances = get_neighbor_lists(unique_mirnas.tolist(), radius, cache_dir)
+
+    # Keep only the neighbours within min_allowed_distance (and each mirna itself), and clear their bits in the packed matrix
+    within = np.asarray(distances) <= min_allowed_distance
+    rows = np.concatenate([np.repeat(np.arange(len(unique_mirnas)), np.diff(indptr))[within], np.arange(len(unique_mirnas))])
+    cols = np.concatenate([np.asarray(indices)[within], np.arange(len(unique_mirnas))])
+    allowed_bits = np.full((len(unique_mirnas), (len(unique_mirnas) + 7) // 8), 0xFF, dtype=np.uint8)
+    np.bitwise_and.at(allowed_bits, (rows, cols >> 3), ~(np.uint8(0x80) >> (cols & 7).astype(np.uint8)))
+
+    return unique_mirnas, mirna_ids, allowed_bits
+
+# Get the first row of each unique pair of noncodingRNA sequence (seqm) and family, as the smallest value of order_column over the rows of the pair
+def get_seqm_fam_first_rows(positive_samples_df, order_column):
+    return positive_samples_df.groupby(['noncodingRNA', 'noncodingRNA_fam'], dropna=False, sort=False)[order_column].min().reset_index()
+
+# Get unique pairs of noncodingRNA sequence (seqm) and family, as a seqm to family map
+# A seqm with several families is mapped, as for the gene-sorted input, to the family of the last of its pairs in order of first appearance,
+# i.e. of the pair whose first row has the largest order_column value: the row number for a sorted input, or the gene for an input visited
+# in sorted gene order. As only the first row of each pair counts, the map does not depend on the order of the rows. Pairs of a seqm with the
+# same first gene (only possible for repeated gene/seqm pairs, which deduplication removes) are ordered by family
+def get_unique_seqm_fam_pairs(positive_samples_df, order_column):
+    first_rows = get_seqm_fam_first_rows(positive_samples_df, order_column)
+    last_pairs = first_rows.sort_values([order_column, 'noncodingRNA_fam'], kind='stable').drop_duplicates('noncodingRNA', keep='last')
+    unique_seqm_fam_pairs_dict = last_pairs.set_index('noncodingRNA')['noncodingRNA_fam'].to_dict()
     return unique_seqm_fam_pairs_dict
 
-# Yield blocks of positive examples with the same gene to process at a time, for memory efficiency
-def yield_gene_blocks(positive_file_path):
-    current_block = []
-    current_seq_g = None
-
-    with open(positive_file_path, 'r') as file:
-        header_columns = file.readline().strip().split('\t')
-        seq_g_index = header_columns.index('gene')
-
-        for line in file:
-            columns = line.strip().split('\t')
-            seq_g = columns[seq_g_index]
-
-            if seq_g != current_seq_g:
-                if current_block:
-                    block_df = pd.DataFrame(current_block, columns=header_columns)
-                    yield block_df
-                current_block = [columns]
-                current_seq_g = seq_g
-            else:
-                current_block.append(columns)
-
-    if current_block:
-        block_df = pd.DataFrame(current_block, columns=header_columns)
-        yield block_df
-
-# Generate negative examples for a gene block of positive examples
-def generate_negative_samples(block, neg_ratio, unique_seqm_fam_pairs_dict, allowed_mirnas, unsuccessful):
-    
+# Get the default reject file name of an output file, i.e. the output file name with '.rejected' added before the extension
+def get_reject_file_name(ofile):
+    root, ext = os.path.splitext(ofile)
+    return f"{root}.rejected{ext or '.tsv'}"
+
+# Get the miRNAs that are allowed to be paired with a gene block as negative examples, or None if the block is inconsistent
+def get_gene_allowed_mirnas(block, allowed_mirnas):
+
     # Check if 'feature' and 'test' are consistent within the block
-    if block['feature'].nunique() != 1 or block['test'].nunique() != 1:
+    if len(block.unique('feature')) != 1 or len(block.unique('test')) != 1:
+        return None
+
+     # Get the set of miRNAs that share this gene as positive examples
+    pos_mirnas = block.unique('noncodingRNA')
+    
+    # Get the set of miRNAs that are allowed to be paired with this gene as negative examples, by AND-ing the allowed bit rows of the positive miRNAs
+    unique_mirnas, mirna_ids, allowed_bits = allowed_mirnas
+    gene_allowed_bits = np.bitwise_and.reduce(allowed_bits[[mirna_ids[mirna] for mirna in pos_mirnas]], axis=0)
+    return unique_mirnas[np.flatnonzero(np.unpackbits(gene_allowed_bits, count=len(unique_mirnas)))] # ids are sorted, so the miRNAs are too, for reproducibility
+
+# Generate negative examples for a gene block of positive examples, at a single neg_ratio and using the random generator of that neg_ratio
+def generate_negative_samples(block, gene_allowed_mirnas, neg_ratio, unique_seqm_fam_pairs_dict, unsuccessful, rng):
+    
+    if gene_allowed_mirnas is None:
         return [], unsuccessful
     
     neg_label = 0
-    gene = block['gene'].iloc[0]
-     
-     # Get the set of miRNAs that share this gene as positive examples
-    pos_mirnas = block['noncodingRNA'].unique().tolist()
-    
-    # Get the set of miRNAs that are allowed to be paired with this gene as negative examples
-    gene_allowed_mirnas = sorted(set.intersection(*[set(allowed_mirnas[mirna]) for mirna in pos_mirnas])) # returns a sorted list for reproducibility
+    gene = block.first('gene')
 
     # If neg_ratio is 'max', use all the negative examples possible for this gene
     if neg_ratio == 'max':
@@ -85,7 +107,7 @@ def generate_negative_samples(block, neg_ratio, unique_seqm_fam_pairs_dict, allo
     # If neg_ratio is an integer, compute the number of negative examples to generate for this gene based on the neg_ratio, the number of positive examples that share this gene, and the number of unsuccessful negative examples from the previous block. 
     else:
         neg_ratio = int(neg_ratio)
-        n = neg_ratio * block.shape[0] + unsuccessful
+        n = neg_ratio * len(block) + unsuccessful
         # If there are not enough allowed mirnas for this gene, use all of them and record the number of unsuccessful negative examples
         if n > len(gene_allowed_mirnas):
             unsuccessful = n - len(gene_allowed_mirnas)
@@ -93,14 +115,14 @@ def generate_negative_samples(block, neg_ratio, unique_seqm_fam_pairs_dict, allo
         # If there are enough allowed mirnas for this gene, randomly sample n negative examples from the allowed mirnas for this gene
         else:
             unsuccessful = 0
-            n_negative_mirnas = random.sample(gene_allowed_mirnas, n)
+            n_negative_mirnas = gene_allowed_mirnas[rng.sample(range(len(gene_allowed_mirnas)), n)]
 
-    feature = block['feature'].iloc[0]
-    test = block['test'].iloc[0]
-    chromosome = block['chr'].iloc[0]
-    start = block['start'].iloc[0]
-    end = block['end'].iloc[0]
-    strand = block['strand'].iloc[0]
+    feature = block.first('feature')
+    test = block.first('test')
+    chromosome = block.first('chr')
+    start = block.first('start')
+    end = block.first('end')
+    strand = block.first('strand')
 
     # Construct the df rows for the negative examples
     negative_sample_rows = [
@@ -110,58 +132,166 @@ def generate_negative_samples(block, neg_ratio, unique_seqm_fam_pairs_dict, allo
 
     return negative_sample_rows, unsuccessful
 
+# Generate the negative examples of a gene block at each neg_ratio, and append its positive and negative examples to the writer of the neg_ratio,
+# or its positive examples to the reject writer of the neg_ratio, with the reason they were excluded
+def process_gene_block(block, allowed_mirnas, unique_seqm_fam_pairs_dict, ratio_runs):
+
+    # The allowed miRNAs of a gene block do not depend on the neg_ratio, so they are computed once for all neg_ratios
+    gene_allowed_mirnas = get_gene_allowed_mirnas(block, allowed_mirnas)
+
+    for ratio_run in ratio_runs:
+
+        negative_sample_rows, ratio_run['unsuccessful'] = generate_negative_samples(block, gene_allowed_mirnas, ratio_run['neg_ratio'], unique_seqm_fam_pairs_dict, ratio_run['unsuccessful'], ratio_run['rng'])
+
+        if negative_sample_rows:
+            # Append positive examples for this block to the output file, verbatim
+            ratio_run['writer'].write(block.text())
+            # Append negative examples for this block to the output file
+            for sublist in negative_sample_rows:
+                ratio_run['writer'].write('\t'.join(map(str, sublist)) + '\n')
+        else:
+            # Append the excluded positive examples for this block to the reject file, with the reason they were excluded
+            reason = 'inconsistent_feature_or_test' if gene_allowed_mirnas is None else 'no_negatives_generated'
+            for row in block.rows:
+                ratio_run['reject_writer'].write('\t'.join(row + [reason]) + '\n')
+            ratio_run['rejected'][(reason, 'blocks')] += 1
+            ratio_run['rejected'][(reason, 'rows')] += len(block)
+
+# Report the excluded positive examples and the missing negative examples of each neg_ratio
+def report_ratio_runs(ratio_runs):
+    for ratio_run in ratio_runs:
+        if ratio_run['rejected']:
+            # Report the number of excluded positive examples (written to the reject file) if no negative examples were generated for them
+            sys.stderr.write(f"Warning: Could not generate negative examples for some positive examples, due to inconsistent feature or test for the same gene, or no allowed negative miRNAs. Excluded positive examples from {ratio_run['ofile']} were written to {ratio_run['reject_file']}: \n")
+            for reason in sorted({reason for reason, _ in ratio_run['rejected']}):
+                sys.stderr.write(f"    {reason}: {ratio_run['rejected'][(reason, 'blocks')]} gene blocks, {ratio_run['rejected'][(reason, 'rows')]} positive examples\n")
+
+        if ratio_run['unsuccessful'] > 0:
+            print(f"Warning: Could not generate {ratio_run['neg_ratio']} negative examples, missing {ratio_run['unsuccessful']} negative examples.")
+
 def main():
     # Record start time
     start = time.time()
 
     parser = argparse.ArgumentParser(description="Generate negative examples with specific edit distance.")
-    parser.add_argument('--ifile', type=str, required=True, help="Input file name, must be sorted by 'gene'")
-    parser.add_argument('--ofile', type=str, required=True, help="Output file name")
-    parser.add_argument('--neg_ratio', default=1, help="Number of negative examples to generate per positive example")
+    parser.add_argument('--ifile', type=str, required=True, help="Input file name, must be sorted by 'gene' unless --unsorted is given")
+    parser.add_argument('--unsorted', action='store_true', help="Input file is not sorted; visit genes in sorted order via an index of row byte offsets")
+    parser.add_argument('--ofile', type=str, required=True, help="Output file name, must contain '{ratio}' if several neg_ratios are given")
+    parser.add_argument('--neg_ratio', default='1', help="Number of negative examples to generate per positive example, or a comma-separated list of them")
     parser.add_argument('--min_required_edit_distance', type=int, default=3, help="Minimum required edit distance for negative examples")
+    parser.add_argument('--distance_cache_dir', type=str, default=None, help="Directory for the on-disk miRNA neighbour cache (default: no cache)")
+    parser.add_argument('--distance_cache_radius', type=int, default=5, help="Edit distance up to which neighbours are cached, if the cache is built (default: 5)")
+    parser.add_argument('--reject_file', type=str, default=None, help="File for the excluded positive examples, may contain '{ratio}' (default: <ofile>.rejected.tsv)")
+    parser.add_argument('--write_buffer_size', type=int, default=1024 * 1024, help="Buffer size in bytes of each output file writer (default: 1 MiB)")
+    parser.add_argument('--resume', action='store_true', help="Resume from the checkpoint of an interrupted run, if any")
+    parser.add_argument('--checkpoint_file', type=str, default=None, help="Checkpoint file (default: <ofile>.ckpt, with '{ratio}' replaced by the ratios)")
+    parser.add_argument('--checkpoint_every', type=int, default=1000, help="Number of gene blocks between checkpoints (default: 1000)")
     args = parser.parse_args()
 
-    # Set a fixed random seed for reproducibility
-    random.seed(42)  
-    
-    # Read the entire positive examples file
-    positive_samples = pd.read_csv(args.ifile, sep='\t')
-    
-    # Write header to the output file
-    positive_samples.head(0).to_csv(args.ofile, sep='\t', index=False, mode='w')
+    neg_ratios = args.neg_ratio.split(',')
+    if len(neg_ratios) > 1 and '{ratio}' not in args.ofile:
+        parser.error("--ofile must contain '{ratio}' when several neg_ratios are given")
 
-    unique_seqm_fam_pairs_dict = get_unique_seqm_fam_pairs(positive_samples)
-    allowed_mirnas = precompute_allowed_mirnas(positive_samples, args.min_required_edit_distance)
+    # A checkpoint is only resumed for the same input file and options
+    checkpoint_file = args.checkpoint_file or get_checkpoint_file_name(args.ofile.replace('{ratio}', '-'.join(neg_ratios)))
+    run = {
+        'ifile': get_file_fingerprint(args.ifile),
+        'unsorted': args.unsorted,
+        'neg_ratios': neg_ratios,
+        'min_required_edit_distance': args.min_required_edit_distance
+    }
+    checkpoint = read_checkpoint(checkpoint_file, run) if args.resume else None
+
+    # Read the gene, miRNA sequence and family columns of the positive examples file
+    positive_samples = read_table(args.ifile, columns=['gene', 'noncodingRNA', 'noncodingRNA_fam'], dtype={'gene': str})
+
+    # The families of the miRNAs follow the order the rows are visited in: the row order of a sorted input, or the sorted gene order of an unsorted one
+    if args.unsorted:
+        positive_samples['gene'] = positive_samples['gene'].fillna('')
+        unique_seqm_fam_pairs_dict = get_unique_seqm_fam_pairs(positive_samples, 'gene')
+    else:
+        positive_samples['row'] = np.arange(len(positive_samples))
+        unique_seqm_fam_pairs_dict = get_unique_seqm_fam_pairs(positive_samples, 'row')
+    allowed_mirnas = precompute_allowed_mirnas(positive_samples, args.min_required_edit_distance, args.distance_cache_dir, args.distance_cache_radius)
 
     # Delete the positive_samples dataframe to free up memory
     del positive_samples
 
-    unsuccessful = 0 
+    with ExitStack() as stack:
+        # Get blocks of positive examples with the same gene to process at a time, for memory efficiency, either from the sorted input or via an index of the unsorted input
+        # (blocks are read from the rows of a TSV file, so a columnar input is exported to a temporary TSV file next to the output first)
+        ifile = stack.enter_context(tsv_file(args.ifile, os.path.dirname(os.path.abspath(args.ofile))))
+        header_columns, column_index, gene_blocks = read_blocks(ifile, 'gene', indexed=args.unsorted)
+
+        # Set up one buffered output file and reject file, and one random generator with a fixed seed for reproducibility, per neg_ratio, so that each neg_ratio gives the same output as a separate run
+        ratio_runs = []
+        for neg_ratio in neg_ratios:
+            ofile = args.ofile.replace('{ratio}', neg_ratio)
+            reject_file = args.reject_file.replace('{ratio}', neg_ratio) if args.reject_file else get_reject_file_name(ofile)
+            ratio_runs.append({
+                'neg_ratio': neg_ratio,
+                'ofile': ofile,
+                'reject_file': reject_file,
+                'rng': random.Random(42),
+                'unsuccessful': 0,
+                'rejected': Counter()
+            })
+
+        if checkpoint is not None:
+            # Continue from the checkpoint: truncate the output and reject files to it, and restore the state of each neg_ratio
+            truncate_outputs(checkpoint)
+            for ratio_run, ratio_state in zip(ratio_runs, checkpoint['ratio_states']):
+                restore_rng_state(ratio_run['rng'], ratio_state['rng'])
+                ratio_run['unsuccessful'] = ratio_state['unsuccessful']
+                ratio_run['rejected'] = Counter({(reason, kind): count for reason, kind, count in ratio_state['rejected']})
+            gene_blocks = skip_completed(gene_blocks, checkpoint['n_blocks'], checkpoint['last_block_key'])
+            n_blocks = checkpoint['n_blocks']
+            last_block_key = checkpoint['last_block_key']
+            print(f"Resuming from checkpoint {checkpoint_file} after {n_blocks} gene blocks (last gene block: {last_block_key}).", flush=True)
+        else:
+            n_blocks = 0
+            last_block_key = None
+
+        for ratio_run in ratio_runs:
+            mode = 'a' if checkpoint is not None else 'w'
+            ratio_run['writer'] = stack.enter_context(open(ratio_run['ofile'], mode, buffering=args.write_buffer_size))
+            ratio_run['reject_writer'] = stack.enter_context(open(ratio_run['reject_file'], mode, buffering=args.write_buffer_size))
+
+        # Write header to the output and reject files
+        if checkpoint is None:
+            for ratio_run in ratio_runs:
+                ratio_run['writer'].write('\t'.join(header_columns) + '\n')
+                ratio_run['reject_writer'].write('\t'.join(header_columns + ['reject_reason']) + '\n')
+
+        # Save the number and key of the completed gene blocks, the offsets of the output and reject files, and the state of each neg_ratio
+        def save_checkpoint():
+            offsets = {}
+            ratio_states = []
+            for ratio_run in ratio_runs:
+                offsets[ratio_run['ofile']] = get_synced_offset(ratio_run['writer'])
+                offsets[ratio_run['reject_file']] = get_synced_offset(ratio_run['reject_writer'])
+                ratio_states.append({
+                    'rng': encode_rng_state(ratio_run['rng']),
+                    'unsuccessful': ratio_run['unsuccessful'],
+                    'rejected': [[reason, kind, count] for (reason, kind), count in ratio_run['rejected'].items()]
+                })
+            write_checkpoint(checkpoint_file, {'run': run, 'n_blocks': n_blocks, 'last_block_key': last_block_key, 'offsets': offsets, 'ratio_states': ratio_states})
 
-    inconsistent_blocks = pd.DataFrame(columns=['gene', 'noncodingRNA', 'noncodingRNA_fam', 'feature', 'test', 'label', 'chr', 'start', 'end', 'strand'])
+        save_checkpoint()
 
-    with open(args.ofile, 'a') as ofile:
-        
-        for block in yield_gene_blocks(args.ifile):
+        for block in gene_blocks:
 
-            negative_sample_rows, unsuccessful = generate_negative_samples(block, args.neg_ratio, unique_seqm_fam_pairs_dict, allowed_mirnas, unsuccessful)
+            process_gene_block(block, allowed_mirnas, unique_seqm_fam_pairs_dict, ratio_runs)
 
-            if negative_sample_rows:
-                # Append positive examples for this block to the output file
-                block.to_csv(ofile, sep='\t', index=False, header=False, mode='a')
-                # Append negative examples for this block to the output file
-                for sublist in negative_sample_rows:
-                    ofile.write('\t'.join(map(str, sublist)) + '\n')
-            else:
-                inconsistent_blocks = pd.concat([inconsistent_blocks, block], ignore_index=True)
+            n_blocks += 1
+            last_block_key = block.key
+            if n_blocks % args.checkpoint_every == 0:
+                save_checkpoint()
 
-    if inconsistent_blocks.shape[0] > 0:
-        # Print excluded positive examples block to stderr if no negative examples were generated
-        sys.stderr.write(f"Warning: Could not generate negative examples for the following positive examples due to inconsistent feature or chr.g for the same gene. Excluding positive examples. \n")
-        sys.stderr.write(inconsistent_blocks.to_string(index=False) + '\n')
+    # The run is complete, so its checkpoint is no longer needed
+    remove_checkpoint(checkpoint_file)
 
-    if unsuccessful > 0:
-        print(f"Warning: Could not generate {args.neg_ratio} negative examples, missing {unsuccessful} negative examples.")
+    report_ratio_runs(ratio_runs)
     
     # Record end time
     end = time.time() 
@@ -0,0 +1,116 @@
+"""
+Finds, for every miRNA sequence, the other miRNA sequences within a given Levenshtein (edit) distance, without comparing all pairs.
+
+Uses a pigeonhole seed index: each indexed sequence is cut into (max_distance + 1) contiguous pieces. Any sequence within max_distance edits
+must contain at least one of these pieces unchanged, shifted by at most max_distance positions, so only sequences sharing such a seed are
+verified with an exact (cut-off) Levenshtein distance.
+
+Used by make_neg_sets.py to precompute the (small) neighbour set of each miRNA; the allowed negative miRNAs are the complement of it.
+
+The neighbour lists (with their distances) can be cached on disk, keyed by a hash of the sorted unique miRNA sequences, as memory-mappable
+.npy arrays in CSR layout (indptr, indices, distances). A cache built up to some radius serves any threshold at or below that radius.
+"""
+
+from collections import defaultdict
+import hashlib
+import json
+import os
+import numpy as np
+from Levenshtein import distance as levenshtein_distance
+
+# Get the start offsets of the pieces a sequence of the given length is cut into (the last offset is the sequence length)
+def piece_bounds(length, n_pieces):
+    return [i * length // n_pieces for i in range(n_pieces + 1)]
+
+class EditDistanceIndex:
+
+    def __init__(self, sequences, max_distance):
+        self.sequences = list(sequences)
+        self.max_distance = max(max_distance, 0)
+        self.n_pieces = self.max_distance + 1
+        self.lengths = set()
+
+        # Index every piece by (sequence length, piece number, piece)
+        self.seeds = defaultdict(list)
+        for idx, sequence in enumerate(self.sequences):
+            bounds = piece_bounds(len(sequence), self.n_pieces)
+            for piece_no in range(self.n_pieces):
+                piece = sequence[bounds[piece_no]:bounds[piece_no + 1]]
+                self.seeds[(len(sequence), piece_no, piece)].append(idx)
+            self.lengths.add(len(sequence))
+
+    # Get the indices (sorted) of all indexed sequences within max_distance of the query sequence, including identical ones
+    def query(self, sequence):
+        return [idx for idx, _ in self.query_distances(sequence)]
+
+    # Get the (index, distance) pairs, sorted by index, of all indexed sequences within max_distance of the query sequence
+    def query_distances(self, sequence):
+        d = self.max_distance
+        candidates = set()
+
+        # Only sequences whose length differs by at most d can be within d edits
+        for length in range(max(len(sequence) - d, 0), len(sequence) + d + 1):
+            if length not in self.lengths:
+                continue
+            bounds = piece_bounds(length, self.n_pieces)
+            for piece_no in range(self.n_pieces):
+                piece_length = bounds[piece_no + 1] - bounds[piece_no]
+                for shift in range(-d, d + 1):
+                    start = bounds[piece_no] + shift
+                    if start < 0 or start + piece_length > len(sequence):
+                        continue
+                    ids = self.seeds.get((length, piece_no, sequence[start:start + piece_length]))
+                    if ids:
+                        candidates.update(ids)
+
+        # Verify the candidates with the exact edit distance
+        distances = ((idx, levenshtein_distance(sequence, self.sequences[idx], score_cutoff=d)) for idx in sorted(candidates))
+        return [(idx, dist) for idx, dist in distances if dist <= d]
+
+
+# Get a content hash of a sorted list of unique sequences, used as the cache key
+def sequence_set_hash(sorted_sequences):
+    return hashlib.sha256('\n'.join(sorted_sequences).encode()).hexdigest()
+
+# Compute the neighbour lists of all sequences up to radius, in CSR layout (indptr, indices, distances)
+def compute_neighbor_lists(sequences, radius):
+    index = EditDistanceIndex(sequences, radius)
+    indptr = [0]
+    indices = []
+    distances = []
+    for sequence in index.sequences:
+        for idx, dist in index.query_distances(sequence):
+            indices.append(idx)
+            distances.append(dist)
+        indptr.append(len(indices))
+    return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int32), np.array(distances, dtype=np.uint8)
+
+# Get the neighbour lists of the sorted unique sequences up to radius, loading them from (or saving them to) the cache directory if given
+def get_neighbor_lists(sorted_sequences, radius, cache_dir=None):
+    radius = max(radius, 0)
+    if cache_dir is None:
+        return compute_neighbor_lists(sorted_sequences, radius)
+
+    key = sequence_set_hash(sorted_sequences)
+    meta_path = os.path.join(cache_dir, f"{key}.json")
+    array_paths = {name: os.path.join(cache_dir, f"{key}.{name}.npy") for name in ('indptr', 'indices', 'distances')}
+
+    # Load the cached neighbour lists (memory-mapped) if they were built up to at least the requested radius
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['radius'] >= radius and meta['n_sequences'] == len(sorted_sequences):
+            return tuple(np.load(array_paths[name], mmap_mode='r') for name in ('indptr', 'indices', 'distances'))
+
+    # Otherwise compute them and save them, writing the metadata file last so that only complete caches are ever loaded
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = compute_neighbor_lists(sorted_sequences, radius)
+    for name, array in zip(('indptr', 'indices', 'distances'), arrays):
+        tmp_path = array_paths[name] + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, array_paths[name])
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump({'n_sequences': len(sorted_sequences), 'radius': radius}, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return arrays
@@ -0,0 +1,275 @@
+"""
+Runs the whole post-processing pipeline (BIASED) in a single pass over the input, without writing an intermediate file per step:
+    1. Filtering, deduplication and family assignment are chained as a generator pipeline over chunks of the input (filtering.py, ../shared/dedup.py, family_assign.py)
+    2. The resulting positive examples are spooled to a temporary file, while indexing the byte offsets of the rows of each gene
+    3. Negatives are generated for all ratios in one pass over the gene blocks of the spool (make_neg_sets.py), and each row is written directly
+       to the train or test file of its ratio, according to its test column (or to its chromosome, with --test_chromosomes), which is dropped
+       (../shared/split_train_test.py)
+
+The output is the same as that of post_process.sh -u, with the genes visited in bytewise order (as after `LC_ALL=C sort`), which only matches
+the sorting step of post_process.sh in the C locale. Intermediate files are only written for debugging, with --keep_intermediates.
+
+An interrupted run can be resumed with --resume, as for make_neg_sets.py: once the positive examples are spooled, a checkpoint is written
+every few gene blocks, with the offsets of the train, test and reject files and the state of each ratio, and the spool is kept until the run
+completes. A resumed run truncates the output files to the checkpoint and continues negative generation from there, without filtering the
+input again, and gives the same output as an uninterrupted run. A run interrupted before the spool is complete starts over.
+
+Usage:
+    python pipeline.py --ifile <INPUT_TSV> --mature <MATURE_FA> --output_dir <OUTPUT_DIR> [--neg_ratios <RATIO>[,<RATIO>...]] [--min_required_edit_distance <DIST>] [--distance_cache_dir <DIR>] [--distance_cache_radius <DIST>] [--chunksize <ROWS>] [--tmp_dir <DIR>] [--keep_intermediates <DIR>] [--write_buffer_size <BYTES>] [--test_chromosomes <CHR>[,<CHR>...]] [--resume] [--checkpoint_file <CKPT>] [--checkpoint_every <BLOCKS>]
+
+Arguments:
+    --ifile                         Input data file (TSV, optionally compressed as .tsv.gz or .tsv.zst)
+    --mature                        Mature miRNA FASTA file (mature.fa downloaded from miRBase)
+    --output_dir                    Output directory for the train/test files, named <INPUT>_train_<RATIO>.tsv and <INPUT>_test_<RATIO>.tsv
+    --neg_ratios                    Comma-separated negative ratios (default: 1,10,100)
+    --min_required_edit_distance    Minimum edit distance required between positive and negative miRNAs (default: 3)
+    --distance_cache_dir            Directory for the on-disk miRNA neighbour cache (optional; default: no cache)
+    --distance_cache_radius         Edit distance up to which neighbours are cached when the cache is built (default: 5)
+    --chunksize                     Number of rows of the input file processed at a time (default: 100000)
+    --tmp_dir                       Directory for the spool of positive examples, removed once the run completes (default: the output directory)
+    --keep_intermediates            Directory to also write the filtered, deduplicated and family assigned files, and the rejected positive examples, to (optional)
+    --write_buffer_size             Buffer size in bytes of each output file writer (default: 1048576)
+    --test_chromosomes              Comma-separated chromosomes of the test set, instead of the test column set by filtering.py (optional)
+    --resume                        Resume from the checkpoint of an interrupted run, if any, truncating the output files to it; the output is the same as that of an uninterrupted run
+    --checkpoint_file               Checkpoint file, removed once the run completes (default: <OUTPUT_DIR>/<INPUT>_pipeline.ckpt)
+    --checkpoint_every              Number of gene blocks between checkpoints (default: 1000)
+"""
+
+import argparse
+from array import array
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+import os
+import random
+import time
+import pandas as pd
+from blocks import index_blocks, yield_indexed_blocks
+from checkpoint import get_file_fingerprint, encode_rng_state, restore_rng_state, get_synced_offset, write_checkpoint, read_checkpoint, truncate_outputs, skip_completed, remove_checkpoint
+from compressed_io import strip_compression
+from dedup import Deduplicator
+from family_assign import load_mature_sequences, filter_and_create_table as assign_families
+from filtering import read_filtered_chunks
+from make_neg_sets import precompute_allowed_mirnas, get_seqm_fam_first_rows, get_unique_seqm_fam_pairs, process_gene_block, report_ratio_runs
+from split_train_test import TrainTestWriter, get_test_rule
+from table_io import read_table
+
+# Suffixes of the intermediate and output files, as in post_process.sh
+FILTERED_SUFFIX = "_filtered_data.tsv"
+DEDUPLICATED_SUFFIX = "_deduplicated_data.tsv"
+FAMILY_ASSIGNED_SUFFIX = "_family_assigned_data.tsv"
+TRAIN_SUFFIX = "_train_"
+TEST_SUFFIX = "_test_"
+NEG_SUFFIX = "_with_negatives_"
+SPOOL_SUFFIX = ".spool.tsv"
+CHECKPOINT_SUFFIX = "_pipeline.ckpt"
+
+# Drop the rows whose (gene, noncodingRNA) pair was already seen, in this or a previous chunk, keyed by digest as in dedup.py
+def dedup_stage(chunks, deduplicator):
+    for chunk in chunks:
+        yield chunk[deduplicator.keep_mask(chunk['gene'].fillna(''), chunk['noncodingRNA'].fillna(''))]
+
+# Assign miRNA families to each chunk from the mature miRNA sequences
+def family_assign_stage(chunks, mature_sequences):
+    for chunk in chunks:
+        yield assign_families(chunk, mature_sequences)
+
+# Also append each chunk to a file, if a path is given, for debugging
+def tee_stage(chunks, path):
+    for chunk_no, chunk in enumerate(chunks):
+        if path is not None:
+            chunk.to_csv(path, sep='\t', index=False, mode='w' if chunk_no == 0 else 'a', header=chunk_no == 0)
+        yield chunk
+
+# Write the chunks of positive examples to a spool file, and get its header columns, the byte offsets of the rows of each gene,
+# and the unique (noncodingRNA, noncodingRNA_fam) pairs with the first gene of each, in sorted gene order (see make_neg_sets.py)
+def spool_positives(chunks, spool_file, key_column='gene'):
+    header_columns = None
+    block_offsets = defaultdict(lambda: array('q'))
+    mirna_fam_first_rows = []
+    offset = 0
+
+    for chunk in chunks:
+        if header_columns is None:
+            header_columns = list(chunk.columns)
+            key_index = header_columns.index(key_column)
+            header = chunk.head(0).to_csv(sep='\t', index=False).encode()
+            spool_file.write(header)
+            offset += len(header)
+
+        for line in chunk.to_csv(sep='\t', index=False, header=False).encode().splitlines(keepends=True):
+            block_offsets[line.rstrip(b'\r\n').split(b'\t')[key_index]].append(offset)
+            offset += len(line)
+            spool_file.write(line)
+
+        # The genes are compared as written to the spool, as the gene blocks are visited in the sorted order of the spooled genes
+        pairs = chunk[['noncodingRNA', 'noncodingRNA_fam']].assign(gene=chunk[key_column].fillna('').astype(str))
+        mirna_fam_first_rows.append(get_seqm_fam_first_rows(pairs, 'gene'))
+
+    if header_columns is None:
+        raise ValueError("The input file has no rows")
+
+    return header_columns, block_offsets, pd.concat(mirna_fam_first_rows)
+
+def main():
+    # Record start time
+    start = time.time()
+
+    parser = argparse.ArgumentParser(description="Run the biased post-processing pipeline in a single pass, without intermediate files.")
+    parser.add_argument('--ifile', required=True, help="Input data file")
+    parser.add_argument('--mature', required=True, help="Mature miRNA file")
+    parser.add_argument('--output_dir', required=True, help="Output directory for the train/test files")
+    parser.add_argument('--neg_ratios', default='1,10,100', help="Comma-separated negative ratios (default: 1,10,100)")
+    parser.add_argument('--min_required_edit_distance', type=int, default=3, help="Minimum required edit distance for negative examples")
+    parser.add_argument('--distance_cache_dir', type=str, default=None, help="Directory for the on-disk miRNA neighbour cache (default: no cache)")
+    parser.add_argument('--distance_cache_radius', type=int, default=5, help="Edit distance up to which neighbours are cached, if the cache is built (default: 5)")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Number of rows processed at a time")
+    parser.add_argument('--tmp_dir', type=str, default=None, help="Directory for the spool of positive examples (default: the output directory)")
+    parser.add_argument('--keep_intermediates', type=str, default=None, help="Directory to also write the intermediate files to, for debugging")
+    parser.add_argument('--write_buffer_size', type=int, default=1024 * 1024, help="Buffer size in bytes of each output file writer (default: 1 MiB)")
+    parser.add_argument('--test_chromosomes', type=str, default=None, help="Comma-separated chromosomes of the test set, instead of the test column")
+    parser.add_argument('--resume', action='store_true', help="Resume from the checkpoint of an interrupted run, if any")
+    parser.add_argument('--checkpoint_file', type=str, default=None, help="Checkpoint file (default: <output_dir>/<input>_pipeline.ckpt)")
+    parser.add_argument('--checkpoint_every', type=int, default=1000, help="Number of gene blocks between checkpoints (default: 1000)")
+    args = parser.parse_args()
+
+    neg_ratios = args.neg_ratios.split(',')
+    base_name = os.path.basename(strip_compression(args.ifile))
+    base_name = base_name[:-len('.tsv')] if base_name.endswith('.tsv') else base_name
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Get the path of an intermediate file, if intermediates are kept
+    def intermediate_path(suffix):
+        if args.keep_intermediates is None:
+            return None
+        os.makedirs(args.keep_intermediates, exist_ok=True)
+        return os.path.join(args.keep_intermediates, f"{base_name}{suffix}")
+
+    spool_path = os.path.join(args.tmp_dir or args.output_dir, f"{base_name}{SPOOL_SUFFIX}")
+
+    # A checkpoint is only resumed for the same input files and options, and with the spool it was written for
+    checkpoint_file = args.checkpoint_file or os.path.join(args.output_dir, f"{base_name}{CHECKPOINT_SUFFIX}")
+    run = {
+        'ifile': get_file_fingerprint(args.ifile),
+        'mature': get_file_fingerprint(args.mature),
+        'neg_ratios': neg_ratios,
+        'min_required_edit_distance': args.min_required_edit_distance,
+        'test_chromosomes': args.test_chromosomes,
+        'keep_intermediates': args.keep_intermediates
+    }
+    checkpoint = read_checkpoint(checkpoint_file, run) if args.resume else None
+    if checkpoint is not None and (not os.path.exists(spool_path) or get_file_fingerprint(spool_path) != checkpoint['spool']):
+        print(f"Spool {spool_path} is missing or differs from the one of checkpoint {checkpoint_file}. Starting over.", flush=True)
+        checkpoint = None
+
+    if checkpoint is None:
+        # Filter, deduplicate and assign families chunk by chunk, and spool the positive examples
+        mature_sequences = load_mature_sequences(args.mature)
+        with open(spool_path, 'wb') as spool_file:
+            chunks = tee_stage(read_filtered_chunks(args.ifile, args.chunksize), intermediate_path(FILTERED_SUFFIX))
+            deduplicator = Deduplicator()
+            chunks = tee_stage(dedup_stage(chunks, deduplicator), intermediate_path(DEDUPLICATED_SUFFIX))
+            chunks = tee_stage(family_assign_stage(chunks, mature_sequences), intermediate_path(FAMILY_ASSIGNED_SUFFIX))
+            header_columns, block_offsets, positive_samples = spool_positives(chunks, spool_file)
+        column_index = {column: idx for idx, column in enumerate(header_columns)}
+        print(f"Deduplication dropped {deduplicator.dropped} duplicate rows of {deduplicator.rows} rows.")
+        print(f"Filtering, deduplication and family assignment completed in {time.time() - start:.1f} s.", flush=True)
+    else:
+        # Index the spool of the interrupted run and read its positive examples, as make_neg_sets.py does for an unsorted input
+        header_columns, column_index, block_offsets = index_blocks(spool_path, 'gene')
+        positive_samples = read_table(spool_path, columns=['gene', 'noncodingRNA', 'noncodingRNA_fam'], dtype={'gene': str})
+        positive_samples['gene'] = positive_samples['gene'].fillna('')
+    spool_fingerprint = get_file_fingerprint(spool_path)
+
+    unique_seqm_fam_pairs_dict = get_unique_seqm_fam_pairs(positive_samples, 'gene')
+    allowed_mirnas = precompute_allowed_mirnas(positive_samples, args.min_required_edit_distance, args.distance_cache_dir, args.distance_cache_radius)
+    del positive_samples
+
+    test_chromosomes = args.test_chromosomes.split(',') if args.test_chromosomes else None
+    is_test = get_test_rule(header_columns, test_chromosomes=test_chromosomes)
+
+    with ExitStack() as stack:
+        # Set up the train/test writer, reject writer and random generator of each neg_ratio, as in make_neg_sets.py
+        ratio_runs = []
+        for neg_ratio in neg_ratios:
+            train_file = os.path.join(args.output_dir, f"{base_name}{TRAIN_SUFFIX}{neg_ratio}.tsv")
+            test_file = os.path.join(args.output_dir, f"{base_name}{TEST_SUFFIX}{neg_ratio}.tsv")
+            ratio_runs.append({
+                'neg_ratio': neg_ratio,
+                'train_file': train_file,
+                'test_file': test_file,
+                'ofile': f"{train_file} and {test_file}",
+                'reject_file': intermediate_path(f"{NEG_SUFFIX}{neg_ratio}.rejected.tsv") or os.devnull,
+                'rng': random.Random(42),
+                'unsuccessful': 0,
+                'rejected': Counter()
+            })
+
+        # Generate negatives for the gene blocks of the spool, visited in sorted gene order as for the unsorted input of make_neg_sets.py
+        gene_blocks = yield_indexed_blocks(spool_path, column_index, block_offsets)
+
+        if checkpoint is not None:
+            # Continue from the checkpoint: truncate the train, test and reject files to it, and restore the state of each neg_ratio
+            truncate_outputs(checkpoint)
+            for ratio_run, ratio_state in zip(ratio_runs, checkpoint['ratio_states']):
+                restore_rng_state(ratio_run['rng'], ratio_state['rng'])
+                ratio_run['unsuccessful'] = ratio_state['unsuccessful']
+                ratio_run['rejected'] = Counter({(reason, kind): count for reason, kind, count in ratio_state['rejected']})
+            gene_blocks = skip_completed(gene_blocks, checkpoint['n_blocks'], checkpoint['last_block_key'])
+            n_blocks = checkpoint['n_blocks']
+            last_block_key = checkpoint['last_block_key']
+            print(f"Resuming from checkpoint {checkpoint_file} after {n_blocks} gene blocks (last gene block: {last_block_key}).", flush=True)
+        else:
+            n_blocks = 0
+            last_block_key = None
+
+        mode = 'a' if checkpoint is not None else 'w'
+        for ratio_run in ratio_runs:
+            ratio_run['writer'] = stack.enter_context(TrainTestWriter(ratio_run['train_file'], ratio_run['test_file'], header_columns, is_test=is_test, buffering=args.write_buffer_size, mode=mode))
+            ratio_run['reject_writer'] = stack.enter_context(open(ratio_run['reject_file'], mode, buffering=args.write_buffer_size))
+            if checkpoint is None:
+                ratio_run['reject_writer'].write('\t'.join(header_columns + ['reject_reason']) + '\n')
+
+        # Save the number and key of the completed gene blocks, the offsets of the train, test and reject files, and the state of each neg_ratio
+        def save_checkpoint():
+            offsets = {}
+            ratio_states = []
+            for ratio_run in ratio_runs:
+                offsets[ratio_run['train_file']] = get_synced_offset(ratio_run['writer'].train_file)
+                offsets[ratio_run['test_file']] = get_synced_offset(ratio_run['writer'].test_file)
+                if ratio_run['reject_file'] != os.devnull:
+                    offsets[ratio_run['reject_file']] = get_synced_offset(ratio_run['reject_writer'])
+                ratio_states.append({
+                    'rng': encode_rng_state(ratio_run['rng']),
+                    'unsuccessful': ratio_run['unsuccessful'],
+                    'rejected': [[reason, kind, count] for (reason, kind), count in ratio_run['rejected'].items()]
+                })
+            write_checkpoint(checkpoint_file, {'run': run, 'spool': spool_fingerprint, 'n_blocks': n_blocks, 'last_block_key': last_block_key, 'offsets': offsets, 'ratio_states': ratio_states})
+
+        save_checkpoint()
+
+        for block in gene_blocks:
+
+            process_gene_block(block, allowed_mirnas, unique_seqm_fam_pairs_dict, ratio_runs)
+
+            n_blocks += 1
+            last_block_key = block.key
+            if n_blocks % args.checkpoint_every == 0:
+                save_checkpoint()
+
+    # The run is complete, so its checkpoint and spool are no longer needed
+    remove_checkpoint(checkpoint_file)
+    os.remove(spool_path)
+
+    report_ratio_runs(ratio_runs)
+
+    for ratio_run in ratio_runs:
+        print(f"Train and test sets for ratio {ratio_run['neg_ratio']} saved to {ratio_run['ofile']}")
+
+    # Record end time
+    end = time.time()
+
+    # Print the difference between start and end time in secs
+    print(f"The time of execution for neg_ratios {args.neg_ratios} is:", (end - start), "s")
+
+if __name__ == "__main__":
+    main()
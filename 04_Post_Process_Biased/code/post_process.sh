@@ -2,40 +2,62 @@
 
 # Post-processing pipeline (BIASED) for miRNA-target site datasets:
 #   1. Filtering                (code/filtering.py)
-#   2. Deduplication
+#   2. Deduplication            (../shared/dedup.py)
 #   3. Family assignment        (code/family_assign.py)
-#   4. Sorting
-#   5. Negative generation      (code/make_neg_sets.py)
-#   6. Train/test splitting
-#   7. Removal of the test column from train/test sets
+#   4. Sorting                  (skipped with -u)
+#   5. Negative generation      (code/make_neg_sets.py; with -u, reads the unsorted file via an index instead)
+#   6. Train/test splitting and removal of the test column, in one pass (../shared/split_train_test.py)
+# With -f, all steps run fused in a single pass over the input (code/pipeline.py), with the same output as with -u and no intermediate files.
+# Negative generation (also with -f, once the positive examples are spooled) writes checkpoints, and an interrupted run is resumed from
+# its last checkpoint by running the script again.
+#
+# The sorting step sorts the family assigned file with `sort -k 1` in the current locale, as for the published datasets. With -u (and -f),
+# genes are visited in bytewise order instead, as after `LC_ALL=C sort`, which only gives the same output as the sorting step in the C locale:
+# the published datasets are only reproduced without -u and -f.
 #
 # Usage:
-#   bash post_process.sh -i <INPUT_TSV> [-o <OUTPUT_DIR>] [-n <INTERMEDIATE_DIR>] [-t <NEG_RATIOS>] [-r <MIN_EDIT_DIST>]
+#   bash post_process.sh -i <INPUT_TSV> [-o <OUTPUT_DIR>] [-n <INTERMEDIATE_DIR>] [-t <NEG_RATIOS>] [-r <MIN_EDIT_DIST>] [-x <FORMAT>] [-c <TEST_CHROMOSOMES>] [-u] [-f]
 #
 # Arguments:
-#   -i   Input data file (TSV, required)
+#   -i   Input data file (TSV, optionally compressed as .tsv.gz or .tsv.zst; required)
 #   -o   Output directory for train/test files (optional; default: ./output)
 #   -n   Directory for intermediate files (optional; default: ./intermediate)
 #   -t   Comma-separated negative ratios (e.g., 1,10,100; optional; default: 1,10,100)
 #   -r   Minimum required edit distance (optional; default: 3)
+#   -x   Format of the filtered, deduplicated and family assigned files: tsv, tsv.gz, tsv.zst, feather or parquet (optional; default: tsv;
+#        see ../shared/table_io.py and ../shared/compressed_io.py); without -u, the family assigned file is always TSV, to be sorted
+#   -c   Comma-separated chromosomes of the test set, instead of the test column set by filtering (chromosome 1; optional)
+#   -u   Read the family assigned file unsorted via an index of row byte offsets, instead of sorting it (optional; does not reproduce the
+#        published datasets, see above)
+#   -f   Run the fused single-pass pipeline instead of the separate steps (optional; does not reproduce the published datasets, see above)
 
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python modules shared by the analyses (compressed_io.py, table_io.py, blocks.py, checkpoint.py, dedup.py, split_train_test.py) are imported from shared/
+# at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 # parse command-line arguments
-while getopts i:o:n:t:r: flag; do
+fused=false
+unsorted=false
+while getopts i:o:n:t:r:x:c:uf flag; do
     case "${flag}" in
         i) input_file=${OPTARG};;
         o) output_dir=${OPTARG};;
         n) intermediate_dir=${OPTARG};;
         t) IFS=',' read -r -a neg_ratios <<< "${OPTARG}";;
         r) min_edit_distance=${OPTARG};;
+        x) intermediate_format=${OPTARG};;
+        c) test_chromosomes=${OPTARG};;
+        u) unsorted=true;;
+        f) fused=true;;
     esac
 done
 
 # check if required argument is provided
 if [ -z "$input_file" ]; then
-    echo "Usage: $0 -i input_file [-o output_dir] [-n intermediate_dir] [-t neg_ratios] [-r min_edit_distance]"
+    echo "Usage: $0 -i input_file [-o output_dir] [-n intermediate_dir] [-t neg_ratios] [-r min_edit_distance] [-x tsv|tsv.gz|tsv.zst|feather|parquet] [-c test_chromosomes] [-u] [-f]"
     exit 1
 fi
 
@@ -43,6 +65,15 @@ fi
 default_ratios=(1 10 100)
 neg_ratios=( "${neg_ratios[@]:-"${default_ratios[@]}"}" )
 min_edit_distance=${min_edit_distance:-3}
+intermediate_format=${intermediate_format:-tsv}
+case "$intermediate_format" in
+    tsv|tsv.gz|tsv.zst|feather|parquet) ;;
+    *) echo "Unknown intermediate format: $intermediate_format (expected tsv, tsv.gz, tsv.zst, feather or parquet)"; exit 1;;
+esac
+split_args=()
+if [ -n "${test_chromosomes:-}" ]; then
+    split_args=(--test_chromosomes "$test_chromosomes")
+fi
 
 # define directories for output and intermediate files
 output_dir="${output_dir:-$(pwd)/output}"
@@ -60,22 +91,47 @@ if [ ! -f "$mature_file" ]; then
     echo "Download completed. File saved to $mature_file"
 fi
 
-# define constants for suffixes with extensions
-FILTERED_SUFFIX="_filtered_data.tsv"
-DEDUPLICATED_SUFFIX="_deduplicated_data.tsv"
-FAMILY_ASSIGNED_SUFFIX="_family_assigned_data.tsv"
+# define constants for suffixes with extensions (the final train/test files, and the files with negatives they are split from, are always TSV)
+FILTERED_SUFFIX="_filtered_data.${intermediate_format}"
+DEDUPLICATED_SUFFIX="_deduplicated_data.${intermediate_format}"
+FAMILY_ASSIGNED_SUFFIX="_family_assigned_data.$([ "$unsorted" = true ] && echo "$intermediate_format" || echo tsv)"
 SORTED_FAMILY_ASSIGNED_SUFFIX="_family_assigned_data_sorted.tsv"
 TRAIN_SUFFIX="_train_"
 TEST_SUFFIX="_test_"
 NEG_SUFFIX="_with_negatives_"
 
 # define file names based on the input file
-base_name=$(basename "$input_file" .tsv)
+base_name=$(basename "${input_file%.gz}")
+base_name=$(basename "${base_name%.zst}" .tsv)
 filtered_file="$intermediate_dir/${base_name}${FILTERED_SUFFIX}"
 deduplicated_file="$intermediate_dir/${base_name}${DEDUPLICATED_SUFFIX}"
 family_assigned_file="$intermediate_dir/${base_name}${FAMILY_ASSIGNED_SUFFIX}"
 family_assigned_file_sorted="$intermediate_dir/${base_name}${SORTED_FAMILY_ASSIGNED_SUFFIX}"
 
+# Fused pipeline: all steps in a single pass, for the ratios whose train and test files are not generated yet, or are from an interrupted
+# run (with a checkpoint), which is resumed
+if [ "$fused" = true ]; then
+    fused_checkpoint="$intermediate_dir/${base_name}_pipeline.ckpt"
+    missing_ratios=()
+    for ratio in "${neg_ratios[@]}"; do
+        if [ -f "$output_dir/${base_name}${TRAIN_SUFFIX}${ratio}.tsv" ] && [ -f "$output_dir/${base_name}${TEST_SUFFIX}${ratio}.tsv" ] && [ ! -f "$fused_checkpoint" ]; then
+            echo "Train and test files for ratio $ratio already exist. Skipping this ratio."
+        else
+            missing_ratios+=("$ratio")
+        fi
+    done
+    if [ ${#missing_ratios[@]} -gt 0 ]; then
+        ratios_arg=$(IFS=','; echo "${missing_ratios[*]}")
+        echo "Running the fused post-processing pipeline with ratios $ratios_arg..."
+        python3 "code/pipeline.py" --ifile "$input_file" --mature "$mature_file" --output_dir "$output_dir" --neg_ratios "$ratios_arg" --min_required_edit_distance "$min_edit_distance" --distance_cache_dir "$intermediate_dir/distance_cache" --tmp_dir "$intermediate_dir" --checkpoint_file "$fused_checkpoint" --resume ${split_args[@]+"${split_args[@]}"}
+    fi
+    echo
+    echo "==================================================================="
+    echo "Post-processing pipeline completed successfully."
+    echo "==================================================================="
+    exit 0
+fi
+
 # Step 1: Filtering
 echo
 echo "Running filtering step..."
@@ -89,9 +145,9 @@ fi
 # Step 2: Deduplication
 echo
 echo "Running deduplication step..."
-# deduplicate based on combination of first two columns
+# deduplicate based on the pair of the first two columns (gene and noncodingRNA)
 if [ ! -f "$deduplicated_file" ]; then
-    awk -F'\t' 'NR==1{print $0} NR>1{if(!seen[$1$2]++){print}}' "$filtered_file" > "$deduplicated_file"
+    python3 "../shared/dedup.py" --ifile "$filtered_file" --ofile "$deduplicated_file"
     echo "Deduplication completed. Output saved to $deduplicated_file"
 else
     echo "File $deduplicated_file already exists. Skipping deduplication step."
@@ -107,33 +163,50 @@ else
     echo "File $family_assigned_file already exists. Skipping family assignment step."
 fi
 
-# Step 4: Sort the family assigned file based on the first (gene) column in preparation for negative sample generation
-echo
-echo "Sorting the family assigned file based on the first (gene) column..."
-if [ ! -f "$family_assigned_file_sorted" ]; then
-    (head -n 1 "$family_assigned_file" && tail -n +2 "$family_assigned_file" | sort -k 1) > "${family_assigned_file_sorted}"
-    echo "Family assigned file sorted. Output saved to $family_assigned_file_sorted"
+# Step 4: Sort the family assigned file based on the first (gene) column in preparation for negative sample generation (with -u, the unsorted
+# file is read via an index instead)
+if [ "$unsorted" = true ]; then
+    neg_input_file="$family_assigned_file"
+    neg_input_args=(--unsorted)
 else
-    echo "File $family_assigned_file_sorted already exists. Skipping sorting step."
+    echo
+    echo "Sorting the family assigned file based on the first (gene) column..."
+    if [ ! -f "$family_assigned_file_sorted" ]; then
+        (head -n 1 "$family_assigned_file" && tail -n +2 "$family_assigned_file" | sort -k 1) > "${family_assigned_file_sorted}"
+        echo "Family assigned file sorted. Output saved to $family_assigned_file_sorted"
+    else
+        echo "File $family_assigned_file_sorted already exists. Skipping sorting step."
+    fi
+    neg_input_file="$family_assigned_file_sorted"
+    neg_input_args=()
 fi
 
-# Step 5: Make negatives with different ratios
+# Step 5: Make negatives with different ratios, in a single pass over the family assigned file for all ratios that are not generated yet
 echo
+# An interrupted run leaves a checkpoint, and is resumed for the same ratios, with their partial outputs truncated to the checkpoint
+neg_checkpoint="$intermediate_dir/${base_name}${NEG_SUFFIX}checkpoint.ckpt"
+missing_ratios=()
 for ratio in "${neg_ratios[@]}"; do
-    echo "Generating negative samples with ratio $ratio..."
     neg_output="$intermediate_dir/${base_name}${NEG_SUFFIX}${ratio}.tsv"
-    if [ -f "$neg_output" ]; then
+    if [ -f "$neg_output" ] && [ ! -f "$neg_checkpoint" ]; then
         echo "File $neg_output already exists. Skipping negative generation for ratio $ratio."
-        continue
+    else
+        missing_ratios+=("$ratio")
     fi
-    python3 "code/make_neg_sets.py" --ifile "$family_assigned_file_sorted" --ofile "$neg_output" --neg_ratio "$ratio" --min_required_edit_distance "$min_edit_distance"
-    echo "File with negative samples for ratio $ratio saved to $neg_output"
 done
+if [ ${#missing_ratios[@]} -gt 0 ]; then
+    ratios_arg=$(IFS=','; echo "${missing_ratios[*]}")
+    echo "Generating negative samples with ratios $ratios_arg..."
+    python3 "code/make_neg_sets.py" --ifile "$neg_input_file" ${neg_input_args[@]+"${neg_input_args[@]}"} --ofile "$intermediate_dir/${base_name}${NEG_SUFFIX}{ratio}.tsv" --neg_ratio "$ratios_arg" --min_required_edit_distance "$min_edit_distance" --distance_cache_dir "$intermediate_dir/distance_cache" --checkpoint_file "$neg_checkpoint" --resume
+    for ratio in "${missing_ratios[@]}"; do
+        echo "File with negative samples for ratio $ratio saved to $intermediate_dir/${base_name}${NEG_SUFFIX}${ratio}.tsv"
+    done
+fi
 echo "Negative samples generation completed."
 
-# Step 6: Split Train/Test based on the test column
+# Step 6: Split Train/Test based on the test column (or the test chromosomes), and remove the test column, in one pass
 echo
-echo "Splitting data into train and test sets based on the test column..."
+echo "Splitting data into train and test sets and removing the test column..."
 for ratio in "${neg_ratios[@]}"; do
     neg_file="$intermediate_dir/${base_name}${NEG_SUFFIX}${ratio}.tsv"
     train_file="$output_dir/${base_name}${TRAIN_SUFFIX}${ratio}.tsv"
@@ -142,25 +215,9 @@ for ratio in "${neg_ratios[@]}"; do
         echo "Train and test files for ratio $ratio already exist. Skipping split for this ratio."
         continue
     fi
-    awk -F'\t' 'NR==1{header=$0; print header > "'"$train_file"'"; print header > "'"$test_file"'"} NR>1{if($5=="False"){print > "'"$train_file"'"} else {print > "'"$test_file"'"}}' "$neg_file"
-    echo "Data split completed. Train set saved to $train_file, test set saved to $test_file"
-done
-
-# Step 7: Remove the fifth (test) column from the train and test files
-echo
-echo "Removing the fifth (test) column from the train and test sets..."
-for ratio in "${neg_ratios[@]}"; do
-    for suffix in "$TRAIN_SUFFIX" "$TEST_SUFFIX"; do
-        file="$output_dir/${base_name}${suffix}${ratio}.tsv"
-        if [[ $(head -1 "$file" | awk -F'\t' '{print $5}') == "test" ]]; then
-            # Use awk to remove the fifth column without causing column shifts
-            awk -F'\t' 'BEGIN{OFS="\t"} {for(i=1;i<=NF;i++) if(i!=5) printf "%s%s", $i, (i==NF?"\n":OFS)}' "$file" > "${file}_tmp" && mv "${file}_tmp" "$file"
-        else
-            echo "No 'test' column in position 5 for $file; skipping."
-        fi
-    done
+    python3 "../shared/split_train_test.py" --ifile "$neg_file" --train_file "$train_file" --test_file "$test_file" ${split_args[@]+"${split_args[@]}"}
 done
-echo "Fifth (test) column removed from train set and test sets."
+echo "Train and test sets without the test column completed."
 
 echo
 echo "==================================================================="
@@ -8,6 +8,9 @@
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python module shared by the analyses (compressed_io.py) is imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 mkdir -p results
 
 exec > >(tee -a results/RUNME_0.log) 2>&1
@@ -92,7 +95,7 @@ done
 
 # --- Unbiased Manakov loop ---
 echo
-echo "Downloading and gunzipping the unbiased Manakov datasets..."
+echo "Downloading the unbiased Manakov datasets (kept gzipped, read compressed by ../shared/compressed_io.py)..."
 for SET in TRAIN TEST LEFTOUT; do
     GZ_VAR="UNBIASED_MANAKOV_${SET}_GZ"
     TSV_VAR="UNBIASED_MANAKOV_${SET}"
@@ -100,11 +103,10 @@ for SET in TRAIN TEST LEFTOUT; do
     GZ="${!GZ_VAR}"
     TSV="${!TSV_VAR}"
     URL="${!URL_VAR}"
-    if [ ! -f "$TSV" ]; then
+    if [ ! -f "$TSV" ] && [ ! -f "$GZ" ]; then
         wget --progress=dot:giga -nc -O "$GZ" "$URL"
-        gunzip "$GZ"
     else
-        echo "$TSV already exists, skipping download and gunzip."
+        echo "$GZ or $TSV already exists, skipping download."
     fi
 done
 
@@ -126,7 +128,7 @@ done
 
 # --- Corrected Hejret loop ---
 echo
-echo "Downloading and gunzipping the corrected Hejret datasets..."
+echo "Downloading the corrected Hejret datasets (kept gzipped, read compressed by ../shared/compressed_io.py)..."
 for SET in TRAIN TEST; do
     GZ_VAR="CORR_HEJRET_${SET}_GZ"
     TSV_VAR="CORR_HEJRET_${SET}"
@@ -134,11 +136,10 @@ for SET in TRAIN TEST; do
     GZ="${!GZ_VAR}"
     TSV="${!TSV_VAR}"
     URL="${!URL_VAR}"
-    if [ ! -f "$TSV" ]; then
+    if [ ! -f "$TSV" ] && [ ! -f "$GZ" ]; then
         wget --progress=dot:giga -nc -O "$GZ" "$URL"
-        gunzip "$GZ"
     else
-        echo "$TSV already exists, skipping download and gunzip."
+        echo "$GZ or $TSV already exists, skipping download."
     fi
 done
 
@@ -8,6 +8,9 @@
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python module shared by the analyses (compressed_io.py) is imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 mkdir -p results
 
 exec > >(tee -a results/RUNME_1.log) 2>&1
@@ -18,6 +21,17 @@ K=3
 COLUMN_NAME="noncodingRNA"
 DATASETS=("biasedManakov" "originalHejret" "miraw" "Yang" "unbiasedManakov" "correctedHejret")
 
+# ========= HELPER FUNCTION ==========
+
+# Get the path of a dataset, or of its gzipped version if only that one exists (the Python scripts read compressed TSV files directly)
+dataset_path() {
+    if [[ ! -f "$1" && -f "$1.gz" ]]; then
+        echo "$1.gz"
+    else
+        echo "$1"
+    fi
+}
+
 # ========= SCRIPT STARTS ==========
 
 for DATASET in "${DATASETS[@]}"; do
@@ -33,8 +47,8 @@ for DATASET in "${DATASETS[@]}"; do
     INFERENCE_DIR="results/predictions/${DATASET}"
     EVALUATION_DIR="results/evaluation/${DATASET}"
 
-    TRAIN_TSV="${DATA_DIR}/${DATASET}_train_set.tsv"
-    TEST_TSV="${DATA_DIR}/${DATASET}_test_set.tsv"
+    TRAIN_TSV=$(dataset_path "${DATA_DIR}/${DATASET}_train_set.tsv")
+    TEST_TSV=$(dataset_path "${DATA_DIR}/${DATASET}_test_set.tsv")
 
     TRAIN_ENCODED="${ENCODING_DIR}/${DATASET}_train_set_encoded.tsv"
     TEST_ENCODED="${ENCODING_DIR}/${DATASET}_test_set_encoded.tsv"
@@ -52,7 +66,7 @@ for DATASET in "${DATASETS[@]}"; do
     # ==== Additional file naming conventions for unbiasedManakov (leftout set) ====
 
     if [[ "$DATASET" == "unbiasedManakov" ]]; then
-        LEFTOUT_TSV="${DATA_DIR}/${DATASET}_leftout_set.tsv"
+        LEFTOUT_TSV=$(dataset_path "${DATA_DIR}/${DATASET}_leftout_set.tsv")
 
         LEFTOUT_ENCODED="${ENCODING_DIR}/${DATASET}_leftout_set_encoded.tsv"
 
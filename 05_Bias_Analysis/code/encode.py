@@ -17,6 +17,7 @@ import numpy as np
 from collections import Counter
 from itertools import product
 import argparse
+from compressed_io import read_tsv, write_tsv
 
 def get_all_possible_kmers(k):
     """Generate all possible k-mers for a given k."""
@@ -42,7 +43,7 @@ def main():
     args = parser.parse_args()
     
     # Read the dataset
-    df = pd.read_csv(args.input_dataset, sep="\t")
+    df = read_tsv(args.input_dataset)
     
     # Check if the specified column exists
     if args.column_name not in df.columns:
@@ -52,7 +53,7 @@ def main():
     output_df = kmer_count_matrix(df[args.column_name], args.k)
 
     # Save the k-mer count matrix to a file
-    output_df.to_csv(args.output_encoding, sep="\t", index=False)
+    write_tsv(output_df, args.output_encoding, index=False)
 
     # If output_labels is specified, save the labels
     if args.output_labels:
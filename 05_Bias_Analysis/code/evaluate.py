@@ -15,6 +15,7 @@ import pandas as pd
 import numpy as np
 from sklearn.metrics import average_precision_score
 import argparse
+from compressed_io import write_tsv
 
 def main():
     parser = argparse.ArgumentParser()
@@ -50,7 +51,7 @@ def main():
     })
 
     # Save the metrics to a TSV file
-    metrics_df.to_csv(args.output_metrics, sep="\t", index=False)
+    write_tsv(metrics_df, args.output_metrics, index=False)
 
 if __name__ == "__main__":
     main()
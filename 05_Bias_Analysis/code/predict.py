@@ -11,10 +11,10 @@ Arguments:
     --output_random_predictions  Output path for random predictions (.npy)
 """
 
-import pandas as pd
 import numpy as np
 import joblib
 import argparse
+from compressed_io import read_tsv
 
 def generate_random_predictions(X_test):
     """
@@ -37,7 +37,7 @@ def main():
     args = parser.parse_args()
     
     # Read the encoded test set
-    X_test = pd.read_csv(args.encoded_test_set, sep="\t")
+    X_test = read_tsv(args.encoded_test_set)
 
     # Load the trained model
     model = joblib.load(args.model)
@@ -12,6 +12,7 @@ Arguments:
 
 import argparse
 import pandas as pd
+from compressed_io import write_tsv
 
 def main():
     parser = argparse.ArgumentParser(description="Preprocess Yang datasets: concatenate, label, and rename columns to miRBench standard.")
@@ -37,7 +38,7 @@ def main():
     combined_df = combined_df.rename(columns={"miRNA_seq": "noncodingRNA"})
 
     # Save
-    combined_df.to_csv(args.output_file, sep='\t', index=False)
+    write_tsv(combined_df, args.output_file, index=False)
 
 if __name__ == "__main__":
     main()
@@ -10,8 +10,8 @@ Arguments:
 """
 
 import argparse
-import pandas as pd
 import sys
+from compressed_io import read_tsv, write_tsv
 
 def main():
     parser = argparse.ArgumentParser(description="Standardise miRAW TSV dataset column names to miRBench convention.")
@@ -20,7 +20,7 @@ def main():
     args = parser.parse_args()
 
     # Read the input TSV file
-    df = pd.read_csv(args.input_file, sep='\t')
+    df = read_tsv(args.input_file)
 
     # List of possible column mappings
     mapping_options = [
@@ -39,7 +39,7 @@ def main():
         sys.exit("Error: No known column mapping pattern found in input file. ")
     
     # Save the processed DataFrame to the output file
-    df.to_csv(args.output_file, sep='\t', index=False)
+    write_tsv(df, args.output_file, index=False)
 
 if __name__ == "__main__":
     main()
@@ -10,11 +10,11 @@ Arguments:
     --output_model       Output path to save trained model (.pkl)
 """
 
-import pandas as pd
 import numpy as np
 from sklearn.tree import DecisionTreeClassifier
 import joblib
 import argparse
+from compressed_io import read_tsv
 
 def main():
     parser = argparse.ArgumentParser()
@@ -24,7 +24,7 @@ def main():
     args = parser.parse_args()
 
     # Read the encoded training set and labels
-    X_train = pd.read_csv(args.encoded_train_set, sep="\t")
+    X_train = read_tsv(args.encoded_train_set)
     y_train = np.load(args.labels)
     
     # Check if the number of samples in X_train matches y_train
@@ -13,13 +13,11 @@ MANAKOV_POS_URL="https://zenodo.org/records/14501607/files/AGO2_eCLIP_Manakov202
 HEJRET_POS_URL="https://raw.githubusercontent.com/ML-Bioinfo-CEITEC/HybriDetector/refs/heads/main/ML/Datasets/AGO2_CLASH_Hejret2023_full_dataset.tsv"
 KLIMENTOVA_URL="https://raw.githubusercontent.com/ML-Bioinfo-CEITEC/miRBind/refs/heads/main/Datasets/AGO2_eCLIP_Klimentova22_full_dataset.tsv"
 
-# Downloading and unzipping the Manakov dataset
-MANAKOV_POS_GZ="data/AGO2_eCLIP_Manakov2022_positives.tsv.gz"
-MANAKOV_POS="data/AGO2_eCLIP_Manakov2022_positives.tsv"
+# Downloading the Manakov dataset, kept gzipped: the pipeline reads compressed TSV files directly (see ../shared/compressed_io.py)
+MANAKOV_POS="data/AGO2_eCLIP_Manakov2022_positives.tsv.gz"
 if [[ ! -f "$MANAKOV_POS" ]]; then
     echo "Downloading positives for eCLIP_Manakov2022..."
-    wget --progress=dot:giga -O "$MANAKOV_POS_GZ" "$MANAKOV_POS_URL"
-    gunzip "$MANAKOV_POS_GZ"
+    wget --progress=dot:giga -O "$MANAKOV_POS" "$MANAKOV_POS_URL"
 else
     echo "File $MANAKOV_POS already exists. Skipping download."
 fi
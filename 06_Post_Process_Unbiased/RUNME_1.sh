@@ -9,8 +9,8 @@
 #   1. Filter and deduplicate positive sets                                             (calls code/0_post_process-filter_and_deduplicate.sh)
 #   2. Exclude overlapping miRNA families to create "excluded" and "remaining" sets     (calls code/1_post_process-exclude_mirna_families.sh)
 #   3. Generate negatives for all major datasets                                        (calls code/2_post_process-make_negatives.sh)
-#   4. Split negatives into train and test sets                                         (calls code/3_post_process-train_test_splits.sh)
-#   5. Drop the "test" column from the new files                                        (calls code/4_post_process-drop_test_col.sh)
+#   4. Split negatives into train and test sets, dropping the "test" column             (calls code/3_post_process-train_test_splits.sh)
+#   5. Drop the "test" column from the sets that are not split                          (calls code/4_post_process-drop_test_col.sh)
 #
 # Usage:
 #   sbatch RUNME_1.sh
@@ -18,8 +18,12 @@
 # Arguments:
 #   All inputs/outputs are specified within the script; no command-line args.
 #
+# The gene sequences of each dataset are clustered in full by default. With CLUSTER_STORE set (see below), gene clusters are kept in a store
+# shared by the datasets instead: the gene sequences not seen in a previous dataset join the cluster of a matching stored representative,
+# and each dataset only clusters the ones matching none.
+#
 # Input files are expected in the `data/` directory, specifically:
-#   - data/AGO2_eCLIP_Manakov2022_positives.tsv
+#   - data/AGO2_eCLIP_Manakov2022_positives.tsv (or gzipped, .tsv.gz, as downloaded by RUNME_0.sh)
 #   - data/AGO2_CLASH_Hejret2023_positives.tsv
 #   - data/AGO2_eCLIP_Klimentova2022_positives.tsv
 # All intermediate and final files are saved in the results/ subdirectories.
@@ -44,6 +48,20 @@ PP3="results/3_post_process"
 PP4="results/4_post_process"
 FINAL="results"
 
+# Format of the intermediate tables up to negative generation: "tsv", "tsv.gz"/"tsv.zst" for compressed TSV files (written with parallel
+# compression, see ../shared/compressed_io.py), or "feather"/"parquet" for smaller, faster to reload columnar files (see
+# ../shared/table_io.py); the files with negatives and the final datasets are always TSV
+INTERMEDIATE_FORMAT="tsv"
+
+# Gene clustering engine: "decipher" (DECIPHER::Clusterize) or "sketch" (MinHash/LSH in Python)
+CLUSTERING_ENGINE="decipher"
+
+# Persistent gene cluster store shared by the datasets (e.g. "results/2_post_process/intermediate/cluster_store"), or empty to cluster all
+# gene sequences of each dataset. The published datasets were made with "decipher" and no store: with a store, the new gene sequences of a
+# dataset first join the cluster of a stored representative within a normalised Levenshtein distance of 0.1, so the clusters of the later
+# datasets differ from those of a full DECIPHER clustering
+CLUSTER_STORE=""
+
 # ========= HELPER FUNCTION ==========
 
 # Move only if destination doesn't already exist
@@ -66,7 +84,10 @@ echo "===== Running 0_post_process-filter_and_deduplicate.sh ====="
 echo
 for DATASET in "$MANAKOV" "$HEJRET" "$KLIMENTOVA"; do
     INPUT="data/AGO2_${DATASET}_positives.tsv"
-    OUTPUT="${PP0}/AGO2_${DATASET}.filt_and_dedup.tsv"
+    if [[ -f "$INPUT.gz" ]]; then
+        INPUT="$INPUT.gz"
+    fi
+    OUTPUT="${PP0}/AGO2_${DATASET}.filt_and_dedup.${INTERMEDIATE_FORMAT}"
     if [[ -f "$OUTPUT" ]]; then
         echo "File $OUTPUT already exists. Skipping filter/deduplication for $DATASET."
         continue
@@ -80,15 +101,15 @@ done
 echo
 echo "===== Running 1_post_process-exclude_mirna_families.sh ====="
 echo
-EXCL="$PP1/AGO2_${MANAKOV}.excluded.tsv"
-REM="$PP1/AGO2_${MANAKOV}.remaining.tsv"
+EXCL="$PP1/AGO2_${MANAKOV}.excluded.${INTERMEDIATE_FORMAT}"
+REM="$PP1/AGO2_${MANAKOV}.remaining.${INTERMEDIATE_FORMAT}"
 if [[ -f "$EXCL" && -f "$REM" ]]; then
     echo "Manakov excluded and remaining files exist. Skipping exclusion step."
 else
 bash code/1_post_process-exclude_mirna_families.sh \
-    -m "$PP0/AGO2_${MANAKOV}.filt_and_dedup.tsv" \
-    -h "$PP0/AGO2_${HEJRET}.filt_and_dedup.tsv" \
-    -k "$PP0/AGO2_${KLIMENTOVA}.filt_and_dedup.tsv" \
+    -m "$PP0/AGO2_${MANAKOV}.filt_and_dedup.${INTERMEDIATE_FORMAT}" \
+    -h "$PP0/AGO2_${HEJRET}.filt_and_dedup.${INTERMEDIATE_FORMAT}" \
+    -k "$PP0/AGO2_${KLIMENTOVA}.filt_and_dedup.${INTERMEDIATE_FORMAT}" \
     -o "$EXCL" \
     -r "$REM" \
     -n "$PP1/intermediate"
@@ -99,26 +120,34 @@ echo "===== Running 2_post_process-make_negatives.sh ====="
 echo
 
 FILES_TO_MAKE_NEGS=(
-    "$PP1/AGO2_${MANAKOV}.excluded.tsv"
-    "$PP1/AGO2_${MANAKOV}.remaining.tsv"
-    "$PP0/AGO2_${KLIMENTOVA}.filt_and_dedup.tsv"
-    "$PP0/AGO2_${HEJRET}.filt_and_dedup.tsv"
+    "$PP1/AGO2_${MANAKOV}.excluded.${INTERMEDIATE_FORMAT}"
+    "$PP1/AGO2_${MANAKOV}.remaining.${INTERMEDIATE_FORMAT}"
+    "$PP0/AGO2_${KLIMENTOVA}.filt_and_dedup.${INTERMEDIATE_FORMAT}"
+    "$PP0/AGO2_${HEJRET}.filt_and_dedup.${INTERMEDIATE_FORMAT}"
 )
 
+STORE_ARGS=()
+if [[ -n "$CLUSTER_STORE" ]]; then
+    STORE_ARGS=(-s "$CLUSTER_STORE")
+fi
+
 for FILE in "${FILES_TO_MAKE_NEGS[@]}"; do
-    OUTPUT="${PP2}/$(basename "$FILE" .tsv).negatives.tsv"
-    if [[ -f "$OUTPUT" ]]; then
+    OUTPUT="${PP2}/$(basename "$FILE" ".${INTERMEDIATE_FORMAT}").negatives.tsv"
+    # An output with a checkpoint next to it is from an interrupted run, which is resumed
+    if [[ -f "$OUTPUT" && ! -f "$OUTPUT.ckpt" ]]; then
         echo "File $OUTPUT already exists. Skipping negative generation for $(basename "$FILE")."
         continue
     fi
     bash code/2_post_process-make_negatives.sh \
         -i "$FILE" \
         -o "$OUTPUT" \
-        -n "$PP2/intermediate"
+        -n "$PP2/intermediate" \
+        -e "$CLUSTERING_ENGINE" \
+        ${STORE_ARGS[@]+"${STORE_ARGS[@]}"}
 done
 
 echo
-echo "===== Running 3_post_process-split_negatives.sh ====="
+echo "===== Running 3_post_process-train_test_splits.sh ====="
 echo
 FILES_TO_SPLIT=(
     "$PP2/AGO2_${MANAKOV}.remaining.negatives.tsv"
@@ -145,10 +174,6 @@ echo
 FILES_TO_DROP_TEST_COL=(
     "$PP2/AGO2_${MANAKOV}.excluded.negatives.tsv"
     "$PP2/AGO2_${KLIMENTOVA}.filt_and_dedup.negatives.tsv"
-    "$PP3/AGO2_${MANAKOV}.remaining.negatives.train.tsv"
-    "$PP3/AGO2_${MANAKOV}.remaining.negatives.test.tsv"
-    "$PP3/AGO2_${HEJRET}.filt_and_dedup.negatives.train.tsv"
-    "$PP3/AGO2_${HEJRET}.filt_and_dedup.negatives.test.tsv"
 )
 
 for FILE in "${FILES_TO_DROP_TEST_COL[@]}"; do
@@ -164,10 +189,10 @@ done
 
 echo
 move_if_not_exists "$PP4/AGO2_${MANAKOV}.excluded.negatives.dropped_test_col.tsv" "$FINAL/AGO2_${MANAKOV}_leftout.tsv" # final Manakov left-out set
-move_if_not_exists "$PP4/AGO2_${MANAKOV}.remaining.negatives.train.dropped_test_col.tsv" "$FINAL/AGO2_${MANAKOV}_train.tsv" # final Manakov train set
-move_if_not_exists "$PP4/AGO2_${MANAKOV}.remaining.negatives.test.dropped_test_col.tsv" "$FINAL/AGO2_${MANAKOV}_test.tsv" # final Manakov test set
-move_if_not_exists "$PP4/AGO2_${HEJRET}.filt_and_dedup.negatives.train.dropped_test_col.tsv" "$FINAL/AGO2_${HEJRET}_train.tsv" # final Hejret train set
-move_if_not_exists "$PP4/AGO2_${HEJRET}.filt_and_dedup.negatives.test.dropped_test_col.tsv" "$FINAL/AGO2_${HEJRET}_test.tsv" # final Hejret test set
+move_if_not_exists "$PP3/AGO2_${MANAKOV}.remaining.negatives.train.tsv" "$FINAL/AGO2_${MANAKOV}_train.tsv" # final Manakov train set
+move_if_not_exists "$PP3/AGO2_${MANAKOV}.remaining.negatives.test.tsv" "$FINAL/AGO2_${MANAKOV}_test.tsv" # final Manakov test set
+move_if_not_exists "$PP3/AGO2_${HEJRET}.filt_and_dedup.negatives.train.tsv" "$FINAL/AGO2_${HEJRET}_train.tsv" # final Hejret train set
+move_if_not_exists "$PP3/AGO2_${HEJRET}.filt_and_dedup.negatives.test.tsv" "$FINAL/AGO2_${HEJRET}_test.tsv" # final Hejret test set
 move_if_not_exists "$PP4/AGO2_${KLIMENTOVA}.filt_and_dedup.negatives.dropped_test_col.tsv" "$FINAL/AGO2_${KLIMENTOVA}_test.tsv" # final Klimentova test set
 
 echo
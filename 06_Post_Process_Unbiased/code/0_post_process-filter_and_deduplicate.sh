@@ -7,19 +7,23 @@
 
 # Filters and deduplicates a positive set for unbiased miRNA-target site processing.
 #   1. Filters input TSV using code/filtering/filtering.py
-#   2. Deduplicates rows based on the first two columns (gene and noncodingRNA)
+#   2. Deduplicates rows based on the first two columns (gene and noncodingRNA) using ../shared/dedup.py
 #
 # Usage:
 #   bash 0_post_process-filter_and_deduplicate.sh -i <INPUT_TSV> -o <OUTPUT_TSV> -n <INTERMEDIATE_DIR>
 #
 # Arguments:
-#   -i   Input file (.tsv)
-#   -o   Output file for filtered/deduplicated data (.tsv)
+#   -i   Input file (.tsv, or .tsv.gz/.tsv.zst, see ../shared/compressed_io.py)
+#   -o   Output file for filtered/deduplicated data (.tsv, .tsv.gz/.tsv.zst, or .feather/.parquet for a columnar file, see ../shared/table_io.py;
+#        the intermediate filtered file has the same format)
 #   -n   Directory for intermediate files
 
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python modules shared by the analyses (compressed_io.py, table_io.py) are imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 # parse command-line arguments
 while getopts i:o:n: flag; do
     case "${flag}" in
@@ -38,8 +42,17 @@ fi
 # Make sure intermediate dir and output dir exist
 mkdir -p "$intermediate_dir" "$(dirname "$output_file")"
 
-base_name=$(basename "$input_file" .tsv)
-filtered_file="$intermediate_dir/${base_name}.filtered.tsv"
+# the intermediate filtered file has the format (extension, with any compression extension) of the output file
+output_format="${output_file##*.}"
+if [[ "$output_format" == "gz" || "$output_format" == "zst" ]]; then
+    output_stem="${output_file%.*}"
+    output_format="${output_stem##*.}.${output_format}"
+fi
+base_name=$(basename "$input_file")
+base_name="${base_name%.gz}"
+base_name="${base_name%.zst}"
+base_name="${base_name%.tsv}"
+filtered_file="$intermediate_dir/${base_name}.filtered.${output_format}"
 
 # Step 1: Filtering
 echo "Running filtering step on $input_file..."
@@ -48,7 +61,7 @@ echo "Filtering completed. Output saved to $filtered_file"
 
 # Step 2: Deduplication
 echo "Running deduplication step on $filtered_file..."
-awk -F'\t' 'NR==1{print $0} NR>1{if(!seen[$1$2]++){print}}' "$filtered_file" > "$output_file"
+python3 ../shared/dedup.py --ifile "$filtered_file" --ofile "$output_file"
 echo "Deduplication completed. Output saved to $output_file"
 
 echo "Filtering and deduplication of $input_file completed successfully. "
\ No newline at end of file
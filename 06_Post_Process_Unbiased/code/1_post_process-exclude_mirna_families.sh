@@ -8,6 +8,7 @@
 # Excludes miRNA families unique to the Manakov dataset from a set of three positive sets.
 #   1. Identifies and counts miRNA families unique to Manakov compared to Hejret and Klimentova         (calls code/exclude_mirna_families/unique_family_counter.py)
 #   2. Splits Manakov dataset into "excluded" (unique families) and "remaining" (shared families)       (calls code/exclude_mirna_families/dataset_split_based_on_unique_families.py)
+# Family counts are read from a summary sidecar (<INPUT>.summary.json) of each input, built once in one scan (code/exclude_mirna_families/dataset_summary.py).
 #
 # Usage:
 #   bash 1_post_process-exclude_mirna_families.sh -m <INPUT_MANAKOV> -h <INPUT_HEJRET> -k <INPUT_KLIMENTOVA> -o <OUTPUT_EXCLUDED> -r <OUTPUT_REMAINING> -n <INTERMEDIATE_DIR>
@@ -23,6 +24,9 @@
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python modules shared by the analyses (compressed_io.py, table_io.py) are imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 # parse command-line arguments
 while getopts m:h:k:o:r:n: flag; do
     case "${flag}" in
@@ -6,35 +6,63 @@
 #SBATCH --cpus-per-task=30
 
 # Generates negative samples for miRNA-target site datasets.
-#   1. Converts input TSV to FASTA                 (calls code/clustering/gene_fasta.py)
-#   2. Performs gene sequence clustering           (calls code/clustering/clustering.R)
-#   3. Maps clusters to input file                 (calls code/clustering/map_gene_clusters.py)
-#   4. Sorts file by noncodingRNA family
-#   5. Generates negative samples                  (calls code/make_neg_sets/make_neg_sets.py)
+#   1. Converts unique input genes to FASTA        (calls code/clustering/gene_fasta.py)
+#   2. Performs gene sequence clustering           (calls code/clustering/clustering.R, or code/clustering/sketch_clustering.py with -e sketch;
+#                                                   with -s, only for genes not in the cluster store and matching none of its cluster
+#                                                   representatives, via code/clustering/cluster_store.py)
+#   3. Maps clusters to input file by gene hash    (calls code/clustering/map_gene_clusters.py)
+#   4. Sorts file by noncodingRNA family           (skipped with -u)
+#   5. Generates negative samples                  (calls code/make_neg_sets/make_neg_sets.py, in parallel; with -u, groups the unsorted file by
+#                                                   noncodingRNA family via an index instead)
+#   6. Summarises the output                       (calls code/exclude_mirna_families/dataset_summary.py; family, miRNA, cluster and label counts
+#                                                   in <OUTPUT_TSV>.summary.json, for later analyses)
+#
+# The sorting step is that of the published datasets, with its documented off-by-one sort column, in the current locale. With -u, the blocks
+# are the true noncodingRNA_fam groups, in bytewise order, so the blocks, their row order and their seeds differ: -u does not reproduce the
+# published datasets.
 #
 # Usage:
-#   bash 2_post_process-make_negatives.sh -i <INPUT_TSV> -o <OUTPUT_TSV> -n <INTERMEDIATE_DIR>
+#   bash 2_post_process-make_negatives.sh -i <INPUT_TSV> -o <OUTPUT_TSV> -n <INTERMEDIATE_DIR> [-s <CLUSTER_STORE_DIR>] [-e <CLUSTERING_ENGINE>] [-u]
 #
 # Arguments:
-#   -i   Input file (TSV)
+#   -i   Input file (TSV, compressed TSV (.tsv.gz/.tsv.zst), or Feather/Parquet; with -u, the intermediate file with the gene clusters has the
+#        same format, and is TSV otherwise, to be sorted)
 #   -o   Output file with added negatives (TSV)
 #   -n   Directory for various intermediate files
+#   -s   Persistent gene cluster store, shared across datasets (optional; default: cluster all genes of the input; with a store, the clusters
+#        differ from those of a full clustering, see code/clustering/cluster_store.py)
+#   -e   Clustering engine: 'decipher' (clustering.R) or 'sketch' (MinHash/LSH, sketch_clustering.py) (optional; default: decipher)
+#   -u   Read the file with the gene clusters unsorted via an index of row byte offsets, instead of sorting it (optional; does not reproduce
+#        the published datasets, see above)
 
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python modules shared by the analyses (compressed_io.py, table_io.py, blocks.py, checkpoint.py) are imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 # parse command-line arguments
-while getopts i:o:n: flag; do
+unsorted=false
+while getopts i:o:n:s:e:u flag; do
     case "${flag}" in
         i) input_file=${OPTARG};;
         o) output_file=${OPTARG};;
         n) intermediate_dir=${OPTARG};;
+        s) cluster_store=${OPTARG};;
+        e) clustering_engine=${OPTARG};;
+        u) unsorted=true;;
     esac
 done
 
 # check if required argument is provided
 if [ -z "${input_file:-}" ] || [ -z "${output_file:-}" ] || [ -z "${intermediate_dir:-}" ]; then
-    echo "Usage: $0 -i input_file -o output_file -n intermediate_dir"
+    echo "Usage: $0 -i input_file -o output_file -n intermediate_dir [-s cluster_store_dir] [-e decipher|sketch] [-u]"
+    exit 1
+fi
+
+clustering_engine=${clustering_engine:-decipher}
+if [ "$clustering_engine" != "decipher" ] && [ "$clustering_engine" != "sketch" ]; then
+    echo "Unknown clustering engine: $clustering_engine (expected decipher or sketch)"
     exit 1
 fi
 
@@ -48,13 +76,32 @@ make_negs_dir="./code/make_neg_sets"
 # define constants for suffixes with extensions
 CLUSTERING_OUTPUT_SUFFIX=".gene_clusters"
 CLUSTERS_ADDED_SUFFIX=".gene_clusters_added"
+NEW_GENES_SUFFIX=".new_genes"
 SORTED_SUFFIX=".mirfam_sorted"
 
-base_name=$(basename "$input_file" .tsv)
+# with -u, the intermediate file with the gene clusters has the format (extension, with any compression extension) of the input file, and
+# is TSV otherwise, to be sorted
+input_format="${input_file##*.}"
+if [[ "$input_format" == "gz" || "$input_format" == "zst" ]]; then
+    input_stem="${input_file%.*}"
+    input_format="${input_stem##*.}.${input_format}"
+fi
+base_name=$(basename "$input_file" ".$input_format")
 fasta_file="$intermediate_dir/${base_name}.fasta"
 clustering_output="$intermediate_dir/${base_name}${CLUSTERING_OUTPUT_SUFFIX}.csv"
-input_file_with_clusters="$intermediate_dir/${base_name}${CLUSTERS_ADDED_SUFFIX}.tsv"
+input_file_with_clusters="$intermediate_dir/${base_name}${CLUSTERS_ADDED_SUFFIX}.$([ "$unsorted" = true ] && echo "$input_format" || echo tsv)"
 mirfam_sorted_file="$intermediate_dir/${base_name}${CLUSTERS_ADDED_SUFFIX}${SORTED_SUFFIX}.tsv"
+new_genes_fasta="$intermediate_dir/${base_name}${NEW_GENES_SUFFIX}.fasta"
+new_genes_clustering_output="$intermediate_dir/${base_name}${NEW_GENES_SUFFIX}${CLUSTERING_OUTPUT_SUFFIX}.csv"
+
+# Cluster the genes of a FASTA file with the chosen engine, using all allocated CPUs
+cluster_genes() {
+    if [ "$clustering_engine" == "sketch" ]; then
+        python3 "$clustering_dir/sketch_clustering.py" "$1" "$2" --processors "${SLURM_CPUS_PER_TASK:-$(nproc)}"
+    else
+        Rscript "$clustering_dir/clustering.R" "$1" "$2" "${SLURM_CPUS_PER_TASK:-8}"
+    fi
+}
 
 # Step 1: Generating FASTA file
 echo "Generating FASTA file for $input_file..."
@@ -62,8 +109,18 @@ python3 "$clustering_dir/gene_fasta.py" --input "$input_file" --output "$fasta_f
 echo "FASTA file generated for $input_file. Output saved to $fasta_file"
 
 # Step 2: Performing sequence clustering on gene sequences in the generated FASTA file
-echo "Running gene sequence clustering for $fasta_file..."
-Rscript "$clustering_dir/clustering.R" "$fasta_file" "$clustering_output"
+echo "Running gene sequence clustering ($clustering_engine) for $fasta_file..."
+if [ -n "${cluster_store:-}" ]; then
+    # Add the genes not in the store that match a cluster representative to its cluster, cluster only the unmatched ones, then add them to the store
+    n_new_genes=$(python3 "$clustering_dir/cluster_store.py" split --fasta "$fasta_file" --store "$cluster_store" --new_fasta "$new_genes_fasta" --processors "${SLURM_CPUS_PER_TASK:-$(nproc)}")
+    echo "$n_new_genes new gene sequences match no cluster of the cluster store $cluster_store."
+    if [ "$n_new_genes" -gt 0 ]; then
+        cluster_genes "$new_genes_fasta" "$new_genes_clustering_output"
+    fi
+    python3 "$clustering_dir/cluster_store.py" update --fasta "$fasta_file" --new_fasta "$new_genes_fasta" --clustering_csv "$new_genes_clustering_output" --store "$cluster_store" --output_csv "$clustering_output"
+else
+    cluster_genes "$fasta_file" "$clustering_output"
+fi
 echo "Gene sequence clustering completed. Output saved to $clustering_output"
 
 # Step 3: Mapping clusters to input file
@@ -71,24 +128,33 @@ echo "Mapping clusters to $input_file..."
 python3 "$clustering_dir/map_gene_clusters.py" --cluster_csv "$clustering_output" --dataset_tsv "$input_file" --output_tsv "$input_file_with_clusters"
 echo "Clusters mapped to $input_file. Output saved to $input_file_with_clusters"
 
-# Step 4: Sort the file based on the noncodingRNA_fam column in preparation for negative sample generation
-echo "Sorting the input file with added clusters based on the noncodingRNA_fam column..."
-
-# Find the column number of the "noncodingRNA_fam" column
-column_number=$(head -n 1 "$input_file_with_clusters" | tr '\t' '\n' | nl -v 0 | grep "noncodingRNA_fam" | awk '{print $1}') # nl -v 0 (0-based) and sork -k in line 82 (1-based) produce an off-by-1 error that we are aware of and have documented as an issue to fix in future versions
-
-# If the column number is found, sort the file by that column
-if [ -n "$column_number" ]; then
-    (head -n 1 "$input_file_with_clusters" && tail -n +2 "$input_file_with_clusters" | sort -k "$column_number") > "${mirfam_sorted_file}"
-    echo "Input file with added clusters sorted by the 'noncodingRNA_fam' column. Output saved to $mirfam_sorted_file"
+# Step 4: Sort the file based on the noncodingRNA_fam column in preparation for negative sample generation (with -u, the unsorted file is read
+# via an index instead)
+if [ "$unsorted" = true ]; then
+    neg_input_file="$input_file_with_clusters"
+    neg_input_args=(--unsorted)
 else
-    echo "Error: 'noncodingRNA_fam' column not found in $mirfam_sorted_file"
-    exit 1
+    echo "Sorting the input file with added clusters based on the noncodingRNA_fam column..."
+    # Find the column number of the "noncodingRNA_fam" column
+    column_number=$(head -n 1 "$input_file_with_clusters" | tr '\t' '\n' | nl -v 0 | grep "noncodingRNA_fam" | awk '{print $1}') # nl -v 0 (0-based) and sork -k below (1-based) produce an off-by-1 error that we are aware of and have documented as an issue to fix in future versions
+    # If the column number is found, sort the file by that column
+    if [ -n "$column_number" ]; then
+        (head -n 1 "$input_file_with_clusters" && tail -n +2 "$input_file_with_clusters" | sort -k "$column_number") > "${mirfam_sorted_file}"
+        echo "Input file with added clusters sorted by the 'noncodingRNA_fam' column. Output saved to $mirfam_sorted_file"
+    else
+        echo "Error: 'noncodingRNA_fam' column not found in $input_file_with_clusters"
+        exit 1
+    fi
+    neg_input_file="$mirfam_sorted_file"
+    neg_input_args=()
 fi
 
-# Step 5: Make negatives
-echo "Generating negatives for $mirfam_sorted_file..."
-python3 "$make_negs_dir/make_neg_sets.py" --ifile "$mirfam_sorted_file" --ofile "$output_file"
+# Step 5: Make negatives for the miRNA family blocks, with one worker per allocated CPU (resumes from the checkpoint of an interrupted run, if any)
+echo "Generating negatives for $neg_input_file..."
+python3 "$make_negs_dir/make_neg_sets.py" --ifile "$neg_input_file" ${neg_input_args[@]+"${neg_input_args[@]}"} --ofile "$output_file" --workers "${SLURM_CPUS_PER_TASK:-1}" --resume
 echo "Negative samples generated. Output saved to $output_file"
 
+# Step 6: Summary sidecar of the output
+python3 ./code/exclude_mirna_families/dataset_summary.py --ifile "$output_file"
+
 echo "Negative samples generation successfully completed for $input_file"
\ No newline at end of file
@@ -5,41 +5,53 @@
 #SBATCH --ntasks=1
 #SBATCH --cpus-per-task=30
 
-# Splits a dataset into test and train sets based on whether the 6th ('test') column is True or False (indicating whether target site is on chr1).
+# Splits a dataset into test and train sets based on whether its 'test' column is True or False (indicating whether target site is on chr1),
+# and drops the 'test' column, in a single pass (../shared/split_train_test.py). The 'test' column is found by its header name.
+# With -c or -p, the split is based on other test chromosomes, or on a predicate function of each row, instead of the 'test' column.
 #
 # Usage:
-#   bash 3_post_process-train_test_splits.sh -i <INPUT_TSV> -t <OUTPUT_TRAIN_TSV> -e <OUTPUT_TEST_TSV>
+#   bash 3_post_process-train_test_splits.sh -i <INPUT_TSV> -t <OUTPUT_TRAIN_TSV> -e <OUTPUT_TEST_TSV> [-c <TEST_CHROMOSOMES> | -p <MODULE:FUNCTION>]
 #
 # Arguments:
 #   -i   Input file (TSV)
-#   -t   Output train set file (TSV)
-#   -e   Output test set file (TSV)
+#   -t   Output train set file, without the 'test' column (TSV)
+#   -e   Output test set file, without the 'test' column (TSV)
+#   -c   Comma-separated chromosomes of the test set (e.g. 1,8; optional)
+#   -p   Predicate of the test set rows, as MODULE:FUNCTION, called with each row as a dict of column names to values (optional)
 
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python modules shared by the analyses (compressed_io.py, table_io.py) are imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 # parse command-line arguments
-while getopts i:t:e: flag; do
+split_args=()
+while getopts i:t:e:c:p: flag; do
     case "${flag}" in
         i) input_file=${OPTARG};;
         t) output_train_file=${OPTARG};;
         e) output_test_file=${OPTARG};;
+        c) split_args+=(--test_chromosomes "${OPTARG}");;
+        p) split_args+=(--predicate "${OPTARG}");;
     esac
 done
 
 # Check if required arguments are provided
 if [ -z "${input_file:-}" ] || [ -z "${output_train_file:-}" ] || [ -z "${output_test_file:-}" ]; then
-    echo "Usage: $0 -i input_file -t output_train_file -e output_test_file"
+    echo "Usage: $0 -i input_file -t output_train_file -e output_test_file [-c test_chromosomes | -p module:function]"
     exit 1
 fi
 
 # Make sure output directories exist
 mkdir -p "$(dirname "$output_train_file")" "$(dirname "$output_test_file")"
 
-echo "Splitting data from $input_file into train and test sets..."
+echo "Splitting data from $input_file into train and test sets, without the 'test' column..."
 
-awk -F'\t' 'NR==1{header=$0; print header > "'"$output_train_file"'"; print header > "'"$output_test_file"'"} NR>1{if($6=="False"){print > "'"$output_train_file"'"} else {print > "'"$output_test_file"'"}}' "$input_file"
+python3 ../shared/split_train_test.py \
+    --ifile "$input_file" \
+    --train_file "$output_train_file" \
+    --test_file "$output_test_file" \
+    ${split_args[@]+"${split_args[@]}"}
 
-echo "Train set saved to $output_train_file"
-echo "Test set saved to $output_test_file"
-echo "Train and test split for $input_file completed successfully."
\ No newline at end of file
+echo "Train and test split for $input_file completed successfully."
@@ -5,18 +5,22 @@
 #SBATCH --ntasks=1
 #SBATCH --cpus-per-task=30
 
-# Removes the 6th ('test') column from a TSV dataset.
+# Removes the 'test' column, found by its header name, from a TSV dataset that is not split into train and test sets
+# (../shared/split_train_test.py; the split datasets have it removed by 3_post_process-train_test_splits.sh).
 #
 # Usage:
 #   bash 4_post_process-drop_test_col.sh -i <INPUT_TSV> -o <OUTPUT_TSV>
 #
 # Arguments:
 #   -i   Input file (TSV)
-#   -o   Output file with 6th ('test') column removed (TSV)
+#   -o   Output file with the 'test' column removed (TSV)
 
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python modules shared by the analyses (compressed_io.py, table_io.py) are imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 # parse command-line arguments
 while getopts i:o: flag; do
     case "${flag}" in
@@ -27,18 +31,19 @@ done
 
 # Check if required arguments are provided
 if [ -z "${input_file:-}" ] || [ -z "${output_file:-}" ]; then
-    echo "Usage: $0 -i input_file -t output_file"
+    echo "Usage: $0 -i input_file -o output_file"
     exit 1
 fi
 
 # Make sure output directory exists
 mkdir -p "$(dirname "$output_file")"
 
-# Removing the 'test' (6th) column from the input file
-echo "Removing the 'test' (6th) column from $input_file..."
+# Removing the 'test' column from the input file
+echo "Removing the 'test' column from $input_file..."
 
-# Use awk to remove the 6th column without causing column shifts
-awk -F'\t' 'BEGIN{OFS="\t"} {for(i=1;i<=NF;i++) if(i!=6) printf "%s%s", $i, (i==NF?"\n":OFS)}' "$input_file" > "$output_file"
+python3 ../shared/split_train_test.py \
+    --ifile "$input_file" \
+    --ofile "$output_file"
 
 echo "Dropping 'test' column completed successfully."
 
@@ -0,0 +1,203 @@
+"""
+Persistent store of gene sequence clusters, shared by the datasets of the pipeline, so that each dataset only clusters the gene sequences
+not seen before instead of reclustering all of them.
+
+The store directory holds:
+    clusters.csv              Seq_ID (sequence hash, as written by gene_fasta.py) and Cluster_ID of every stored gene sequence
+    representatives.fasta     One representative gene sequence per cluster (named by its hash), i.e. its first stored member
+    representatives.npz       MinHash sketches of the representatives (see sketch_clustering.py), so that only new representatives are sketched
+
+Usage:
+    python cluster_store.py split --fasta <INPUT_FASTA> --store <STORE_DIR> --new_fasta <NEW_FASTA> [--cutoff <DIST>] [--processors <N>]
+    python cluster_store.py update --fasta <INPUT_FASTA> --new_fasta <NEW_FASTA> --clustering_csv <NEW_CLUSTERS_CSV> --store <STORE_DIR> --output_csv <OUTPUT_CSV>
+
+Commands:
+    split     Match the gene sequences of the input FASTA that are not in the store against the cluster representatives, add the matched ones
+              to the store, and write the unmatched ones to NEW_FASTA, to be clustered (with clustering.R or sketch_clustering.py); prints
+              the number of unmatched sequences
+    update    Assign the unmatched sequences to new clusters from the clustering of NEW_FASTA, add them to the store, and write the clusters
+              of all sequences of the input FASTA to OUTPUT_CSV (Seq_ID, Cluster_ID), in the format of clustering.R
+
+Arguments:
+    --fasta             FASTA of the unique gene sequences of a dataset, named by their hash (gene_fasta.py)
+    --store             Cluster store directory, created if it does not exist
+    --new_fasta         FASTA of the new sequences that match no representative
+    --clustering_csv    Clustering of NEW_FASTA (clustering.R output)
+    --output_csv        Output CSV with the cluster of every sequence of the input FASTA
+    --cutoff            Maximum normalised edit distance between a new sequence and a representative it joins (default: 0.1, as the clustering)
+    --processors        Number of worker processes of the matching (default: all cores)
+
+New sequences are matched against the representatives as in sketch_clustering.py: the representatives that share an LSH band of MinHash
+sketches with a new sequence are candidates, checked exactly against the cutoff. A matched sequence joins the cluster of its representative
+(the one with the smallest Cluster_ID, if it matches several, since stored clusters are never renumbered or merged). Only the unmatched new
+sequences are clustered, so that a dataset costs its new sequences rather than all sequences seen so far, and form new clusters, numbered
+after the largest stored Cluster_ID.
+
+The clusters are therefore not those of a full clustering of all the sequences (e.g. with DECIPHER, as for the published datasets): a new
+sequence joins a stored cluster only by matching its representative within the cutoff, and never merges clusters. The store is opt-in
+(-s of 2_post_process-make_negatives.sh, CLUSTER_STORE of RUNME_1.sh).
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import csv
+import os
+import sys
+
+# Parameters of the sketches of the representatives, as the defaults of sketch_clustering.py
+SKETCH_PARAMETERS = {'k': 7, 'num_hashes': 288, 'bands': 96, 'seed': 42}
+
+# Read the (name, sequence) records of a FASTA file, with sequences possibly spanning several lines
+def read_fasta(path):
+    records = []
+    name = None
+    sequence_lines = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if name is not None:
+                    records.append((name, ''.join(sequence_lines)))
+                name = line[1:].split()[0]
+                sequence_lines = []
+            elif line:
+                sequence_lines.append(line)
+    if name is not None:
+        records.append((name, ''.join(sequence_lines)))
+    return records
+
+# Write (name, sequence) records to a FASTA file
+def write_fasta(path, records):
+    with open(path, 'w') as f:
+        f.writelines(f">{name}\n{sequence}\n" for name, sequence in records)
+
+# Read a clusters CSV (Seq_ID, Cluster_ID) into a dict, in file order
+def read_clusters(path):
+    with open(path, newline='') as f:
+        return {row['Seq_ID']: int(row['Cluster_ID']) for row in csv.DictReader(f)}
+
+# Write a clusters CSV (Seq_ID, Cluster_ID), quoted as write.csv in clustering.R
+def write_clusters(path, clusters):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(['Seq_ID', 'Cluster_ID'])
+        writer.writerows(clusters.items())
+
+# Load the store: the cluster of each stored sequence hash, and the representative records
+def load_store(store_dir):
+    clusters_path = os.path.join(store_dir, 'clusters.csv')
+    if not os.path.exists(clusters_path):
+        return {}, []
+    return read_clusters(clusters_path), read_fasta(os.path.join(store_dir, 'representatives.fasta'))
+
+# Save the store, replacing each file atomically, with the representatives last, so that a stored cluster always has its representative
+def save_store(store_dir, clusters, representatives):
+    os.makedirs(store_dir, exist_ok=True)
+    for name, write, data in (('representatives.fasta', write_fasta, representatives), ('clusters.csv', write_clusters, clusters)):
+        path = os.path.join(store_dir, name)
+        write(path + '.tmp', data)
+        os.replace(path + '.tmp', path)
+
+# Get the sketches of the representatives, from the store, sketching (and saving) only the representatives added since they were saved;
+# the representatives are only ever appended to, so the saved sketches are those of the first representatives
+def load_representative_sketches(store_dir, representatives, processors=None):
+    # numpy and sketch_clustering.py (with Levenshtein) are only needed once the store has representatives to match against
+    import numpy as np
+    from sketch_clustering import sketch_sequences
+
+    sketches_path = os.path.join(store_dir, 'representatives.npz')
+    parameters = np.array([SKETCH_PARAMETERS[name] for name in ('k', 'num_hashes', 'seed')])
+    sketches = np.empty((0, SKETCH_PARAMETERS['num_hashes']), dtype=np.uint64)
+    if os.path.exists(sketches_path):
+        with np.load(sketches_path) as saved:
+            if np.array_equal(saved['parameters'], parameters) and len(saved['sketches']) <= len(representatives):
+                sketches = saved['sketches']
+
+    if len(sketches) < len(representatives):
+        added = sketch_sequences([sequence for _, sequence in representatives[len(sketches):]], SKETCH_PARAMETERS['k'], SKETCH_PARAMETERS['num_hashes'], processors, SKETCH_PARAMETERS['seed'])
+        sketches = np.concatenate([sketches, added])
+        with open(sketches_path + '.tmp', 'wb') as f:
+            np.savez(f, sketches=sketches, parameters=parameters)
+        os.replace(sketches_path + '.tmp', sketches_path)
+    return sketches
+
+# Add the sequences not in the store that match a representative to its cluster, write the unmatched ones, and get their number
+def split(fasta, store_dir, new_fasta, cutoff=0.1, processors=None):
+    clusters, representatives = load_store(store_dir)
+    new_records = [(name, sequence) for name, sequence in read_fasta(fasta) if name not in clusters]
+
+    if new_records and representatives:
+        from sketch_clustering import match_sequences
+        sketches = load_representative_sketches(store_dir, representatives, processors)
+        matches = match_sequences([sequence for _, sequence in new_records], [sequence for _, sequence in representatives], sketches, cutoff,
+                                  SKETCH_PARAMETERS['k'], SKETCH_PARAMETERS['num_hashes'], SKETCH_PARAMETERS['bands'], processors, SKETCH_PARAMETERS['seed'])
+
+        # Add each matched sequence to the cluster of its representative, with the smallest Cluster_ID if it matches several
+        n_matched = 0
+        for (name, _), matched in zip(new_records, matches):
+            if matched:
+                clusters[name] = min(clusters[representatives[idx][0]] for idx in matched)
+                n_matched += 1
+        if n_matched:
+            save_store(store_dir, clusters, representatives)
+        new_records = [(name, sequence) for name, sequence in new_records if name not in clusters]
+        print(f"{n_matched} of {len(matches)} new gene sequences matched a stored cluster representative and were added to its cluster.")
+
+    write_fasta(new_fasta, new_records)
+    return len(new_records)
+
+# Assign the unmatched new sequences to new clusters, add them to the store, and write the clusters of all sequences of the input FASTA
+def update(fasta, new_fasta, clustering_csv, store_dir, output_csv):
+    clusters, representatives = load_store(store_dir)
+    new_records = [(name, sequence) for name, sequence in read_fasta(new_fasta) if name not in clusters]
+
+    if new_records:
+        new_clustering = read_clusters(clustering_csv)
+
+        # Assign each new sequence to a new cluster per clustering cluster, whose representative is its first sequence
+        stored_cluster_of = {}
+        next_cluster_id = max(clusters.values(), default=0) + 1
+        for name, sequence in new_records:
+            cluster = new_clustering[name]
+            if cluster not in stored_cluster_of:
+                stored_cluster_of[cluster] = next_cluster_id
+                representatives.append((name, sequence))
+                next_cluster_id += 1
+            clusters[name] = stored_cluster_of[cluster]
+
+        save_store(store_dir, clusters, representatives)
+
+    write_clusters(output_csv, {name: clusters[name] for name, _ in read_fasta(fasta)})
+    return len(new_records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster only new gene sequences, against a persistent store of gene sequence clusters.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help="Add the new sequences that match a representative to the store, and write the others to be clustered")
+    split_parser.add_argument('--fasta', required=True, help="FASTA of unique gene sequences named by their hash")
+    split_parser.add_argument('--store', required=True, help="Cluster store directory")
+    split_parser.add_argument('--new_fasta', required=True, help="Output FASTA of the new sequences that match no representative")
+    split_parser.add_argument('--cutoff', type=float, default=0.1, help="Maximum normalised edit distance to a representative (default: 0.1)")
+    split_parser.add_argument('--processors', type=int, default=None, help="Number of worker processes of the matching (default: all cores)")
+
+    update_parser = subparsers.add_parser('update', help="Add the clustered new sequences to the store, and write the clusters of all sequences")
+    update_parser.add_argument('--fasta', required=True, help="FASTA of unique gene sequences named by their hash")
+    update_parser.add_argument('--new_fasta', required=True, help="FASTA of the new sequences that match no representative")
+    update_parser.add_argument('--clustering_csv', required=True, help="Clustering of the new sequences (clustering.R output)")
+    update_parser.add_argument('--store', required=True, help="Cluster store directory")
+    update_parser.add_argument('--output_csv', required=True, help="Output CSV with the cluster of every sequence of the input FASTA")
+
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        # Only the number of unmatched sequences is printed to the standard output, to be read by the calling script
+        with redirect_stdout(sys.stderr):
+            n_new = split(args.fasta, args.store, args.new_fasta, args.cutoff, args.processors)
+        print(n_new)
+    else:
+        n_new = update(args.fasta, args.new_fasta, args.clustering_csv, args.store, args.output_csv)
+        print(f"Added {n_new} unmatched new gene sequences to new clusters of the cluster store {args.store}. Clusters saved to {args.output_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compares the sketch clustering engine (sketch_clustering.py) with DECIPHER (clustering.R) on a random sample of the gene sequences of a
+FASTA file, or compares two existing clustering CSVs (Seq_ID, Cluster_ID), and reports their pairwise agreement.
+
+Agreement is measured over all pairs of sequences, from the contingency table of the two clusterings: the pairs clustered together by the
+reference, by the test clustering and by both, the pair precision and recall of the test clustering, the Rand index and the adjusted Rand index.
+
+Usage:
+    python compare_clusterings.py --fasta <INPUT_FASTA> --workdir <DIR> [--sample_size <N>] [--seed <SEED>] [--cutoff <DIST>]
+    python compare_clusterings.py --reference_csv <CLUSTERS_CSV> --test_csv <CLUSTERS_CSV>
+
+Arguments:
+    --fasta            FASTA file of gene sequences to sample and cluster with both engines
+    --workdir          Directory for the sampled FASTA and the clustering CSVs of both engines
+    --sample_size      Number of sequences to sample (default: 5000)
+    --seed             Seed of the sampling (default: 42)
+    --cutoff           Distance cutoff of the sketch engine (default: 0.1, as in clustering.R)
+    --reference_csv    Reference clustering CSV (e.g. from clustering.R)
+    --test_csv         Test clustering CSV (e.g. from sketch_clustering.py), of the same sequences
+"""
+
+import argparse
+from collections import Counter
+import os
+import random
+import subprocess
+import sys
+from cluster_store import read_fasta, write_fasta, read_clusters
+
+# Get the number of pairs among n items
+def n_pairs(n):
+    return n * (n - 1) // 2
+
+# Get the pairwise agreement of a test clustering with a reference clustering of the same sequences
+def pair_agreement(reference, test):
+    if set(reference) != set(test):
+        raise ValueError("The clusterings are not of the same sequences")
+
+    total_pairs = n_pairs(len(reference))
+    reference_pairs = sum(n_pairs(n) for n in Counter(reference.values()).values())
+    test_pairs = sum(n_pairs(n) for n in Counter(test.values()).values())
+    both_pairs = sum(n_pairs(n) for n in Counter((reference[name], test[name]) for name in reference).values())
+
+    # Adjusted Rand index, from the pair counts
+    expected_pairs = reference_pairs * test_pairs / total_pairs if total_pairs else 0
+    max_pairs = (reference_pairs + test_pairs) / 2
+    ari = (both_pairs - expected_pairs) / (max_pairs - expected_pairs) if max_pairs != expected_pairs else 1.0
+
+    return {
+        'sequences': len(reference),
+        'reference_clusters': len(set(reference.values())),
+        'test_clusters': len(set(test.values())),
+        'reference_pairs': reference_pairs,
+        'test_pairs': test_pairs,
+        'shared_pairs': both_pairs,
+        'pair_precision': both_pairs / test_pairs if test_pairs else 1.0,
+        'pair_recall': both_pairs / reference_pairs if reference_pairs else 1.0,
+        'rand_index': (total_pairs - reference_pairs - test_pairs + 2 * both_pairs) / total_pairs if total_pairs else 1.0,
+        'adjusted_rand_index': ari
+    }
+
+# Sample sequences from a FASTA file and cluster them with both engines, and get the paths of the clustering CSVs
+def cluster_sample(fasta, workdir, sample_size, seed, cutoff):
+    os.makedirs(workdir, exist_ok=True)
+    records = read_fasta(fasta)
+    sample = random.Random(seed).sample(records, min(sample_size, len(records)))
+
+    sample_fasta = os.path.join(workdir, 'sample.fasta')
+    reference_csv = os.path.join(workdir, 'sample.decipher_clusters.csv')
+    test_csv = os.path.join(workdir, 'sample.sketch_clusters.csv')
+    write_fasta(sample_fasta, sample)
+
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run(['Rscript', os.path.join(code_dir, 'clustering.R'), sample_fasta, reference_csv], check=True)
+    subprocess.run([sys.executable, os.path.join(code_dir, 'sketch_clustering.py'), sample_fasta, test_csv, '--cutoff', str(cutoff)], check=True)
+    return reference_csv, test_csv
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the pairwise agreement of the sketch clustering engine with DECIPHER.")
+    parser.add_argument('--fasta', help="FASTA file of gene sequences to sample and cluster with both engines")
+    parser.add_argument('--workdir', help="Directory for the sampled FASTA and the clustering CSVs")
+    parser.add_argument('--sample_size', type=int, default=5000, help="Number of sequences to sample (default: 5000)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the sampling (default: 42)")
+    parser.add_argument('--cutoff', type=float, default=0.1, help="Distance cutoff of the sketch engine (default: 0.1)")
+    parser.add_argument('--reference_csv', help="Reference clustering CSV")
+    parser.add_argument('--test_csv', help="Test clustering CSV")
+    args = parser.parse_args()
+
+    if args.fasta:
+        if not args.workdir:
+            parser.error("--workdir is required with --fasta")
+        reference_csv, test_csv = cluster_sample(args.fasta, args.workdir, args.sample_size, args.seed, args.cutoff)
+    elif args.reference_csv and args.test_csv:
+        reference_csv, test_csv = args.reference_csv, args.test_csv
+    else:
+        parser.error("either --fasta or both --reference_csv and --test_csv are required")
+
+    agreement = pair_agreement(read_clusters(reference_csv), read_clusters(test_csv))
+    for metric, value in agreement.items():
+        print(f"{metric}: {value:.4f}" if isinstance(value, float) else f"{metric}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,36 @@
 """
 Converts a TSV file containing a 'gene' column with sequences, to FASTA format.
 
+Only unique gene sequences are written, in order of first appearance, each named by a stable content hash of the sequence (see sequence_hash),
+since many rows share the same gene sequence (one site bound by many miRNAs). Clusters are mapped back to the rows by this hash (map_gene_clusters.py).
+
 Usage:
-    python gene_fasta.py --input <INPUT_TSV> --output <OUTPUT_FASTA>
+    python gene_fasta.py --input <INPUT_TABLE> --output <OUTPUT_FASTA>
 
 Arguments:
-    --input    Path to input TSV file with gene sequences
+    --input    Path to input table file with gene sequences (TSV, or Feather/Parquet by extension, see table_io.py)
     --output   Output path for generated FASTA file
 """
 
 import pandas as pd
 import argparse
+import hashlib
+from table_io import read_table
+
+# Get a stable content hash of a gene sequence (128-bit BLAKE2b, as hex), used as its FASTA record name
+def sequence_hash(sequence):
+    return hashlib.blake2b(sequence.encode(), digest_size=16).hexdigest()
 
 def convert_tsv_to_fasta(input_file, output_file):
    
-    data = pd.read_csv(input_file, sep='\t')
+    # Read only the gene column, and keep its unique sequences in order of first appearance
+    genes = read_table(input_file, columns=['gene'])['gene']
+    unique_genes = pd.unique(genes)
     
     with open(output_file, 'w') as fasta_file:
-        for index, row in data.iterrows():
-            sequence = row['gene']
-            fasta_file.write(f">Seq_{index + 1}\n{sequence}\n")
+        fasta_file.writelines(f">{sequence_hash(sequence)}\n{sequence}\n" for sequence in unique_genes)
     
-    print(f"FASTA file created: {output_file}")
+    print(f"FASTA file created: {output_file} ({len(unique_genes)} unique gene sequences out of {len(genes)} rows)")
 
 def main():
 
@@ -35,4 +44,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -1,17 +1,22 @@
 """
 Maps cluster IDs from a CSV file to gene entries in a TSV dataset and outputs the merged table with a new 'gene_cluster_ID' column. 
 
+The cluster CSV has one row per unique gene sequence, with the sequence's content hash (as written by gene_fasta.py) as its Seq_ID, so clusters
+are joined to the rows by the hash of their gene sequence rather than by row position.
+
 Usage:
-    python map_gene_clusters.py --cluster_csv <CLUSTERS_CSV> --dataset_tsv <INPUT_TSV> --output_tsv <OUTPUT_TSV>
+    python map_gene_clusters.py --cluster_csv <CLUSTERS_CSV> --dataset_tsv <INPUT_TABLE> --output_tsv <OUTPUT_TABLE>
 
 Arguments:
     --cluster_csv   Path to CSV file with cluster assignments
-    --dataset_tsv   Path to input dataset (TSV)
-    --output_tsv    Output path for merged TSV file
+    --dataset_tsv   Path to input dataset (TSV, or Feather/Parquet by extension, see table_io.py)
+    --output_tsv    Output path for merged file (TSV, or Feather/Parquet by extension)
 """
 
 import argparse
 import pandas as pd
+from gene_fasta import sequence_hash
+from table_io import read_table, write_table
 
 def main():
     parser = argparse.ArgumentParser(description="Map cluster IDs to sequences and merge with gene data.")
@@ -21,11 +26,19 @@ def main():
     args = parser.parse_args()
 
     clusters_df = pd.read_csv(args.cluster_csv)
-    gene_df = pd.read_csv(args.dataset_tsv, sep="\t")
+    gene_df = read_table(args.dataset_tsv)
+
+    # Map each unique gene sequence to the cluster of its hash, then each row to the cluster of its gene sequence
+    hash_clusters = dict(zip(clusters_df["Seq_ID"], clusters_df["Cluster_ID"]))
+    gene_clusters = {gene: hash_clusters.get(sequence_hash(gene)) for gene in gene_df["gene"].unique()}
+
+    missing = [gene for gene, cluster in gene_clusters.items() if cluster is None]
+    if missing:
+        raise ValueError(f"{len(missing)} gene sequences of {args.dataset_tsv} have no cluster in {args.cluster_csv}, e.g. {missing[0]}")
 
-    gene_df["gene_cluster_ID"] = clusters_df["Cluster_ID"]
+    gene_df["gene_cluster_ID"] = gene_df["gene"].map(gene_clusters)
 
-    gene_df.to_csv(args.output_tsv, sep="\t", index=False)
+    write_table(gene_df, args.output_tsv)
     print(f"Results saved to {args.output_tsv}")
 
 if __name__ == "__main__":
@@ -0,0 +1,242 @@
+"""
+Clusters gene sequences in a FASTA file with MinHash sketches and locality-sensitive hashing (LSH), as a Python alternative to clustering.R,
+and outputs cluster assignments as a CSV in the same format (Seq_ID, Cluster_ID).
+
+Each sequence is sketched by the minimum of num_hashes random hash functions over its k-mers. Sketches are cut into bands, and sequences that
+share a whole band in the same position are candidate pairs. Only candidate pairs are checked exactly: two sequences are linked if their
+Levenshtein distance, divided by the length of the longer sequence, is at most the cutoff (as DECIPHER's cutoff = 0.1, i.e. 90% identity).
+Clusters are the connected components of the links (union-find), numbered from 1 in order of first appearance in the FASTA file.
+
+The defaults (7-mers, 96 bands of 3 hashes) are tuned for the 0.1 cutoff: on synthetic gene sequences of 30 to 300 nt with mutated copies,
+98 to 99% of the pairs within the cutoff share a band, while 0.007% of the pairs of unrelated random sequences do (3.9% for 50 nt sequences
+with 5-mers and bands of 2 hashes). Candidate pairs are generated band by band from the sorted band keys, each pair only for the first band
+it shares, and checked as they are generated, so that they are never all held in memory.
+
+Sketching and the exact checks run in a pool of worker processes.
+
+Usage:
+    python sketch_clustering.py <INPUT_FASTA> <OUTPUT_CSV> [--cutoff <DIST>] [--k <K>] [--num_hashes <N>] [--bands <B>] [--processors <N>] [--seed <SEED>]
+
+Arguments:
+    <INPUT_FASTA>    Path to input FASTA file with gene sequences
+    <OUTPUT_CSV>     Output CSV file for sequence-to-cluster assignments
+    --cutoff         Maximum normalised edit distance between linked sequences (default: 0.1)
+    --k              k-mer size of the sketches; smaller k-mers propose more candidate pairs (default: 7)
+    --num_hashes     Number of MinHash functions per sketch, must be a multiple of --bands (default: 288)
+    --bands          Number of LSH bands; more bands (of fewer hashes) propose more candidate pairs (default: 96)
+    --processors     Number of worker processes (default: all cores)
+    --seed           Seed of the hash functions (default: 42)
+"""
+
+import argparse
+from collections import deque
+import multiprocessing
+import numpy as np
+from Levenshtein import distance as levenshtein_distance
+from cluster_store import read_fasta, write_clusters
+
+MERSENNE_PRIME = (1 << 31) - 1
+CHECK_CHUNK_SIZE = 10000
+BASE_CODES = {'A': 0, 'C': 1, 'G': 2, 'T': 3, 'U': 3}
+
+# Get the integer codes of the k-mers of a sequence (2 bits per base), skipping k-mers with bases other than A, C, G, T/U
+def kmer_codes(sequence, k):
+    codes = np.array([BASE_CODES.get(base, -1) for base in sequence.upper()], dtype=np.int64)
+    if len(codes) < k:
+        return np.empty(0, dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    windows = windows[(windows >= 0).all(axis=1)]
+    return np.unique(windows @ (4 ** np.arange(k - 1, -1, -1, dtype=np.int64)))
+
+# Get the random hash functions (a * x + b) mod p of the sketches, with p = 2^31 - 1, so that a * x fits in 64 bits for k-mer codes below p (k <= 15)
+def hash_parameters(num_hashes, seed):
+    rng = np.random.RandomState(seed)
+    return rng.randint(1, MERSENNE_PRIME, size=num_hashes, dtype=np.int64), rng.randint(0, MERSENNE_PRIME, size=num_hashes, dtype=np.int64)
+
+# Get the MinHash sketch of a sequence; sequences without k-mers get an empty (all-maximum) sketch, which is never a candidate
+def minhash_sketch(sequence, k, hash_a, hash_b):
+    codes = kmer_codes(sequence, k)
+    if len(codes) == 0:
+        return np.full(len(hash_a), MERSENNE_PRIME, dtype=np.uint64)
+    hashes = (codes[:, None].astype(np.uint64) * hash_a.astype(np.uint64) + hash_b.astype(np.uint64)) % np.uint64(MERSENNE_PRIME)
+    return hashes.min(axis=0)
+
+# State of a worker process: the sequences and sketch parameters, set once by init_worker
+worker_state = {}
+
+def init_worker(sequences, k, hash_a, hash_b, cutoff):
+    worker_state.update(sequences=sequences, k=k, hash_a=hash_a, hash_b=hash_b, cutoff=cutoff)
+
+def sketch_in_worker(sequence_ids):
+    return np.array([minhash_sketch(worker_state['sequences'][idx], worker_state['k'], worker_state['hash_a'], worker_state['hash_b']) for idx in sequence_ids])
+
+# Get the candidate pairs that are within the cutoff
+def check_pairs_in_worker(pairs):
+    sequences = worker_state['sequences']
+    linked = []
+    for i, j in pairs:
+        max_distance = int(worker_state['cutoff'] * max(len(sequences[i]), len(sequences[j])))
+        if levenshtein_distance(sequences[i], sequences[j], score_cutoff=max_distance) <= max_distance:
+            linked.append((i, j))
+    return linked
+
+# Keep the candidate pairs of a band that share no earlier band, so that each pair is only yielded for the first band it shares
+def first_shared_band(pairs, keys_i, keys_j, band):
+    return pairs[(keys_i[pairs[:, 0], :band] != keys_j[pairs[:, 1], :band]).all(axis=1)]
+
+# Yield the candidate pairs (i < j) of sequences that share at least one LSH band, as arrays of pairs, band by band: within a band, the
+# sequences sorted by band key are paired with the one d positions further with the same key, for d = 1, 2, ... while any is left
+def yield_candidate_pairs(keys, valid):
+    rows = np.flatnonzero(valid)
+    for band in range(keys.shape[1]):
+        order = rows[np.argsort(keys[rows, band], kind='stable')]
+        sorted_keys = keys[order, band]
+        positions = np.arange(len(order))
+        distance = 1
+        while len(positions):
+            positions = positions[positions + distance < len(order)]
+            positions = positions[sorted_keys[positions] == sorted_keys[positions + distance]]
+            pairs = np.sort(np.stack([order[positions], order[positions + distance]], axis=1), axis=1)
+            pairs = first_shared_band(pairs, keys, keys, band)
+            if len(pairs):
+                yield pairs
+            distance += 1
+
+# Yield the candidate pairs (reference, query) of query sequences that share at least one LSH band with reference sequences, as arrays of
+# pairs, band by band, by looking the band keys of the queries up in the sorted band keys of the references
+def yield_reference_pairs(reference_keys, reference_valid, query_keys, query_valid):
+    references = np.flatnonzero(reference_valid)
+    queries = np.flatnonzero(query_valid)
+    for band in range(reference_keys.shape[1]):
+        order = references[np.argsort(reference_keys[references, band], kind='stable')]
+        sorted_keys = reference_keys[order, band]
+        starts = np.searchsorted(sorted_keys, query_keys[queries, band], side='left')
+        counts = np.searchsorted(sorted_keys, query_keys[queries, band], side='right') - starts
+        if not counts.any():
+            continue
+        # Positions of the matching references of each query in the sorted order: start, start + 1, ... start + count - 1
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pairs = np.stack([order[np.repeat(starts, counts) + offsets], np.repeat(queries, counts)], axis=1)
+        pairs = first_shared_band(pairs, reference_keys, query_keys, band)
+        if len(pairs):
+            yield pairs
+
+# Split arrays of pairs into chunks of at most chunk_size pairs, for the worker processes
+def chunk_pairs(pair_arrays, chunk_size=CHECK_CHUNK_SIZE):
+    for pairs in pair_arrays:
+        for start in range(0, len(pairs), chunk_size):
+            yield pairs[start:start + chunk_size]
+
+# Check candidate pairs in a pool of worker processes as they are generated, with a few chunks pending per process so that the candidate
+# pairs are not generated faster than they are checked, and get the linked pairs and the number of candidate pairs
+def check_pairs(pool, processors, pair_arrays):
+    links = []
+    n_pairs = 0
+    pending = deque()
+    for pairs in chunk_pairs(pair_arrays):
+        n_pairs += len(pairs)
+        pending.append(pool.apply_async(check_pairs_in_worker, (pairs,)))
+        if len(pending) >= 4 * (processors or multiprocessing.cpu_count()):
+            links.extend(pending.popleft().get())
+    while pending:
+        links.extend(pending.popleft().get())
+    return links, n_pairs
+
+# Union-find with path halving, to merge linked sequences into clusters
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def union_find_clusters(n_sequences, links):
+    parent = list(range(n_sequences))
+    for i, j in links:
+        root_i, root_j = find(parent, i), find(parent, j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    # Number the clusters from 1 in order of first appearance
+    cluster_ids = {}
+    return [cluster_ids.setdefault(find(parent, i), len(cluster_ids) + 1) for i in range(n_sequences)]
+
+# Split a list into chunks, for the worker processes
+def chunks(items, chunk_size):
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+# Get the sketches of sequences, computed in a pool of worker processes
+def sketch_sequences(sequences, k=7, num_hashes=288, processors=None, seed=42):
+    if not 1 <= k <= 15:
+        raise ValueError(f"k ({k}) must be between 1 and 15")
+    hash_a, hash_b = hash_parameters(num_hashes, seed)
+    if not sequences:
+        return np.empty((0, num_hashes), dtype=np.uint64)
+    with multiprocessing.Pool(processors, initializer=init_worker, initargs=(sequences, k, hash_a, hash_b, None)) as pool:
+        return np.concatenate(pool.map(sketch_in_worker, chunks(list(range(len(sequences))), 1000)))
+
+# Get one key per band of each sketch, as a 64-bit hash of the band (colliding bands only add candidates, which are checked exactly)
+def band_keys(sketches, bands):
+    band_size = sketches.shape[1] // bands
+    multipliers = np.random.RandomState(0).randint(1, 1 << 62, size=band_size, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+    return np.stack([(band * multipliers).sum(axis=1) for band in np.split(sketches.astype(np.uint64), bands, axis=1)], axis=1)
+
+# Get, for each query sequence, the indices of the reference sequences within the cutoff, among those that share at least one LSH band with it;
+# the sketches of the references can be given (e.g. cached), so that only the queries are sketched
+def match_sequences(queries, references, reference_sketches=None, cutoff=0.1, k=7, num_hashes=288, bands=96, processors=None, seed=42):
+    if num_hashes % bands != 0:
+        raise ValueError(f"num_hashes ({num_hashes}) must be a multiple of bands ({bands})")
+    if reference_sketches is None:
+        reference_sketches = sketch_sequences(references, k, num_hashes, processors, seed)
+    query_sketches = sketch_sequences(queries, k, num_hashes, processors, seed)
+
+    reference_keys, query_keys = band_keys(reference_sketches, bands), band_keys(query_sketches, bands)
+    pair_arrays = yield_reference_pairs(reference_keys, reference_sketches[:, 0] != MERSENNE_PRIME, query_keys, query_sketches[:, 0] != MERSENNE_PRIME)
+
+    # Check the candidate pairs exactly, with the queries numbered after the references
+    hash_a, hash_b = hash_parameters(num_hashes, seed)
+    with multiprocessing.Pool(processors, initializer=init_worker, initargs=(list(references) + list(queries), k, hash_a, hash_b, cutoff)) as pool:
+        links, n_pairs = check_pairs(pool, processors, (pairs + [0, len(references)] for pairs in pair_arrays))
+
+    print(f"Checked {n_pairs} candidate pairs of {len(queries)} sequences against {len(references)} reference sequences, of which {len(links)} are within the cutoff.")
+    matches = [[] for _ in queries]
+    for reference, query in links:
+        matches[query - len(references)].append(reference)
+    return matches
+
+def cluster_sequences(sequences, cutoff=0.1, k=7, num_hashes=288, bands=96, processors=None, seed=42):
+    if not 1 <= k <= 15:
+        raise ValueError(f"k ({k}) must be between 1 and 15")
+    if num_hashes % bands != 0:
+        raise ValueError(f"num_hashes ({num_hashes}) must be a multiple of bands ({bands})")
+    hash_a, hash_b = hash_parameters(num_hashes, seed)
+
+    with multiprocessing.Pool(processors, initializer=init_worker, initargs=(sequences, k, hash_a, hash_b, cutoff)) as pool:
+        sketch_chunks = pool.map(sketch_in_worker, chunks(list(range(len(sequences))), 1000))
+        sketches = np.concatenate(sketch_chunks) if sketch_chunks else np.empty((0, num_hashes), dtype=np.uint64)
+
+        pair_arrays = yield_candidate_pairs(band_keys(sketches, bands), sketches[:, 0] != MERSENNE_PRIME)
+        links, n_pairs = check_pairs(pool, processors, pair_arrays)
+
+    print(f"Checked {n_pairs} candidate pairs of {len(sequences)} sequences, of which {len(links)} are within the cutoff.")
+    return union_find_clusters(len(sequences), links)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster gene sequences with MinHash sketches and LSH, checking candidate pairs by edit distance.")
+    parser.add_argument('input_fasta', help="Input FASTA file with gene sequences")
+    parser.add_argument('output_csv', help="Output CSV file for sequence-to-cluster assignments")
+    parser.add_argument('--cutoff', type=float, default=0.1, help="Maximum normalised edit distance between linked sequences (default: 0.1)")
+    parser.add_argument('--k', type=int, default=7, help="k-mer size of the sketches (default: 7)")
+    parser.add_argument('--num_hashes', type=int, default=288, help="Number of MinHash functions per sketch (default: 288)")
+    parser.add_argument('--bands', type=int, default=96, help="Number of LSH bands (default: 96)")
+    parser.add_argument('--processors', type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the hash functions (default: 42)")
+    args = parser.parse_args()
+
+    records = read_fasta(args.input_fasta)
+    cluster_ids = cluster_sequences([sequence for _, sequence in records], args.cutoff, args.k, args.num_hashes, args.bands, args.processors, args.seed)
+
+    write_clusters(args.output_csv, {name: cluster_id for (name, _), cluster_id in zip(records, cluster_ids)})
+    print(f"Clusters saved to {args.output_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,46 @@
 """
-Splits a dataset into 'excluded' and 'remaining' entries based on a provided list of unique miRNA families.
+Splits a dataset into 'excluded' and 'remaining' entries based on a provided list of unique miRNA families, in one streaming pass over the dataset.
 
 Usage:
-    python dataset_split_based_on_unique_families.py --unique_to <INPUT_TSV> --input_unique_fam_counts <FAM_TSV> --excluded_dataset <EXCLUDED_TSV> --remaining_dataset <REMAINING_TSV>
+    python dataset_split_based_on_unique_families.py --unique_to <INPUT_TABLE> --input_unique_fam_counts <FAM_TSV> --excluded_dataset <EXCLUDED_TABLE> --remaining_dataset <REMAINING_TABLE> [--chunksize <ROWS>]
 
 Arguments:
-    --unique_to               Original dataset file (TSV)
+    --unique_to               Original dataset file (TSV, or Feather/Parquet by extension, see table_io.py)
     --input_unique_fam_counts File with unique families (TSV)
-    --excluded_dataset        Output file for entries with families in the unique families file (TSV)
-    --remaining_dataset       Output file for entries with families not in the unique families file (TSV)
+    --excluded_dataset        Output file for entries with families in the unique families file (TSV, or Feather/Parquet by extension)
+    --remaining_dataset       Output file for entries with families not in the unique families file (TSV, or Feather/Parquet by extension)
+    --chunksize               Number of rows of the dataset processed at a time (default: 100000)
 """
 
 import pandas as pd
 import argparse
+from dataset_summary import column_values
+from table_io import read_table_chunks, TableWriter
 
-def filter_dataset(input_dataset, families_file, excluded_output, remaining_output):
-    # Read the original dataset
-    df = pd.read_csv(input_dataset, sep='\t')
-    
+def filter_dataset(input_dataset, families_file, excluded_output, remaining_output, chunksize=100000):
     # Read the families file
-    families_df = pd.read_csv(families_file, sep='\t')
-    unique_families = families_df['noncodingRNA_fam']
-    
-    # Split the dataset into two parts
-    excluded_dataset = df[df['noncodingRNA_fam'].isin(unique_families)]
-    remaining_dataset = df[~df['noncodingRNA_fam'].isin(unique_families)]
+    families_df = pd.read_csv(families_file, sep='\t', dtype=str, keep_default_na=False)
+    unique_families = set(families_df['noncodingRNA_fam'])
     
-    # Save both datasets
-    excluded_dataset.to_csv(excluded_output, sep='\t', index=False)
-    remaining_dataset.to_csv(remaining_output, sep='\t', index=False)
+    # Split the dataset into two parts, in one pass over its chunks, with all values of a TSV file as text so that they are written back unchanged
+    n_excluded = n_remaining = 0
+    with TableWriter(excluded_output) as excluded_writer, TableWriter(remaining_output) as remaining_writer:
+        for df in read_table_chunks(input_dataset, chunksize, dtype=str, keep_default_na=False):
+            excluded = column_values(df, 'noncodingRNA_fam').isin(unique_families)
+            excluded_writer.write(df[excluded])
+            remaining_writer.write(df[~excluded])
+            n_excluded += int(excluded.sum())
+            n_remaining += int((~excluded).sum())
     
-    # print(f"Original dataset: {len(df)} rows")
-    # print(f"Excluded dataset: {len(excluded_dataset)} rows")
-    # print(f"Remaining dataset: {len(remaining_dataset)} rows")
+    print(f"Excluded dataset: {n_excluded} rows")
+    print(f"Remaining dataset: {n_remaining} rows")
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--unique_to', required=True, help='Original dataset TSV file')
 parser.add_argument('--input_unique_fam_counts', required=True, help='File with unique families')
 parser.add_argument('--excluded_dataset', required=True, help='Output file for families that match input families file')
 parser.add_argument('--remaining_dataset', required=True, help='Output file for families not in input families file')
+parser.add_argument('--chunksize', type=int, default=100000, help='Number of rows processed at a time')
 
 args = parser.parse_args()
-filter_dataset(args.unique_to, args.input_unique_fam_counts, args.excluded_dataset, args.remaining_dataset)
+filter_dataset(args.unique_to, args.input_unique_fam_counts, args.excluded_dataset, args.remaining_dataset, args.chunksize)
@@ -0,0 +1,87 @@
+"""
+Builds a summary of a dataset in one streaming scan, saved as a JSON sidecar next to it (<DATASET>.summary.json), with the row count and the
+counts of its miRNA families, miRNAs, gene clusters and labels (for the columns present in the dataset), in order of first appearance.
+
+Steps that only need these counts (e.g. the miRNA family exclusion, or analyses of the miRNA frequency class bias) read the sidecar instead of
+the dataset. A sidecar records the size and modification time of its dataset, and is rebuilt whenever they change.
+
+Usage:
+    python dataset_summary.py --ifile <INPUT_TABLE> [--chunksize <ROWS>]
+
+Arguments:
+    --ifile        Dataset file (TSV, or Feather/Parquet by extension, see table_io.py)
+    --chunksize    Number of rows of the dataset processed at a time (default: 100000)
+"""
+
+import argparse
+from collections import Counter
+import json
+import os
+from table_io import table_columns, read_table_chunks
+
+# Counts of the summary, and the column they count
+SUMMARY_COUNTS = {
+    'families': 'noncodingRNA_fam',
+    'mirnas': 'noncodingRNA',
+    'clusters': 'gene_cluster_ID',
+    'labels': 'label'
+}
+
+# Get the sidecar summary file name of a dataset
+def get_summary_file_name(path):
+    return f"{path}.summary.json"
+
+# Get the size and modification time of a dataset, to tell whether its summary is up to date
+def get_file_version(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+# Get the values of a column of a chunk as text, with missing values as empty strings, as read from TSV
+def column_values(chunk, column):
+    return chunk[column].fillna('').astype(str)
+
+# Count the values of the summary columns of a dataset in one scan, with all values as text
+def summarize(path, chunksize=100000):
+    columns = {name: column for name, column in SUMMARY_COUNTS.items() if column in table_columns(path)}
+    counts = {name: Counter() for name in columns}
+    rows = 0
+
+    for chunk in read_table_chunks(path, chunksize, columns=list(columns.values()), dtype=str, keep_default_na=False):
+        rows += len(chunk)
+        for name, column in columns.items():
+            values = column_values(chunk, column)
+            counts[name].update(values.groupby(values, sort=False).size().to_dict())
+
+    return {'file_version': get_file_version(path), 'rows': rows, **{name: dict(counter) for name, counter in counts.items()}}
+
+# Write the summary of a dataset to its sidecar, atomically
+def write_summary(path, summary):
+    summary_file = get_summary_file_name(path)
+    with open(summary_file + '.tmp', 'w') as f:
+        json.dump(summary, f)
+    os.replace(summary_file + '.tmp', summary_file)
+
+# Load the summary of a dataset from its sidecar, building (and saving) it first if it is missing or out of date
+def load_summary(path, chunksize=100000):
+    summary_file = get_summary_file_name(path)
+    if os.path.exists(summary_file):
+        with open(summary_file) as f:
+            summary = json.load(f)
+        if summary['file_version'] == get_file_version(path):
+            return summary
+
+    summary = summarize(path, chunksize)
+    write_summary(path, summary)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the summary sidecar of a dataset.")
+    parser.add_argument('--ifile', required=True, help="Dataset file")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Number of rows processed at a time")
+    args = parser.parse_args()
+
+    summary = load_summary(args.ifile, args.chunksize)
+    print(f"Summary of {args.ifile} ({summary['rows']} rows) saved to {get_summary_file_name(args.ifile)}")
+
+if __name__ == "__main__":
+    main()
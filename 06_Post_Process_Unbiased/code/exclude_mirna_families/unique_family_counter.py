@@ -1,36 +1,42 @@
 """
 Identifies and counts miRNA families unique to the input file relative to two comparison files.
 
+The families and their counts are read from the summary sidecar of each file (dataset_summary.py), built in one scan of the file if it is
+missing or out of date, so the unique families are found by set arithmetic over the summaries, without reading the files again.
+
 Usage:
-    python unique_family_counter.py --unique_to <INPUT_TSV> --input_relative_file1 <COMPARE1_TSV> --input_relative_file2 <COMPARE2_TSV> --output_unique_fam_counts <OUTPUT_TSV>
+    python unique_family_counter.py --unique_to <INPUT_TABLE> --input_relative_file1 <COMPARE1_TABLE> --input_relative_file2 <COMPARE2_TABLE> --output_unique_fam_counts <OUTPUT_TSV>
 
 Arguments:
-    --unique_to                  File to find unique families from (TSV)
-    --input_relative_file1       First comparison file (TSV)
-    --input_relative_file2       Second comparison file (TSV)
-    --output_unique_fam_counts   Output file for unique family counts (TSV)
+    --unique_to                  File to find unique families from (TSV, or Feather/Parquet by extension, see table_io.py)
+    --input_relative_file1       First comparison file (TSV, or Feather/Parquet by extension)
+    --input_relative_file2       Second comparison file (TSV, or Feather/Parquet by extension)
+    --output_unique_fam_counts   Output file for unique family counts (TSV, with noncodingRNA_fam and count columns)
 """
 
-import pandas as pd
 import argparse
+import csv
+from dataset_summary import load_summary
 
 def get_unique_fams(file_path):
-   df = pd.read_csv(file_path, sep='\t')
-   filtered_df = df[(df['noncodingRNA_fam'] != 'unknown') & (df['noncodingRNA_fam'] != '0')]
-   return set(filtered_df['noncodingRNA_fam'].unique())
+   families = load_summary(file_path).get('families', {})
+   return {family for family in families if family not in ('unknown', '0')}
 
 def analyze_unique_families(unique_input_file, file2_path, file3_path, output_path):
-   df1 = pd.read_csv(unique_input_file, sep='\t')
+   family_counts = load_summary(unique_input_file)['families']
    families1 = get_unique_fams(unique_input_file)
-   families2 = get_unique_fams(file2_path) 
+   families2 = get_unique_fams(file2_path)
    families3 = get_unique_fams(file3_path)
 
    unique_to_1 = families1 - (families2 | families3)
-   unique_counts = df1[df1['noncodingRNA_fam'].isin(unique_to_1)]['noncodingRNA_fam'].value_counts()
-   
-   unique_counts.to_csv(output_path, sep='\t')
+   unique_counts = sorted(((family, count) for family, count in family_counts.items() if family in unique_to_1), key=lambda item: item[1], reverse=True)
+
+   with open(output_path, 'w', newline='') as f:
+      writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+      writer.writerow(['noncodingRNA_fam', 'count'])
+      writer.writerows(unique_counts)
    print(f"Unique families: {len(unique_to_1)}")
-   print(f"Total occurrences: {unique_counts.sum()}")
+   print(f"Total occurrences: {sum(count for _, count in unique_counts)}")
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--unique_to', required=True, help='File to find unique families from')
@@ -1,16 +1,36 @@
 """
 Filters input data that includes various noncoding RNA biotypes for miRNA entries and creates a standardised table with selected columns and a new `test` column indicating whether the target site is located on chromosome 1. 
 
+The input (HybriDetector output) is read in chunks, with only the columns needed and all their values as text (so chromosomes are always
+compared as text, and coordinates are written back unchanged), and each chunk is filtered before the standardised table is built, so that
+memory use scales with the chunk size rather than with the input file.
+
 Usage:
-    python filtering.py --ifile <INPUT_TSV> --ofile <OUTPUT_TSV>
+    python filtering.py --ifile <INPUT_TSV> --ofile <OUTPUT_TABLE> [--chunksize <ROWS>]
 
 Arguments:
-    --ifile    Path to input TSV file
-    --ofile    Output path for filtered table (TSV)
+    --ifile        Path to input TSV file (optionally compressed, as .tsv.gz or .tsv.zst)
+    --ofile        Output path for filtered table (TSV, or Feather/Parquet by extension, see table_io.py)
+    --chunksize    Number of rows of the input file processed at a time (default: 100000)
 """
 
 import pandas as pd
 import argparse
+from table_io import read_table_chunks, TableWriter
+
+# Columns of the HybriDetector output used for the standardised table, and their types
+HYBRIDETECTOR_DTYPES = {
+    'seq.g': str,
+    'noncodingRNA_seq': str,
+    'noncodingRNA': str,
+    'noncodingRNA_fam': str,
+    'feature': str,
+    'chr.g': str,
+    'start.g': str,
+    'end.g': str,
+    'strand.g': str,
+    'noncodingRNA_type': 'category'
+}
 
 def filter_and_create_table(data):
 
@@ -21,10 +41,10 @@ def filter_and_create_table(data):
     filtered_table = pd.DataFrame({
         'gene': filtered_data['seq.g'],
         'noncodingRNA': filtered_data['noncodingRNA_seq'],
-        'noncodingRNA_name': filtered_data['noncodingRNA'].apply(lambda x: x.split('|')[0]),
-        'noncodingRNA_fam': filtered_data['noncodingRNA_fam'].apply(lambda x: x if x != '0' else 'unknown'),
+        'noncodingRNA_name': filtered_data['noncodingRNA'].str.split('|', n=1).str[0],
+        'noncodingRNA_fam': filtered_data['noncodingRNA_fam'].where(filtered_data['noncodingRNA_fam'] != '0', 'unknown'),
         'feature': filtered_data['feature'],
-        'test': filtered_data['chr.g'].apply(lambda x: True if x == '1' else False),
+        'test': filtered_data['chr.g'] == '1',
         'label': '1',
         'chr': filtered_data['chr.g'],
         'start': filtered_data['start.g'],
@@ -34,15 +54,21 @@ def filter_and_create_table(data):
 
     return filtered_table
 
+# Read the input file in chunks of only the needed columns, and yield the standardised table of the miRNA entries of each chunk
+def read_filtered_chunks(path, chunksize=100000):
+    for chunk in read_table_chunks(path, chunksize, columns=list(HYBRIDETECTOR_DTYPES), dtype=HYBRIDETECTOR_DTYPES):
+        yield filter_and_create_table(chunk)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--ifile', required=True, help="Input file")
     parser.add_argument('--ofile', required=True, help="Output file")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Number of rows processed at a time")
     args = parser.parse_args()
 
-    data = pd.read_csv(args.ifile, sep='\t')
-    filtered_table = filter_and_create_table(data)
-    filtered_table.to_csv(args.ofile, sep='\t', index=False)
+    with TableWriter(args.ofile) as writer:
+        for filtered_table in read_filtered_chunks(args.ifile, args.chunksize):
+            writer.write(filtered_table)
 
 if __name__ == "__main__":
     main()
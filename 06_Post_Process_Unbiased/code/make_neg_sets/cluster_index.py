@@ -0,0 +1,121 @@
+"""
+Precomputed gene cluster index of a positive examples file, used by make_neg_sets.py to draw negative examples without filtering,
+shuffling and deduplicating the full positive examples DataFrame for every miRNA family block.
+
+The index holds, in file row order, the byte offset of each row and the code of its gene cluster, and maps each cluster code to its row
+positions. Negative rows are rendered from the raw text of the positive rows, read from a memory map of the input file.
+
+The index arrays can be saved as .npy files and loaded as read-only memory maps, so that worker processes share them with the main process.
+"""
+
+import json
+import mmap
+import os
+import numpy as np
+
+INDEX_ARRAYS = ('row_offsets', 'cluster_codes', 'cluster_rows', 'cluster_starts')
+
+class ClusterIndex:
+
+    def __init__(self, path, cluster_column='gene_cluster_ID'):
+        self.path = path
+        self.cluster_ids = {}
+        row_offsets = []
+        cluster_codes = []
+
+        # Scan the file once, recording the byte offset and cluster code of each row
+        with open(path, 'rb') as file:
+            header_line = file.readline()
+            self.header_columns = header_line.decode().strip().split('\t')
+            cluster_index = self.header_columns.index(cluster_column)
+
+            offset = len(header_line)
+            for line in file:
+                cluster_id = line.strip().split(b'\t')[cluster_index].decode()
+                row_offsets.append(offset)
+                cluster_codes.append(self.cluster_ids.setdefault(cluster_id, len(self.cluster_ids)))
+                offset += len(line)
+
+        self.row_offsets = np.array(row_offsets, dtype=np.int64)
+        self.cluster_codes = np.array(cluster_codes, dtype=np.int32)
+
+        # Map each cluster code to its row positions (in row order), as a CSR-like pair of arrays
+        self.cluster_rows = np.argsort(self.cluster_codes, kind='stable')
+        self.cluster_starts = np.concatenate([[0], np.cumsum(np.bincount(self.cluster_codes, minlength=len(self.cluster_ids)))])
+
+        self.open_data()
+
+    # Open a read-only memory map of the input file
+    def open_data(self):
+        self.file = open(self.path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(self.path) > 0 else b''
+
+    # Save the index arrays (as .npy files) and the cluster ids to a directory
+    def save(self, directory):
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, 'cluster_ids.json'), 'w') as f:
+            json.dump({'header_columns': self.header_columns, 'cluster_ids': self.cluster_ids}, f)
+
+    # Load an index saved with save(), with the index arrays as read-only memory maps
+    @classmethod
+    def load(cls, path, directory):
+        index = cls.__new__(cls)
+        index.path = path
+        for name in INDEX_ARRAYS:
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'))
+        with open(os.path.join(directory, 'cluster_ids.json')) as f:
+            meta = json.load(f)
+        index.header_columns = meta['header_columns']
+        index.cluster_ids = meta['cluster_ids']
+        index.open_data()
+        return index
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    # Get the row positions of the given cluster codes
+    def rows_of_clusters(self, codes):
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.cluster_rows[self.cluster_starts[code]:self.cluster_starts[code + 1]] for code in codes])
+
+    # Get the split fields of a row, from the memory map of the input file
+    def row_fields(self, row):
+        start = self.row_offsets[row]
+        end = self.data.find(b'\n', start)
+        return self.data[start:end if end != -1 else len(self.data)].decode().strip().split('\t')
+
+    # Get the negative pool of a block: one random representative row per cluster not in excluded_cluster_ids, in shuffled order
+    # Reproduces the pandas sampler exactly: filter rows by allowed clusters, shuffle with DataFrame.sample(frac=1, random_state=seed),
+    # then keep the first row per cluster
+    def negative_pool(self, excluded_cluster_ids, seed):
+
+        # Mask out the rows of the excluded clusters, without copying any row data
+        excluded_codes = [self.cluster_ids[cluster_id] for cluster_id in excluded_cluster_ids if cluster_id in self.cluster_ids]
+        allowed_mask = np.ones(len(self.row_offsets), dtype=bool)
+        allowed_mask[self.rows_of_clusters(excluded_codes)] = False
+        allowed_rows = np.flatnonzero(allowed_mask)
+
+        # Shuffle the allowed rows and keep the first row of each cluster, in shuffled order
+        shuffled_rows = allowed_rows[np.random.RandomState(seed).permutation(len(allowed_rows))]
+        _, first_positions = np.unique(self.cluster_codes[shuffled_rows], return_index=True)
+        return shuffled_rows[np.sort(first_positions)]
+
+    # Draw num_neg negative rows for a block from its negative pool, as DataFrame.sample(n=num_neg, random_state=seed) does, i.e. the first
+    # num_neg rows of RandomState(seed).permutation(len(pool)) for sampling without replacement
+    def sample_negative_rows(self, excluded_cluster_ids, num_neg, seed):
+        negative_pool = self.negative_pool(excluded_cluster_ids, seed)
+
+        if num_neg > len(negative_pool):
+            return None
+
+        return negative_pool[np.random.RandomState(seed).permutation(len(negative_pool))[:num_neg]]
+
+    # Draw up to max_num negative rows for a block as a single seeded permutation of its negative pool, so that the negatives of any smaller
+    # number are a prefix of it; the first num_neg rows are those of sample_negative_rows(excluded_cluster_ids, num_neg, seed)
+    def permute_negative_rows(self, excluded_cluster_ids, max_num, seed):
+        negative_pool = self.negative_pool(excluded_cluster_ids, seed)
+        return negative_pool[np.random.RandomState(seed).permutation(len(negative_pool))[:max_num]]
@@ -1,52 +1,58 @@
 """
-Generates negative examples at 1:1 ratio for each miRNA family block in a sorted input file, ensuring:
+Generates negative examples at 1:1 ratio (or at several ratios, with --neg_ratios) for each miRNA family block in a sorted input file, ensuring:
     1. no gene cluster overlap with positives (producing negatives that are sufficiently different from positives)
     2. no gene cluster overlap within negatives for the same miRNA family (producing negatives that are sufficiently different from each other)
 
+Negative gene rows are drawn via a precomputed cluster index (cluster_index.py), which reproduces the original pandas sampler exactly
+(checked for fixed seeds by tests/test_cluster_index.py, and for every block of a run with --check_equivalence).
+Note that the original sampler compared the block's cluster ids (as text) with integer cluster ids, so point 1 was never applied; this
+exclusion behaviour of the original sampler is kept by default, and --exclude_positive_clusters applies point 1. The published datasets are
+only reproduced from an input sorted as by the original sort step (the default of 2_post_process-make_negatives.sh), read without --unsorted,
+since the blocks, their row order and their seeds depend on the input order.
+
+With --neg_ratios (e.g. 1,10,100), the negatives of each block are drawn once, as a single seeded permutation of its negative pool, and each
+ratio takes a prefix of it, so all ratios are generated in one pass and the negatives of a smaller ratio are a subset of those of a larger one.
+The negatives at ratio 1 are the same as those of a 1:1 run. Negative j of a block is paired with the miRNA of positive j modulo the block size.
+Blocks whose pool cannot fill a ratio get all the negatives available and the shortfall is reported, instead of raising an error.
+
 Usage:
-    python make_neg_sets.py --ifile <INPUT_TSV> --ofile <OUTPUT_TSV>
+    python make_neg_sets.py --ifile <INPUT_TSV> --ofile <OUTPUT_TSV> [--unsorted] [--neg_ratios <RATIO>,<RATIO>...] [--exclude_positive_clusters] [--check_equivalence] [--workers <N>] [--write_buffer_size <BYTES>] [--resume] [--checkpoint_every <BLOCKS>]
 
 Arguments:
-    --ifile    Input file name (TSV, must be sorted by 'noncodingRNA_fam')
-    --ofile    Output file for positive and negative examples (TSV)
+    --ifile                        Input file name (TSV, or Feather/Parquet by extension, see table_io.py; must be sorted by 'noncodingRNA_fam' unless --unsorted is given)
+    --ofile                        Output file for positive and negative examples (TSV); must contain '{ratio}' if several ratios are given
+    --unsorted                     Input file is not sorted; miRNA families are visited in sorted order via an index of row byte offsets, built in one scan
+    --neg_ratios                   Comma-separated numbers of negatives per positive, drawn as nested prefixes of one permutation, with shortfalls
+                                   reported (default: 1:1 only, raising an error if a block's pool is too small)
+    --exclude_positive_clusters    Exclude the gene clusters of a block's positives from its negative pool (differs from the original sampler)
+    --check_equivalence            Also run the original pandas sampler for every block and check that it draws the same negatives (slow)
+    --workers                      Number of worker processes generating negatives for miRNA family blocks, sharing the cluster index via memory maps;
+                                   blocks are written in their original order, so the output is identical to a serial run (default: 1)
+    --write_buffer_size            Buffer size in bytes of the output file writer (default: 1048576)
+    --resume                       Resume from the checkpoint (<OUTPUT>.ckpt) of an interrupted run, if any, truncating the output file to it;
+                                   the output is the same as that of an uninterrupted run, since each block's negatives depend only on its own seed
+    --checkpoint_every             Number of blocks between checkpoints, removed once the run completes (default: 1000)
 """
 
 import argparse
+from contextlib import ExitStack
+import multiprocessing
+import numpy as np
+import os
 import pandas as pd
+import tempfile
 import time
 import hashlib
+from blocks import read_blocks
+from checkpoint import get_checkpoint_file_name, get_file_fingerprint, get_synced_offset, write_checkpoint, read_checkpoint, truncate_outputs, skip_completed, remove_checkpoint
+from cluster_index import ClusterIndex
+from table_io import tsv_file
 
-# Yield blocks of positive examples with the same mirnafam to process at a time
-def yield_mirnafam_blocks(positive_file_path):
-    current_block = []
-    current_mirnafam = None
-
-    with open(positive_file_path, 'r') as file:
-        header_columns = file.readline().strip().split('\t')
-        mirnafam_index = header_columns.index('noncodingRNA_fam')
-
-        for line in file:
-            columns = line.strip().split('\t')
-            mirnafam = columns[mirnafam_index]
-
-            if mirnafam != current_mirnafam:
-                if current_block:
-                    block_df = pd.DataFrame(current_block, columns=header_columns)
-                    yield block_df
-                current_block = [columns]
-                current_mirnafam = mirnafam
-            else:
-                current_block.append(columns)
-
-    if current_block:
-        block_df = pd.DataFrame(current_block, columns=header_columns)
-        yield block_df
-
-def process_block(block, positive_samples, all_clusters, output_file):
+# Get a fixed seed for reproducibility but different for each miRNA family block
+def get_block_seed(block):
 
-    # Set a fixed seed for reproducibility but different for each miRNA family block
     ## Get the first item from 'noncodingRNA_name'
-    miRNA_name = block['noncodingRNA_name'].iloc[0]
+    miRNA_name = block.first('noncodingRNA_name')
 
     ## Generate a SHA-256 hash and get the hexadecimal string
     miRNA_hash_hex = hashlib.sha256(miRNA_name.encode()).hexdigest()
@@ -55,12 +61,13 @@ def process_block(block, positive_samples, all_clusters, output_file):
     miRNA_hash_int = int(miRNA_hash_hex, 16)
 
     ## Reduce the size using modulo (e.g., within the range of a 32-bit unsigned integer) and set it as the seed
-    seed = miRNA_hash_int % 4294967295
+    return miRNA_hash_int % 4294967295
 
-    # Get the set of cluster ids that share this miRNA family
-    block_clusters = block['gene_cluster_ID'].unique().tolist()
+# Draw the negative rows (row positions) of a block with the original pandas sampler, used to check the equivalence of the indexed sampler
+def sample_negative_rows_reference(positive_samples, block_clusters, num_neg, seed):
 
     # Get the set of cluster ids that are allowed to be paired with this miRNA family, i.e. those that do not share the same cluster ids as the current miRNA family block
+    all_clusters = positive_samples['gene_cluster_ID'].unique().tolist()
     mirfam_allowed_clusters = [cluster for cluster in all_clusters if cluster not in block_clusters]
 
     # Pool gene rows from allowed clusters
@@ -69,81 +76,213 @@ def process_block(block, positive_samples, all_clusters, output_file):
     # Shuffle the negative pool and drop duplicates based on ClusterID, so that a single random gene per cluster is allowed in the negative pool
     negative_pool = negative_pool.sample(frac=1, random_state=seed).drop_duplicates(subset=['gene_cluster_ID'], keep='first')
 
-    # Get the number of negatives to be generated for this miRNA family block
-    num_neg = block.shape[0]
-
     if num_neg > len(negative_pool):
-        raise ValueError(f"Warning: Not enough negative examples for current block. miRNA family: {block['noncodingRNA_fam'].iloc[0]}, first miRNA sequence: {block['noncodingRNA'].iloc[0]}")
+        return None
 
     # Sample num_neg from mirfam_allowed_genes rows
-    negative_genes = negative_pool.sample(n=num_neg, random_state=seed)
-
-    # Start constructing the df rows for the negative examples
-    columns = ['gene', 'feature', 'test', 'chr', 'start', 'end', 'strand', 'gene_cluster_ID']
-    negatives_df  = negative_genes[columns].copy()
-
-    # Add the miRNA sequence, name and family columns from block to negatives_df by index
-    negatives_df['noncodingRNA'] = block['noncodingRNA'].values
-    negatives_df['noncodingRNA_name'] = block['noncodingRNA_name'].values
-    negatives_df['noncodingRNA_fam'] = block['noncodingRNA_fam'].values
-
-    # Add the label column to negatives_df
-    negatives_df['label'] = 0
-
-    # Reorder columns in negatives_df to match the order in block
-    negatives_df = negatives_df[block.columns]
-
-    # Append positive examples for this block to the output file
-    block.to_csv(output_file, sep='\t', index=False, header=False, mode='a')
-
-    # Append negative examples for this block to the output file
-    negatives_df.to_csv(output_file, sep='\t', index=False, header=False, mode='a')
+    return negative_pool.sample(n=num_neg, random_state=seed).index.to_numpy()
+
+# Generate the negative examples of a block at each of the neg_ratios, and get, per neg_ratio, the text of its positive and negative examples
+# to append to the output file and the number of negatives missing for it; a shortfall raises an error unless allow_shortfall is set
+def process_block(block, cluster_index, neg_ratios=(1,), exclude_positive_clusters=False, reference_samples=None, allow_shortfall=False):
+
+    seed = get_block_seed(block)
+
+    # Get the set of cluster ids that share this miRNA family, to exclude from the negative pool
+    # The original sampler compared these cluster ids, read as text, with the integer cluster ids of the positive examples DataFrame, so that no
+    # cluster was ever excluded; this exclusion behaviour is kept by default, while --exclude_positive_clusters excludes them
+    block_clusters = block.unique('gene_cluster_ID')
+    excluded_clusters = block_clusters if exclude_positive_clusters else []
+
+    # Get the number of negatives to be generated for this miRNA family block at 1:1, and at the largest neg_ratio
+    num_neg = len(block)
+    max_num_neg = max(neg_ratios) * num_neg
+
+    # Draw one random gene row per allowed cluster and permute them, via the cluster index; each neg_ratio takes a prefix of the permutation
+    negative_rows = cluster_index.permute_negative_rows(excluded_clusters, max_num_neg, seed)
+
+    if len(negative_rows) < max_num_neg and not allow_shortfall:
+        raise ValueError(f"Warning: Not enough negative examples for current block. miRNA family: {block.first('noncodingRNA_fam')}, first miRNA sequence: {block.first('noncodingRNA')}")
+
+    # Check that the original pandas sampler draws the same rows at 1:1, if requested
+    if reference_samples is not None and len(negative_rows) >= num_neg:
+        if exclude_positive_clusters:
+            block_clusters = pd.Series(block_clusters).astype(reference_samples['gene_cluster_ID'].dtype).tolist()
+        reference_rows = sample_negative_rows_reference(reference_samples, block_clusters, num_neg, seed)
+        if not np.array_equal(negative_rows[:num_neg], reference_rows):
+            raise AssertionError(f"Indexed sampler differs from the reference sampler for miRNA family: {block.first('noncodingRNA_fam')}, first miRNA sequence: {block.first('noncodingRNA')}")
+
+    # Construct the rows for the negative examples from the gene rows, with the miRNA sequence, name and family columns from block, and label 0
+    mirna_columns = ('noncodingRNA', 'noncodingRNA_name', 'noncodingRNA_fam')
+    negative_sample_rows = []
+    for neg_no, negative_row in enumerate(negative_rows):
+        block_row = block.rows[neg_no % num_neg]
+        gene_row = cluster_index.row_fields(negative_row)
+        negative_sample_rows.append('\t'.join(
+            block_row[idx] if column in mirna_columns else '0' if column == 'label' else gene_row[idx]
+            for column, idx in block.column_index.items()
+        ) + '\n')
+
+    # Positive examples for this block are appended to the output file verbatim, followed by its negative examples
+    positive_text = block.text()
+    texts = [positive_text + ''.join(negative_sample_rows[:neg_ratio * num_neg]) for neg_ratio in neg_ratios]
+    shortfalls = [max(neg_ratio * num_neg - len(negative_rows), 0) for neg_ratio in neg_ratios]
+    return texts, shortfalls
+
+# Split the miRNA family blocks into the blocks to process, each with the message printed once it is written
+def yield_tasks(mirnafam_blocks):
+    for block in mirnafam_blocks:
+
+        # Check if the miRNA family is unknown
+        if block.first('noncodingRNA_fam') == 'unknown':
+
+            # Process each block of unique miRNA sequences (or names, equivalent)
+            for sub_block in block.split_by('noncodingRNA'):
+                yield sub_block, f"Processed miRNA sequence block: {sub_block.first('noncodingRNA')}"
+
+        else:
+            # Process the block normally if not 'unknown'
+            yield block, f"Processed miRNA family block: {block.first('noncodingRNA_fam')}"
+
+# Group tasks into batches, so that worker processes get many blocks at a time while only one batch is held in memory
+def yield_batches(tasks, batch_size):
+    batch = []
+    for task in tasks:
+        batch.append(task)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# State of a worker process: the cluster index (memory-mapped) and the sampling options, set once by init_worker
+worker_state = {}
+
+def init_worker(ifile, index_dir, neg_ratios, exclude_positive_clusters, check_equivalence, allow_shortfall):
+    worker_state['cluster_index'] = ClusterIndex.load(ifile, index_dir)
+    worker_state['neg_ratios'] = neg_ratios
+    worker_state['exclude_positive_clusters'] = exclude_positive_clusters
+    worker_state['reference_samples'] = pd.read_csv(ifile, sep='\t') if check_equivalence else None
+    worker_state['allow_shortfall'] = allow_shortfall
+
+def process_block_in_worker(block):
+    return process_block(block, worker_state['cluster_index'], worker_state['neg_ratios'], worker_state['exclude_positive_clusters'], worker_state['reference_samples'], worker_state['allow_shortfall'])
 
 def main():
     # Record start time
     start = time.time()
 
     parser = argparse.ArgumentParser(description="Generate negative examples.")
-    parser.add_argument('--ifile', type=str, required=True, help="Input file name, MUST BE SORTED by 'miRNA family!'")
-    parser.add_argument('--ofile', type=str, required=True, help="Output file name")
+    parser.add_argument('--ifile', type=str, required=True, help="Input file name, MUST BE SORTED by 'miRNA family!' unless --unsorted is given")
+    parser.add_argument('--unsorted', action='store_true', help="Input file is not sorted; visit miRNA families in sorted order via an index of row byte offsets")
+    parser.add_argument('--ofile', type=str, required=True, help="Output file name, must contain '{ratio}' if several neg_ratios are given")
+    parser.add_argument('--neg_ratios', type=str, default=None, help="Comma-separated numbers of negatives per positive, drawn as nested prefixes of one permutation (default: 1:1 only)")
+    parser.add_argument('--exclude_positive_clusters', action='store_true', help="Exclude the gene clusters of a block's positives from its negative pool (differs from the original sampler)")
+    parser.add_argument('--check_equivalence', action='store_true', help="Check that the indexed sampler draws the same negatives as the original pandas sampler, for every block")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes generating negatives for miRNA family blocks (default: 1)")
+    parser.add_argument('--write_buffer_size', type=int, default=1024 * 1024, help="Buffer size in bytes of the output file writer (default: 1 MiB)")
+    parser.add_argument('--resume', action='store_true', help="Resume from the checkpoint of an interrupted run, if any")
+    parser.add_argument('--checkpoint_every', type=int, default=1000, help="Number of blocks between checkpoints (default: 1000)")
     args = parser.parse_args()
-    
-    # Read the entire positive examples file
-    positive_samples = pd.read_csv(args.ifile, sep='\t')
-    
-    # Write header to the output file
-    positive_samples.head(0).to_csv(args.ofile, sep='\t', index=False, mode='w')    
-
-    # Get the set of all cluster ids
-    all_clusters = positive_samples['gene_cluster_ID'].unique().tolist()
 
-    with open(args.ofile, 'a') as ofile:
-        
-        for block in yield_mirnafam_blocks(args.ifile):
-
-            # Check if the miRNA family is unknown
-            if block['noncodingRNA_fam'].iloc[0] == 'unknown':
-            
-                # Get unique miRNA sequences (or names, equivalent)
-                unique_mirnas = block['noncodingRNA'].unique().tolist()
-
-                # Process each block of unique miRNA sequences
-                for mirna in unique_mirnas:
-                    
-                    # Get the block of rows for this miRNA sequence
-                    sub_block = block[block['noncodingRNA'] == mirna]
-
-                    # Run rest of code for each sub_block
-                    process_block(sub_block, positive_samples, all_clusters, args.ofile)
-                
-                    print(f"Processed miRNA sequence block: {sub_block['noncodingRNA'].iloc[0]}", flush=True)
-
-            else:
-                # Process the block normally if not 'unknown'
-                process_block(block, positive_samples, all_clusters, args.ofile)
-
-                print(f"Processed miRNA family block: {block['noncodingRNA_fam'].iloc[0]}", flush=True)
+    # Without --neg_ratios, generate negatives at 1:1 only, and raise an error for blocks with too small a pool, as the original sampler
+    neg_ratios = [int(neg_ratio) for neg_ratio in args.neg_ratios.split(',')] if args.neg_ratios else [1]
+    allow_shortfall = args.neg_ratios is not None
+    if len(neg_ratios) > 1 and '{ratio}' not in args.ofile:
+        parser.error("--ofile must contain '{ratio}' when several neg_ratios are given")
+    ofiles = [args.ofile.replace('{ratio}', str(neg_ratio)) for neg_ratio in neg_ratios]
+
+    # A checkpoint is only resumed for the same input file and options
+    checkpoint_file = get_checkpoint_file_name(args.ofile.replace('{ratio}', '-'.join(map(str, neg_ratios))))
+    run = {'ifile': get_file_fingerprint(args.ifile), 'unsorted': args.unsorted, 'neg_ratios': neg_ratios, 'exclude_positive_clusters': args.exclude_positive_clusters}
+    checkpoint = read_checkpoint(checkpoint_file, run) if args.resume else None
     
+    with ExitStack() as stack:
+        # Blocks and negative rows are read from the rows of a TSV file, so a columnar input is exported to a temporary TSV file next to the output first
+        ifile = stack.enter_context(tsv_file(args.ifile, os.path.dirname(os.path.abspath(ofiles[0]))))
+
+        # Index the gene clusters of the positive examples file
+        cluster_index = ClusterIndex(ifile)
+
+        # Get blocks of positive examples with the same mirnafam to process at a time, either from the sorted input or via an index of the unsorted input
+        header_columns, column_index, mirnafam_blocks = read_blocks(ifile, 'noncodingRNA_fam', indexed=args.unsorted)
+
+        # Get the blocks to process, with a message to print once each is written, and skip those completed before the checkpoint, if resuming
+        tasks = yield_tasks(mirnafam_blocks)
+        if checkpoint is not None:
+            truncate_outputs(checkpoint)
+            tasks = skip_completed(tasks, checkpoint['n_blocks'], checkpoint['last_block_key'], get_key=lambda task: task[0].key)
+            print(f"Resuming from checkpoint {checkpoint_file} after {checkpoint['n_blocks']} blocks (last block: {checkpoint['last_block_key']}).", flush=True)
+
+        # Number of blocks that could not fill each neg_ratio, and of negatives missing for it
+        shortfalls = checkpoint['shortfalls'] if checkpoint is not None else [[0, 0] for _ in neg_ratios]
+
+        writers = [stack.enter_context(open(ofile, 'a' if checkpoint is not None else 'w', buffering=args.write_buffer_size)) for ofile in ofiles]
+
+        # Write header to the output files
+        if checkpoint is None:
+            for writer in writers:
+                writer.write('\t'.join(header_columns) + '\n')
+
+        # Save the number and key of the completed blocks, the offsets of the output files, and the shortfalls
+        n_blocks = checkpoint['n_blocks'] if checkpoint is not None else 0
+        last_block_key = checkpoint['last_block_key'] if checkpoint is not None else None
+        def save_checkpoint():
+            offsets = {ofile: get_synced_offset(writer) for ofile, writer in zip(ofiles, writers)}
+            write_checkpoint(checkpoint_file, {'run': run, 'n_blocks': n_blocks, 'last_block_key': last_block_key, 'offsets': offsets, 'shortfalls': shortfalls})
+
+        save_checkpoint()
+        checkpointed_blocks = n_blocks
+
+        # Append the positive and negative examples of a block to the output file of each neg_ratio, and report any shortfall
+        def write_block(message, texts, block_shortfalls):
+            for writer, text in zip(writers, texts):
+                writer.write(text)
+            print(message, flush=True)
+            for neg_ratio, shortfall, block_shortfall in zip(neg_ratios, shortfalls, block_shortfalls):
+                if block_shortfall > 0:
+                    shortfall[0] += 1
+                    shortfall[1] += block_shortfall
+                    print(f"Warning: Not enough negative examples for ratio {neg_ratio}, missing {block_shortfall} negative examples.", flush=True)
+
+        if args.workers > 1:
+            # Share the cluster index with the worker processes as memory-mapped files, and write the results of each batch in the original block order
+            with tempfile.TemporaryDirectory() as index_dir:
+                cluster_index.save(index_dir)
+                with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(ifile, index_dir, neg_ratios, args.exclude_positive_clusters, args.check_equivalence, allow_shortfall)) as pool:
+                    for batch in yield_batches(tasks, args.workers * 64):
+                        for (block, message), (texts, block_shortfalls) in zip(batch, pool.map(process_block_in_worker, [block for block, _ in batch], chunksize=16)):
+                            write_block(message, texts, block_shortfalls)
+                            n_blocks += 1
+                            last_block_key = block.key
+
+                        # Checkpoint between batches only, once enough blocks were completed since the last checkpoint
+                        if n_blocks - checkpointed_blocks >= args.checkpoint_every:
+                            save_checkpoint()
+                            checkpointed_blocks = n_blocks
+        else:
+            # Read the entire positive examples file for the reference sampler, if checking equivalence
+            reference_samples = pd.read_csv(ifile, sep='\t') if args.check_equivalence else None
+
+            for block, message in tasks:
+                write_block(message, *process_block(block, cluster_index, neg_ratios, args.exclude_positive_clusters, reference_samples, allow_shortfall))
+                n_blocks += 1
+                last_block_key = block.key
+                if n_blocks % args.checkpoint_every == 0:
+                    save_checkpoint()
+
+        cluster_index.close()
+
+    # The run is complete, so its checkpoint is no longer needed
+    remove_checkpoint(checkpoint_file)
+
+    for neg_ratio, ofile, (shortfall_blocks, shortfall_negatives) in zip(neg_ratios, ofiles, shortfalls):
+        if shortfall_blocks > 0:
+            print(f"Warning: Could not generate {neg_ratio} negative examples per positive example for {shortfall_blocks} blocks of {ofile}, missing {shortfall_negatives} negative examples.", flush=True)
+
+    if args.check_equivalence:
+        print("Indexed sampler draws the same negative examples as the reference sampler for all blocks.", flush=True)
+
     # Record end time
     end = time.time() 
 
@@ -0,0 +1,80 @@
+"""
+Checks that the cluster index sampler of make_neg_sets.py (cluster_index.py) draws the same negative rows as the original pandas sampler
+(DataFrame.sample(frac=1) then drop_duplicates per gene cluster, then DataFrame.sample(n)), for fixed seeds on a small synthetic dataset.
+
+Usage:
+    python -m pytest tests/test_cluster_index.py
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code', 'make_neg_sets')
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared')
+sys.path[:0] = [CODE_DIR, SHARED_DIR]
+
+from cluster_index import ClusterIndex
+from make_neg_sets import sample_negative_rows_reference
+
+SEEDS = [0, 1, 42, 2**31 - 1, 4294967294]
+
+# Draw the negative rows of a block as the original make_neg_sets.py did, from the positive examples DataFrame (row positions, or None if the
+# negative pool is too small)
+def original_sampler(positive_samples, block_clusters, num_neg, seed):
+    all_clusters = positive_samples['gene_cluster_ID'].unique().tolist()
+    mirfam_allowed_clusters = [cluster for cluster in all_clusters if cluster not in block_clusters]
+    negative_pool = positive_samples[positive_samples['gene_cluster_ID'].isin(mirfam_allowed_clusters)]
+    negative_pool = negative_pool.sample(frac=1, random_state=seed).drop_duplicates(subset=['gene_cluster_ID'], keep='first')
+    if num_neg > len(negative_pool):
+        return None
+    return negative_pool.sample(n=num_neg, random_state=seed).index.to_numpy()
+
+# Write a small positive examples file, with several rows per gene cluster, and get it as read by the original sampler
+@pytest.fixture
+def positives(tmp_path):
+    rng = np.random.RandomState(7)
+    n_rows = 60
+    positive_samples = pd.DataFrame({
+        'gene': [''.join(rng.choice(list('ACGT'), 20)) for _ in range(n_rows)],
+        'noncodingRNA': [''.join(rng.choice(list('ACGU'), 22)) for _ in range(n_rows)],
+        'noncodingRNA_fam': rng.choice(['mir-1', 'mir-2', 'mir-3'], n_rows),
+        'label': 1,
+        'gene_cluster_ID': rng.randint(0, 15, n_rows),
+    })
+    path = str(tmp_path / 'positives.tsv')
+    positive_samples.to_csv(path, sep='\t', index=False)
+    cluster_index = ClusterIndex(path)
+    yield cluster_index, pd.read_csv(path, sep='\t')
+    cluster_index.close()
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('excluded_clusters', [[], [3], [0, 5, 9, 14]])
+@pytest.mark.parametrize('num_neg', [1, 4, 10])
+def test_same_rows_as_pandas_sampler(positives, seed, excluded_clusters, num_neg):
+    cluster_index, positive_samples = positives
+
+    # The cluster index reads the cluster ids as text, the original sampler as integers
+    indexed_rows = cluster_index.sample_negative_rows([str(cluster) for cluster in excluded_clusters], num_neg, seed)
+    original_rows = original_sampler(positive_samples, excluded_clusters, num_neg, seed)
+
+    assert original_rows is not None
+    np.testing.assert_array_equal(indexed_rows, original_rows)
+    # The reference sampler of --check_equivalence is the original one
+    np.testing.assert_array_equal(sample_negative_rows_reference(positive_samples, excluded_clusters, num_neg, seed), original_rows)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_not_enough_negatives(positives, seed):
+    cluster_index, positive_samples = positives
+    num_neg = positive_samples['gene_cluster_ID'].nunique() + 1
+    assert cluster_index.sample_negative_rows([], num_neg, seed) is None
+    assert original_sampler(positive_samples, [], num_neg, seed) is None
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_permutation_prefixes(positives, seed):
+    cluster_index, _ = positives
+    permuted_rows = cluster_index.permute_negative_rows([], 12, seed)
+    for num_neg in (1, 4, 12):
+        np.testing.assert_array_equal(permuted_rows[:num_neg], cluster_index.sample_negative_rows([], num_neg, seed))
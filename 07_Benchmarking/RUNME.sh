@@ -8,6 +8,9 @@
 set -euo pipefail
 trap 'echo "Error at line $LINENO: $BASH_COMMAND"; exit 1' ERR
 
+# The Python module shared by the analyses (compressed_io.py) is imported from shared/ at the top of the repository
+export PYTHONPATH="$(pwd)/../shared${PYTHONPATH:+:$PYTHONPATH}"
+
 mkdir -p results
 
 exec > >(tee -a results/RUNME.log) 2>&1
@@ -13,9 +13,9 @@ Arguments:
 from miRBench.encoder import get_encoder
 from miRBench.predictor import get_predictor, list_predictors
 from miRBench.dataset import get_dataset_df, list_datasets
-import pandas as pd
 import argparse
 import os
+from compressed_io import write_tsv
 
 def benchmark_all(df, dset, split):
     for tool in list_predictors():
@@ -45,7 +45,7 @@ def main():
             df = get_dataset_df(dset, split=split)
             output_file = os.path.join(args.out_dir, f"{dset}_{split}_predictions.tsv")
             df_preds = benchmark_all(df, dset, split)
-            df_preds.to_csv(output_file, sep='\t', index=False)
+            write_tsv(df_preds, output_file, index=False)
             print(f"Predictions for {dset} dataset, {split} split, written to {output_file}")
 
     print(f"Predictions for all datasets and splits written to {args.out_dir}")
@@ -12,7 +12,6 @@ Arguments:
     --ofile        Output file for metrics (TSV)
 """
 
-import pandas as pd
 import numpy as np
 from sklearn.metrics import precision_recall_curve
 from sklearn.metrics import roc_auc_score
@@ -20,10 +19,11 @@ from sklearn.metrics import auc
 from sklearn.metrics import average_precision_score
 import argparse
 import sys
+from compressed_io import read_tsv
 
 def load_data(input_file):
     # load the data from the input file
-    return pd.read_csv(input_file, sep='\t')
+    return read_tsv(input_file)
 
 def get_metric(data, predictors, metric):
         
@@ -13,17 +13,17 @@ Arguments:
     --dpi          Figure DPI (default: 300)
 """
 
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.metrics import precision_recall_curve
 from sklearn.metrics import precision_recall_fscore_support
 import argparse
 import sys
+from compressed_io import read_tsv
 
 def load_data(input_file):
     # load the data from the input file
-    return pd.read_csv(input_file, sep='\t')
+    return read_tsv(input_file)
 
 def plot_pr_curve(data, predictors, title, dpi):
 
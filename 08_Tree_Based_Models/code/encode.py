@@ -13,6 +13,7 @@ from Bio.Seq import Seq
 import pandas as pd
 import os
 import argparse
+from compressed_io import read_tsv_chunks, write_tsv
 
 MIRNA_LENGTH = 20
 K_MIN = 2
@@ -50,7 +51,7 @@ def process_dataset(dataset, chunk_size=10000):
     followed by the k-mer count features.
     """
     rows = []
-    for chunk in pd.read_csv(dataset, sep='\t', chunksize=chunk_size):
+    for chunk in read_tsv_chunks(dataset, chunk_size):
         for _, row in chunk.iterrows():
             # Prepare the feature dictionary with the original columns.
             features = {
@@ -75,7 +76,7 @@ def main():
     args = parser.parse_args()
         
     df = process_dataset(args.input_dataset)
-    df.to_csv(args.output_encoded_dataset, sep='\t', index=False)
+    write_tsv(df, args.output_encoded_dataset, index=False)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -13,6 +13,7 @@ import pandas as pd
 import numpy as np
 from sklearn.metrics import average_precision_score
 import argparse
+from compressed_io import read_tsv, write_tsv
 
 def main():
     parser = argparse.ArgumentParser()
@@ -21,7 +22,7 @@ def main():
     args = parser.parse_args()
 
     # Load the input file containing predictions and labels
-    df = pd.read_csv(args.input_pred_labels_file, sep="\t")
+    df = read_tsv(args.input_pred_labels_file)
 
     # Extract the labels
     y_test = df["label"]
@@ -42,7 +43,7 @@ def main():
     evaluation_df = pd.DataFrame([evaluation_dict])
 
     # Save the metrics to a TSV file
-    evaluation_df.to_csv(args.output_eval_metrics, sep="\t", index=False)
+    write_tsv(evaluation_df, args.output_eval_metrics, index=False)
 
 if __name__ == "__main__":
     main()
@@ -12,9 +12,9 @@ Arguments:
 
 import argparse
 import os
-import pandas as pd
 import numpy as np
 import joblib
+from compressed_io import read_tsv, write_tsv
 
 def parse_args():
     parser = argparse.ArgumentParser()
@@ -27,7 +27,7 @@ def main():
     args = parse_args()
     
     # Load the encoded test dataset
-    df = pd.read_csv(args.encoded_test_dataset, sep='\t')
+    df = read_tsv(args.encoded_test_dataset)
     
     # Extract feature columns (excluding 'noncodingRNA', 'gene', and 'label')
     feature_columns = [col for col in df.columns if col not in ['noncodingRNA', 'gene', 'label']]
@@ -44,7 +44,7 @@ def main():
         df[model_basename] = y_pred_proba
 
     # Save the encoded test dataset with added prediction columns to a TSV file
-    df.to_csv(args.output_predictions, sep='\t', index=False)
+    write_tsv(df, args.output_predictions, index=False)
     print(f"Predictions for {args.encoded_test_dataset} saved to {args.output_predictions}")
 
 if __name__ == '__main__':
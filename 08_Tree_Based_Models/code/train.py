@@ -24,6 +24,7 @@ import xgboost as xgb
 from skopt import BayesSearchCV
 from skopt.space import Real, Integer, Categorical
 import joblib
+from compressed_io import read_tsv, write_tsv
 
 # Constants for Bayesian optimization
 N_ITER = 30
@@ -117,7 +118,7 @@ def main():
         os.makedirs(args.output_dir)
     
     print("Loading train feature matrix from", args.encoded_train_dataset)
-    df = pd.read_csv(args.encoded_train_dataset, sep='\t')
+    df = read_tsv(args.encoded_train_dataset)
     
     feature_columns = [col for col in df.columns if col not in ['noncodingRNA', 'gene', 'label']]
     X = df[feature_columns]
@@ -134,7 +135,7 @@ def main():
         # Save the CV results to a TSV file
         cv_results_df = pd.DataFrame(cv_results)
         cv_results_filename = os.path.join(args.output_dir, f"{model}_{args.cv_results_suffix}.tsv")
-        cv_results_df.to_csv(cv_results_filename, sep='\t', index=False)
+        write_tsv(cv_results_df, cv_results_filename, index=False)
         print("Bayesian search with CV results saved to", cv_results_filename)
 
         # Run training on full datasets with the best parameters found
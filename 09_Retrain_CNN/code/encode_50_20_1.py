@@ -15,10 +15,10 @@ Arguments:
     --label_column       Name of the column with labels (default: label)
 """
 
-import pandas as pd
 import numpy as np
 import argparse
 import time
+from compressed_io import read_tsv_chunks
 
 
 def watsoncrick_encoding(df, alphabet={"AT": 1., "TA": 1., "GC": 1., "CG": 1., "AU": 1., "UA": 1.}, tensor_dim=(50, 20, 1),
@@ -91,7 +91,7 @@ def encode_large_tsv_to_numpy(tsv_file_path, data_output_path, labels_output_pat
     tensor_dim = (50, 20, 1)
 
     # Get total number of rows in the dataset
-    num_rows = sum(len(df) for df in pd.read_csv(tsv_file_path, sep='\t', usecols=[0], chunksize=chunk_size))
+    num_rows = sum(len(df) for df in read_tsv_chunks(tsv_file_path, chunk_size, usecols=[0]))
 
     np.save(num_rows_output_path, np.array([num_rows]))
 
@@ -107,7 +107,7 @@ def encode_large_tsv_to_numpy(tsv_file_path, data_output_path, labels_output_pat
         row_offset = 0
 
         # Process each chunk
-        for chunk in pd.read_csv(tsv_file_path, sep='\t', chunksize=chunk_size):
+        for chunk in read_tsv_chunks(tsv_file_path, chunk_size):
             encoded_data = watsoncrick_encoding(chunk, ncRNA_col=ncRNA_col, gene_col=gene_col)
             encoded_labels = labels_encoding(chunk, label_col=label_col)
 
@@ -16,11 +16,11 @@ Arguments:
     --dotbracket_column       Name of the dot-bracket structure column (70 characters long, with the first 20 corresponding to miRNA and the next 50 to the gene) (default: RNACofold_structure)
 """
 
-import pandas as pd
 import numpy as np
 import argparse
 import time
 from encode_50_20_1 import watsoncrick_encoding, labels_encoding
+from compressed_io import read_tsv_chunks
 
 def dotbracket_encoding(df, 
                         dotbracket_col="RNACofold_structure",
@@ -148,7 +148,7 @@ def encode_large_tsv_to_numpy(tsv_file_path,
     tensor_dim = (50, 20, 1)
 
     # Count total number of rows in the dataset and save it
-    num_rows = sum(len(chunk) for chunk in pd.read_csv(tsv_file_path, sep='\t', usecols=[0], chunksize=chunk_size))
+    num_rows = sum(len(chunk) for chunk in read_tsv_chunks(tsv_file_path, chunk_size, usecols=[0]))
 
     np.save(num_rows_path, np.array([num_rows]))
 
@@ -164,7 +164,7 @@ def encode_large_tsv_to_numpy(tsv_file_path,
         row_offset = 0
 
         # Process the TSV file in chunks
-        for chunk in pd.read_csv(tsv_file_path, sep='\t', chunksize=chunk_size):
+        for chunk in read_tsv_chunks(tsv_file_path, chunk_size):
             # Prepare input tensor (concatenation of Watson-Crick and dot-bracket channels)
             data_chunk = prepare_model_input(chunk, 
                                              tensor_dim=tensor_dim, 
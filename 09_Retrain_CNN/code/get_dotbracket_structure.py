@@ -9,9 +9,9 @@ Arguments:
     --output_path    Output path for annotated TSV file
 """
 
-import pandas as pd
 import argparse
 import RNA
+from compressed_io import read_tsv_chunks, write_tsv
 
 def get_dotbracket_structure(df):
     """
@@ -33,21 +33,20 @@ def process_in_chunks(dataset_path, output_path, chunk_size=10000):
     
     first_chunk = True
 
-    with pd.read_csv(dataset_path, sep='\t', chunksize=chunk_size) as reader:
-        for i, chunk in enumerate(reader):
+    for i, chunk in enumerate(read_tsv_chunks(dataset_path, chunk_size)):
 
-            chunk = chunk.loc[:, ['noncodingRNA', 'gene', 'label']].copy()
+        chunk = chunk.loc[:, ['noncodingRNA', 'gene', 'label']].copy()
 
-            cofold_structure = get_dotbracket_structure(chunk)
+        cofold_structure = get_dotbracket_structure(chunk)
 
-            chunk["RNACofold_structure"] = cofold_structure
-            
-            mode = 'w' if first_chunk else 'a'
-            header = first_chunk
-            
-            chunk.to_csv(output_path, sep='\t', index=False, mode=mode, header=header)
-            
-            first_chunk = False
+        chunk["RNACofold_structure"] = cofold_structure
+        
+        mode = 'w' if first_chunk else 'a'
+        header = first_chunk
+        
+        write_tsv(chunk, output_path, mode=mode, index=False, header=header)
+        
+        first_chunk = False
 
 def main():
     parser = argparse.ArgumentParser()
@@ -30,6 +30,7 @@ from tensorflow.keras.layers import (
 from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.utils import Sequence
 import os
+from compressed_io import write_tsv
 
 def make_architecture(channels):
     """
@@ -120,7 +121,7 @@ def plot_history(history, prefix):
         'val_loss': val_loss
     }
     df = pd.DataFrame(metrics)
-    df.to_csv(f"{prefix}_training_history.tsv", index=False, sep='\t')
+    write_tsv(df, f"{prefix}_training_history.tsv", index=False)
     
     # Plot Accuracy
     plt.figure(figsize=(8, 6), dpi=300)
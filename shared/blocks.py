@@ -0,0 +1,124 @@
+"""
+Lightweight blocks of consecutive TSV rows that share the same value in a key column, used by make_neg_sets.py instead of building a
+pandas DataFrame per block. A block keeps the raw lines, so that positive examples can be echoed to the output verbatim, together with
+the split fields and a column index map for reading single values.
+
+Blocks are either streamed from a file sorted by the key column, or, for unsorted files, read via an index of the byte offsets of the
+rows of each key, built in one scan. Indexed blocks are visited in sorted key order, with their rows sorted bytewise, i.e. in the same
+order as after an external `LC_ALL=C sort`, without writing a sorted copy of the file.
+
+Shared by make_neg_sets.py of both post-processing analyses (04 and 06) and pipeline.py of the biased one, which import it from
+shared/ at the top of the repository, added to the PYTHONPATH by their bash scripts.
+"""
+
+from array import array
+from collections import defaultdict
+
+class Block:
+
+    def __init__(self, key, lines, column_index, rows=None):
+        self.key = key
+        self.lines = lines
+        self.column_index = column_index
+        self.rows = rows if rows is not None else [line.strip().split('\t') for line in lines]
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Get the value of a column in the first row of the block
+    def first(self, column):
+        return self.rows[0][self.column_index[column]]
+
+    # Get all values of a column, in row order
+    def values(self, column):
+        idx = self.column_index[column]
+        return [row[idx] for row in self.rows]
+
+    # Get the unique values of a column, in order of first appearance
+    def unique(self, column):
+        return list(dict.fromkeys(self.values(column)))
+
+    # Split the block into sub-blocks with the same value of a column, in order of first appearance
+    def split_by(self, column):
+        idx = self.column_index[column]
+        sub_blocks = {}
+        for line, row in zip(self.lines, self.rows):
+            sub_blocks.setdefault(row[idx], []).append(line)
+        return [Block(value, lines, self.column_index) for value, lines in sub_blocks.items()]
+
+    # Get the raw text of the block, one line per row
+    def text(self):
+        return ''.join(line if line.endswith('\n') else line + '\n' for line in self.lines)
+
+# Read the header line of a TSV file and get its column names and a column index map
+def read_header(file):
+    header_columns = file.readline().strip().split('\t')
+    return header_columns, {column: idx for idx, column in enumerate(header_columns)}
+
+# Yield blocks of consecutive rows with the same value in key_column, for a file sorted (or at least grouped) by that column
+def yield_blocks(file, column_index, key_column):
+    key_index = column_index[key_column]
+    current_lines = []
+    current_rows = []
+    current_key = None
+
+    for line in file:
+        columns = line.strip().split('\t')
+        key = columns[key_index]
+
+        if key != current_key:
+            if current_lines:
+                yield Block(current_key, current_lines, column_index, current_rows)
+            current_lines = [line]
+            current_rows = [columns]
+            current_key = key
+        else:
+            current_lines.append(line)
+            current_rows.append(columns)
+
+    if current_lines:
+        yield Block(current_key, current_lines, column_index, current_rows)
+
+# Yield blocks of consecutive rows with the same value in key_column from a file path, skipping the header
+def yield_file_blocks(path, column_index, key_column):
+    with open(path, 'r') as file:
+        file.readline()
+        yield from yield_blocks(file, column_index, key_column)
+
+# Index the byte offsets of the rows of a TSV file by their value in key_column, in one scan
+def index_blocks(path, key_column):
+    block_offsets = defaultdict(lambda: array('q'))
+
+    with open(path, 'rb') as file:
+        header_line = file.readline()
+        header_columns = header_line.decode().strip().split('\t')
+        key_index = header_columns.index(key_column)
+
+        offset = len(header_line)
+        for line in file:
+            block_offsets[line.strip().split(b'\t')[key_index]].append(offset)
+            offset += len(line)
+
+    return header_columns, {column: idx for idx, column in enumerate(header_columns)}, block_offsets
+
+# Yield blocks of rows with the same key in sorted key order, by seeking to the indexed byte offsets of their rows
+def yield_indexed_blocks(path, column_index, block_offsets):
+    with open(path, 'rb') as file:
+        for key in sorted(block_offsets):
+            lines = []
+            for offset in block_offsets[key]:
+                file.seek(offset)
+                lines.append(file.readline())
+            # Sort the rows bytewise for a deterministic order that does not depend on the input row order
+            lines.sort()
+            yield Block(key.decode(), [line.decode() for line in lines], column_index)
+
+# Get the header columns, column index map and a generator of the blocks by key_column of a TSV file, which is either sorted by key_column or indexed
+def read_blocks(path, key_column, indexed=False):
+    if indexed:
+        header_columns, column_index, block_offsets = index_blocks(path, key_column)
+        return header_columns, column_index, yield_indexed_blocks(path, column_index, block_offsets)
+
+    with open(path, 'r') as file:
+        header_columns, column_index = read_header(file)
+    return header_columns, column_index, yield_file_blocks(path, column_index, key_column)
@@ -0,0 +1,91 @@
+"""
+Checkpoints for resuming make_neg_sets.py after a crash or kill, instead of starting over.
+
+A checkpoint is a small JSON file, rewritten atomically every few blocks, that records the number of completed blocks and the key of the
+last one, the byte offset of every output file after that block, and any generator state needed to continue (e.g. the random generator
+state and the 'unsuccessful' carry-over). The output files are flushed and synced before the checkpoint is written, so a checkpoint never
+points past the data on disk. On resume, the output files are truncated to their checkpointed offsets and the completed blocks are skipped,
+which gives the same output as an uninterrupted run.
+
+A checkpoint also records a fingerprint of the input file and the options of the run, and is only used if they match.
+
+Shared by make_neg_sets.py of both post-processing analyses (04 and 06), which import it from shared/ at the top of the repository, added
+to the PYTHONPATH by their bash scripts.
+"""
+
+import hashlib
+import json
+import os
+
+# Get the default checkpoint file name of an output file
+def get_checkpoint_file_name(ofile):
+    return f"{ofile}.ckpt"
+
+# Get a fingerprint of a file, from its size and a hash of its first and last MiB, cheap to compute even for large files
+def get_file_fingerprint(path, sample_size=1024 * 1024):
+    size = os.path.getsize(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(size - sample_size, sample_size))
+            digest.update(f.read())
+    return {'size': size, 'sha256': digest.hexdigest()}
+
+# Encode the state of a random.Random generator as JSON-serialisable lists, and decode it back
+def encode_rng_state(rng):
+    version, internal_state, gauss_next = rng.getstate()
+    return [version, list(internal_state), gauss_next]
+
+def restore_rng_state(rng, state):
+    version, internal_state, gauss_next = state
+    rng.setstate((version, tuple(internal_state), gauss_next))
+
+# Get the current byte offset of an output file, after flushing and syncing it to disk
+def get_synced_offset(writer):
+    writer.flush()
+    os.fsync(writer.fileno())
+    return writer.tell()
+
+# Write a checkpoint atomically, so that an interrupted write never leaves a partial checkpoint
+def write_checkpoint(path, checkpoint):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Read a checkpoint, or get None if there is none, it does not belong to the same run, or an output file is shorter than its checkpointed offset
+def read_checkpoint(path, run):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint['run'] != run:
+        print(f"Checkpoint {path} was written for a different input file or options. Starting over.", flush=True)
+        return None
+    for output_file, offset in checkpoint['offsets'].items():
+        if not os.path.exists(output_file) or os.path.getsize(output_file) < offset:
+            print(f"Output file {output_file} is shorter than in checkpoint {path}. Starting over.", flush=True)
+            return None
+    return checkpoint
+
+# Truncate the output files to their checkpointed offsets, discarding anything written after the checkpoint
+def truncate_outputs(checkpoint):
+    for output_file, offset in checkpoint['offsets'].items():
+        os.truncate(output_file, offset)
+
+# Skip the items (blocks) completed before a checkpoint, checking that the last skipped one is the checkpointed last block
+def skip_completed(items, n_completed, last_key, get_key=lambda block: block.key):
+    for item_no, item in enumerate(items):
+        if item_no < n_completed:
+            if item_no == n_completed - 1 and get_key(item) != last_key:
+                raise ValueError(f"Block {item_no} of the input has key {get_key(item)}, but the checkpoint was written after block {last_key}.")
+            continue
+        yield item
+
+# Remove a checkpoint once the run has completed
+def remove_checkpoint(path):
+    if os.path.exists(path):
+        os.remove(path)
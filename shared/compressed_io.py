@@ -0,0 +1,219 @@
+"""
+Transparent compressed file I/O, chosen by the file extension: gzip for .gz, Zstandard for .zst, and plain files for any other extension.
+
+Gzip files are written in independent blocks, compressed in parallel by a pool of threads, and concatenated as gzip members in order, which
+any gzip reader (gunzip, zcat, Python, pandas) reads as a single stream. Gzip files are read with the decompression done in a background thread,
+ahead of the reader, so that it overlaps with parsing. Zstandard files use the multi-threaded compression of the zstandard package, which is
+only needed, and only imported, for .zst files.
+
+Shared by the scripts of several analyses, which import it from shared/ at the top of the repository, added to the PYTHONPATH by the master
+and bash scripts of each analysis.
+
+Usage (from Python):
+    with open_file('dataset.tsv.gz', 'w') as f:      # text or binary modes ('r', 'w', 'a', 'rb', 'wb', 'ab'), as for open()
+        f.write(...)
+    data = read_tsv('dataset.tsv.zst')                # pandas DataFrame; read_tsv_chunks and write_tsv for chunked reads and writes
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import queue
+import threading
+import zlib
+import pandas as pd
+
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+# Size of the uncompressed blocks compressed in parallel, and of the compressed chunks read ahead
+BLOCK_SIZE = 4 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+# Get the compression of a file from its extension: 'gzip', 'zstd' or None
+def file_compression(path):
+    return COMPRESSIONS.get(os.path.splitext(str(path))[1].lower())
+
+# Get a file name without its compression extension, if any (e.g. data.tsv for data.tsv.gz)
+def strip_compression(path):
+    return os.path.splitext(path)[0] if file_compression(path) else path
+
+# Get the default number of compression threads: the CPUs available to this process
+def default_threads():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Import zstandard, which is only required for .zst files
+def import_zstandard(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f"zstandard is required to read or write the compressed file {path}; install it, or use .gz files") from None
+    return zstandard
+
+# Binary writer of a gzip file, compressing blocks of BLOCK_SIZE bytes as separate gzip members in a pool of threads (zlib releases the GIL),
+# with at most two blocks per thread in flight, and writing the members in order
+class ParallelGzipWriter(io.RawIOBase):
+
+    def __init__(self, raw, threads=None, level=6, block_size=BLOCK_SIZE):
+        self.raw = raw
+        self.level = level
+        self.block_size = block_size
+        self.threads = threads or default_threads()
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    # Compress a block as a gzip member (with no timestamp, so that the output only depends on the input)
+    def compress(self, block):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(block) + compressor.flush()
+
+    # Write the compressed members that are done, in order, waiting for the oldest ones while too many blocks are in flight
+    def drain(self, max_pending):
+        while self.pending and (len(self.pending) > max_pending or self.pending[0].done()):
+            self.raw.write(self.pending.popleft().result())
+
+    def submit(self, block):
+        self.pending.append(self.executor.submit(self.compress, block))
+        self.drain(2 * self.threads)
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.buffer:
+                self.submit(bytes(self.buffer))
+                self.buffer.clear()
+            self.drain(0)
+        finally:
+            self.executor.shutdown()
+            self.raw.close()
+            super().close()
+
+# Binary reader of a gzip file (of one or more members), decompressed by a background thread into a bounded queue of chunks
+class ThreadedGzipReader(io.RawIOBase):
+
+    def __init__(self, raw, queue_size=16):
+        self.raw = raw
+        self.chunks = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.chunk = b''
+        self.position = 0
+        self.finished = False
+        self.thread = threading.Thread(target=self.decompress, daemon=True)
+        self.thread.start()
+
+    def readable(self):
+        return True
+
+    # Put an item in the queue, unless the reader is closed while waiting for room
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    # Decompress the file chunk by chunk, with a new decompressor for each member (ignoring zero padding after the last one); the end of the
+    # file is marked by None, and an error is passed on to the reader
+    def decompress(self):
+        try:
+            decompressor = zlib.decompressobj(31)
+            consumed = False
+            data = self.raw.read(READ_SIZE)
+            while data and not self.stopped.is_set():
+                if decompressor.eof:
+                    if not data.strip(b'\x00'):
+                        break
+                    decompressor = zlib.decompressobj(31)
+                consumed = True
+                self.put(decompressor.decompress(data))
+                data = decompressor.unused_data if decompressor.eof else b''
+                if not data:
+                    data = self.raw.read(READ_SIZE)
+            if consumed and not decompressor.eof and not self.stopped.is_set():
+                raise EOFError(f"Compressed file ended before the end-of-stream marker was reached: {self.raw.name}")
+            self.put(None)
+        except Exception as error:
+            self.put(error)
+
+    def readinto(self, buffer):
+        while self.position == len(self.chunk):
+            if self.finished:
+                return 0
+            chunk = self.chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if chunk is None:
+                self.finished = True
+                return 0
+            self.chunk, self.position = chunk, 0
+        size = min(len(buffer), len(self.chunk) - self.position)
+        buffer[:size] = self.chunk[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def close(self):
+        if self.closed:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.raw.close()
+        super().close()
+
+# Open a file, compressed or not by its extension, in a text or binary mode of open() ('r', 'w', 'a', with 'b' for binary); compressed files
+# are written with the given number of threads (default: all available CPUs) and compression level (default: 6 for gzip, 3 for zstd)
+def open_file(path, mode='r', threads=None, level=None, buffering=-1, encoding=None, newline=None):
+    compression = file_compression(path)
+    if compression is None:
+        return open(path, mode, buffering=buffering, encoding=encoding, newline=newline)
+
+    binary_mode = mode.replace('t', '').replace('b', '')
+    if binary_mode not in ('r', 'w', 'a'):
+        raise ValueError(f"Unsupported mode for a compressed file: {mode}")
+    raw = open(path, binary_mode + 'b')
+
+    if compression == 'gzip':
+        stream = ThreadedGzipReader(raw) if binary_mode == 'r' else ParallelGzipWriter(raw, threads, 6 if level is None else level)
+        stream = io.BufferedReader(stream, READ_SIZE) if binary_mode == 'r' else io.BufferedWriter(stream, BLOCK_SIZE)
+    else:
+        zstandard = import_zstandard(path)
+        if binary_mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+            stream = io.BufferedReader(stream, READ_SIZE)
+        else:
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level, threads=threads or default_threads())
+            stream = compressor.stream_writer(raw, closefd=True)
+
+    if 'b' in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+# Read a TSV file, compressed or not, into a DataFrame; pandas_options are passed to pd.read_csv
+def read_tsv(path, **pandas_options):
+    with open_file(path, 'rb') as f:
+        return pd.read_csv(f, sep='\t', **pandas_options)
+
+# Read a TSV file, compressed or not, as DataFrames of at most chunksize rows
+def read_tsv_chunks(path, chunksize, **pandas_options):
+    with open_file(path, 'rb') as f:
+        yield from pd.read_csv(f, sep='\t', chunksize=chunksize, **pandas_options)
+
+# Write a DataFrame to a TSV file, compressed or not (appended to the file with mode='a'); pandas_options are passed to DataFrame.to_csv
+def write_tsv(data, path, mode='w', threads=None, **pandas_options):
+    with open_file(path, mode, threads=threads, newline='') as f:
+        data.to_csv(f, sep='\t', **pandas_options)
@@ -0,0 +1,154 @@
+"""
+Deduplicates the rows of a TSV file on its first two columns (gene and noncodingRNA), keeping the first occurrence of each pair and the
+order of the rows, and reports the number of duplicate rows dropped.
+
+Each (gene, noncodingRNA) pair is keyed by a 128-bit BLAKE2b digest of the two fields separated by a tab, so that every key takes the same
+(small) amount of memory whatever the length of the sequences, and distinct pairs whose concatenations are equal are not merged.
+
+If the keys would take more memory than the given budget, the file is deduplicated in two passes instead: the first pass spills the key and
+row number of every row to partition files on disk (by the first 8 bytes of the key), each partition is deduplicated on its own in memory,
+marking the duplicate rows, and the second pass writes the unmarked rows.
+
+Columnar tables (Feather/Parquet, see table_io.py) are read whole, so they are deduplicated in memory; a TSV file can also be converted to a
+columnar table or back, by the extensions of the input and output files. TSV files can be compressed (.gz or .zst, see compressed_io.py).
+
+Shared by both post-processing analyses (04 and 06), whose bash scripts run it from shared/ at the top of the repository; pipeline.py of
+the biased analysis imports its Deduplicator.
+
+Usage:
+    python dedup.py --ifile <INPUT_TABLE> --ofile <OUTPUT_TABLE> [--memory_budget <MB>] [--partitions <N>] [--tmp_dir <DIR>]
+
+Arguments:
+    --ifile            Input table file (TSV with a header, or Feather/Parquet by extension)
+    --ofile            Output table file, without the duplicate rows (TSV, or Feather/Parquet by extension)
+    --memory_budget    Memory budget in MB for the keys held in memory, beyond which the partitioned mode is used (default: no limit)
+    --partitions       Number of partitions of the partitioned mode (default: 64)
+    --tmp_dir          Directory for the partition files of the partitioned mode (default: the directory of the output file)
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import numpy as np
+from compressed_io import open_file
+from table_io import is_columnar, read_table, write_table
+
+KEY_SIZE = 16
+
+# Approximate memory taken by a key in a Python set (the bytes object and its set slot)
+KEY_MEMORY = 100
+
+# Record of the partitioned mode: the key, as two 64-bit halves, and the row number
+SPILL_RECORD = np.dtype([('high', '<u8'), ('low', '<u8'), ('row', '<i8')])
+
+# Get the key of a (gene, noncodingRNA) pair, given as bytes
+def pair_key(gene, noncoding_rna):
+    return hashlib.blake2b(gene + b'\t' + noncoding_rna, digest_size=KEY_SIZE).digest()
+
+# Get the key of a TSV row (bytes), from its first two fields
+def row_key(line):
+    fields = line.rstrip(b'\r\n').split(b'\t', 2)
+    return pair_key(fields[0], fields[1] if len(fields) > 1 else b'')
+
+# Keeps the keys seen so far, to tell whether a row is the first occurrence of its pair
+class Deduplicator:
+
+    def __init__(self, max_keys=None):
+        self.seen = set()
+        self.max_keys = max_keys
+        self.rows = 0
+        self.dropped = 0
+
+    # Check whether a key is new and record it, or raise MemoryError if the key set would grow beyond max_keys
+    def is_new(self, key):
+        self.rows += 1
+        if key in self.seen:
+            self.dropped += 1
+            return False
+        if self.max_keys is not None and len(self.seen) >= self.max_keys:
+            raise MemoryError(f"More than {self.max_keys} keys")
+        self.seen.add(key)
+        return True
+
+    # Get the mask of the new (gene, noncodingRNA) pairs among the rows of a chunk, given as two sequences of strings
+    def keep_mask(self, genes, noncoding_rnas):
+        return [self.is_new(pair_key(gene.encode(), noncoding_rna.encode())) for gene, noncoding_rna in zip(genes, noncoding_rnas)]
+
+# Deduplicate a file with all keys in memory, and get the number of rows and of dropped rows
+def deduplicate_in_memory(ifile, ofile, max_keys=None):
+    deduplicator = Deduplicator(max_keys)
+    with open_file(ifile, 'rb') as f_in, open_file(ofile, 'wb') as f_out:
+        f_out.write(f_in.readline())
+        for line in f_in:
+            if deduplicator.is_new(row_key(line)):
+                f_out.write(line)
+    return deduplicator.rows, deduplicator.dropped
+
+# Deduplicate a file in two passes, with the keys spilled to partition files, and get the number of rows and of dropped rows
+def deduplicate_partitioned(ifile, ofile, partitions=64, tmp_dir=None):
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as spill_dir:
+
+        # First pass: spill the key and row number of every row to the partition of its key
+        partition_files = [open(os.path.join(spill_dir, f"{idx}.bin"), 'wb') for idx in range(partitions)]
+        rows = 0
+        with open_file(ifile, 'rb') as f_in:
+            f_in.readline()
+            for row, line in enumerate(f_in):
+                key = row_key(line)
+                partition_files[int.from_bytes(key[:8], 'little') % partitions].write(key + row.to_bytes(8, 'little'))
+                rows += 1
+        for partition_file in partition_files:
+            partition_file.close()
+
+        # Mark the duplicate rows of each partition, i.e. all rows of a key but the first one
+        duplicate = np.zeros(rows, dtype=bool)
+        for idx in range(partitions):
+            records = np.fromfile(os.path.join(spill_dir, f"{idx}.bin"), dtype=SPILL_RECORD)
+            records = records[np.lexsort((records['row'], records['low'], records['high']))]
+            repeated = (records['high'][1:] == records['high'][:-1]) & (records['low'][1:] == records['low'][:-1])
+            duplicate[records['row'][1:][repeated]] = True
+
+    # Second pass: write the rows that are not duplicates
+    with open_file(ifile, 'rb') as f_in, open_file(ofile, 'wb') as f_out:
+        f_out.write(f_in.readline())
+        for row, line in enumerate(f_in):
+            if not duplicate[row]:
+                f_out.write(line)
+    return rows, int(duplicate.sum())
+
+# Deduplicate a table file read whole into a DataFrame, and get the number of rows and of dropped rows
+def deduplicate_table(ifile, ofile):
+    data = read_table(ifile)
+    deduplicator = Deduplicator()
+    data = data[deduplicator.keep_mask(data['gene'].fillna('').astype(str), data['noncodingRNA'].fillna('').astype(str))]
+    write_table(data, ofile)
+    return deduplicator.rows, deduplicator.dropped
+
+# Deduplicate a file in memory, or partitioned if the keys exceed the memory budget (in bytes), and get the number of rows and of dropped rows
+def deduplicate(ifile, ofile, memory_budget=None, partitions=64, tmp_dir=None):
+    if is_columnar(ifile) or is_columnar(ofile):
+        return deduplicate_table(ifile, ofile)
+    max_keys = memory_budget // KEY_MEMORY if memory_budget is not None else None
+    try:
+        return deduplicate_in_memory(ifile, ofile, max_keys)
+    except MemoryError:
+        print(f"The keys exceed the memory budget of {memory_budget} bytes. Deduplicating in {partitions} partitions on disk.")
+        return deduplicate_partitioned(ifile, ofile, partitions, tmp_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate a table file on its first two columns (gene and noncodingRNA).")
+    parser.add_argument('--ifile', required=True, help="Input table file (TSV, Feather or Parquet)")
+    parser.add_argument('--ofile', required=True, help="Output table file (TSV, Feather or Parquet)")
+    parser.add_argument('--memory_budget', type=float, default=None, help="Memory budget in MB for the keys held in memory (default: no limit)")
+    parser.add_argument('--partitions', type=int, default=64, help="Number of partitions of the partitioned mode (default: 64)")
+    parser.add_argument('--tmp_dir', type=str, default=None, help="Directory for the partition files (default: the directory of the output file)")
+    args = parser.parse_args()
+
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    tmp_dir = args.tmp_dir or os.path.dirname(os.path.abspath(args.ofile))
+    rows, dropped = deduplicate(args.ifile, args.ofile, memory_budget, args.partitions, tmp_dir)
+    print(f"Dropped {dropped} duplicate rows of {rows} rows.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Splits a dataset into train and test sets and drops the test column, in a single streaming pass: each row is routed to the train or test file
+and written without the test column, which is located by its name in the header (not by its position).
+
+By default, a row goes to the train set if its test column is 'False', and to the test set otherwise, i.e. by the chromosome 1 rule applied
+in filtering.py. Other held-out schemes can be produced from the same dataset, without rerunning the pipeline, with a set of test chromosomes
+(read from the chromosome column), or with a predicate function of the row, given as a dict of column names to values.
+
+Without train/test files, the dataset is only copied without its test column (e.g. for datasets that are used whole as test sets).
+
+Input and output files can be compressed, by a .gz or .zst extension (see compressed_io.py).
+
+Shared by both post-processing analyses (04 and 06), whose bash scripts run it from shared/ at the top of the repository; pipeline.py of
+the biased analysis imports its TrainTestWriter.
+
+Usage:
+    python split_train_test.py --ifile <INPUT_TSV> --train_file <TRAIN_TSV> --test_file <TEST_TSV> [--test_chromosomes <CHR>[,<CHR>...] | --predicate <MODULE>:<FUNCTION>] [--test_column <NAME>] [--chr_column <NAME>]
+    python split_train_test.py --ifile <INPUT_TSV> --ofile <OUTPUT_TSV> [--test_column <NAME>]
+
+Arguments:
+    --ifile               Input dataset (TSV)
+    --train_file          Output train set, without the test column (TSV)
+    --test_file           Output test set, without the test column (TSV)
+    --ofile               Output dataset without the test column, instead of a train/test split (TSV)
+    --test_chromosomes    Comma-separated chromosomes of the test set, instead of the test column values (e.g. 1 or 1,8)
+    --predicate           Function returning whether a row (a dict of column names to values) is in the test set, as MODULE:FUNCTION,
+                          with MODULE importable from the working directory, instead of the test column values
+    --test_column         Name of the test column, which is dropped (default: test)
+    --chr_column          Name of the chromosome column, for --test_chromosomes (default: chr)
+    --write_buffer_size   Buffer size in bytes of each output file writer (default: 1048576)
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from compressed_io import open_file
+
+# Get the function telling whether a row (its list of fields) is in the test set: by its test column ('False' for train), by its chromosome
+# if test chromosomes are given, or by a predicate of the row as a dict of column names to values
+def get_test_rule(header_columns, test_column='test', test_chromosomes=None, predicate=None, chr_column='chr'):
+    if predicate is not None:
+        return lambda fields: bool(predicate(dict(zip(header_columns, fields))))
+    if test_chromosomes is not None:
+        chr_index = header_columns.index(chr_column)
+        test_chromosomes = set(test_chromosomes)
+        return lambda fields: fields[chr_index] in test_chromosomes
+    test_index = header_columns.index(test_column)
+    return lambda fields: fields[test_index] != 'False'
+
+# Writes rows (TSV lines) to a train file or a test file, by a test rule (see get_test_rule), without the test column
+class TrainTestWriter:
+
+    # With mode 'a', the rows are appended to the train and test files (e.g. of a resumed run), which already have their header
+    def __init__(self, train_file, test_file, header_columns, test_column='test', is_test=None, buffering=-1, mode='w'):
+        self.is_test = is_test or get_test_rule(header_columns, test_column)
+        self.test_index = header_columns.index(test_column) if test_column in header_columns else None
+        self.train_file = open_file(train_file, mode, buffering=buffering)
+        self.test_file = open_file(test_file, mode, buffering=buffering)
+        if mode == 'w':
+            header = self.drop_test_column(list(header_columns))
+            self.train_file.write(header)
+            self.test_file.write(header)
+
+    # Get a line from its fields, without the test column
+    def drop_test_column(self, fields):
+        if self.test_index is not None:
+            del fields[self.test_index]
+        return '\t'.join(fields) + '\n'
+
+    # Route each line of the text (one row per line) to the train or test file
+    def write(self, text):
+        for line in text.split('\n')[:-1] if text.endswith('\n') else text.split('\n'):
+            fields = line.split('\t')
+            target = self.test_file if self.is_test(fields) else self.train_file
+            target.write(self.drop_test_column(fields))
+
+    def close(self):
+        self.train_file.close()
+        self.test_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Writes rows (TSV lines) to a single file, without the test column
+class DropTestColumnWriter(TrainTestWriter):
+
+    def __init__(self, ofile, header_columns, test_column='test', buffering=-1):
+        self.is_test = lambda fields: False
+        self.test_index = header_columns.index(test_column) if test_column in header_columns else None
+        self.train_file = self.test_file = open_file(ofile, 'w', buffering=buffering)
+        self.train_file.write(self.drop_test_column(list(header_columns)))
+
+    def close(self):
+        self.train_file.close()
+
+# Import a predicate function given as MODULE:FUNCTION, from a module importable from the working directory
+def import_predicate(spec):
+    module_name, _, function_name = spec.partition(':')
+    if not function_name:
+        raise ValueError(f"The predicate must be given as MODULE:FUNCTION, not {spec}")
+    sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(module_name), function_name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a dataset into train and test sets and drop the test column, in one pass.")
+    parser.add_argument('--ifile', required=True, help="Input dataset (TSV)")
+    parser.add_argument('--train_file', help="Output train set (TSV)")
+    parser.add_argument('--test_file', help="Output test set (TSV)")
+    parser.add_argument('--ofile', help="Output dataset without the test column, instead of a train/test split (TSV)")
+    parser.add_argument('--test_chromosomes', help="Comma-separated chromosomes of the test set, instead of the test column values")
+    parser.add_argument('--predicate', help="Test set predicate of a row, as MODULE:FUNCTION, instead of the test column values")
+    parser.add_argument('--test_column', default='test', help="Name of the test column, which is dropped (default: test)")
+    parser.add_argument('--chr_column', default='chr', help="Name of the chromosome column, for --test_chromosomes (default: chr)")
+    parser.add_argument('--write_buffer_size', type=int, default=1024 * 1024, help="Buffer size in bytes of each output file writer (default: 1 MiB)")
+    args = parser.parse_args()
+
+    if args.ofile is None and (args.train_file is None or args.test_file is None):
+        parser.error("either --train_file and --test_file, or --ofile, are required")
+    if args.test_chromosomes and args.predicate:
+        parser.error("--test_chromosomes and --predicate are mutually exclusive")
+
+    with open_file(args.ifile, 'r') as f_in:
+        header_columns = f_in.readline().rstrip('\r\n').split('\t')
+
+        if args.ofile is not None:
+            writer = DropTestColumnWriter(args.ofile, header_columns, args.test_column, args.write_buffer_size)
+        else:
+            test_chromosomes = args.test_chromosomes.split(',') if args.test_chromosomes else None
+            predicate = import_predicate(args.predicate) if args.predicate else None
+            is_test = get_test_rule(header_columns, args.test_column, test_chromosomes, predicate, args.chr_column)
+            writer = TrainTestWriter(args.train_file, args.test_file, header_columns, args.test_column, is_test, args.write_buffer_size)
+
+        with writer:
+            for line in f_in:
+                writer.write(line)
+
+    if args.ofile is not None:
+        print(f"Dataset without the {args.test_column} column saved to {args.ofile}")
+    else:
+        print(f"Train set saved to {args.train_file}, test set saved to {args.test_file}")
+
+if __name__ == "__main__":
+    main()
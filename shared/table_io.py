@@ -0,0 +1,179 @@
+"""
+Reading and writing of the tables passed between post-processing steps, either as TSV or in a columnar format (Arrow/Feather or Parquet),
+chosen by the file extension: .feather or .arrow for Feather, .parquet for Parquet, and TSV for any other extension.
+
+Columnar files keep the column types, so they are not re-inferred on every read, and store string columns dictionary-encoded, so that the
+values repeated across rows (miRNA sequences and families, features, chromosomes, ...) are stored once per file. Dictionary-encoded columns
+are decoded back to plain strings on read, with missing values as NaN, so a table read from a columnar file behaves as one read from TSV.
+
+TSV files can also be compressed, by a .gz or .zst extension after that of the table (e.g. data.tsv.gz), and are then read and written through
+compressed_io.py, with the compression of written files done in parallel.
+
+pyarrow is only needed, and only imported, for columnar files. TSV stays the format of the final datasets.
+
+Shared by the post-processing scripts, which import it from shared/ at the top of the repository, added to the PYTHONPATH by the master
+and bash scripts of each analysis.
+"""
+
+from contextlib import contextmanager
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from compressed_io import file_compression, strip_compression, open_file, read_tsv, read_tsv_chunks, write_tsv
+
+COLUMNAR_FORMATS = {'.feather': 'feather', '.arrow': 'feather', '.parquet': 'parquet'}
+
+# Get the format of a table file from its extension, before any compression extension: 'feather', 'parquet' or 'tsv'
+def table_format(path):
+    return COLUMNAR_FORMATS.get(os.path.splitext(strip_compression(path))[1].lower(), 'tsv')
+
+def is_columnar(path):
+    return table_format(path) != 'tsv'
+
+# Import pyarrow, which is only required for columnar files
+def import_pyarrow(path):
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(f"pyarrow is required to read or write the columnar file {path}; install it, or use TSV files") from None
+    return pyarrow
+
+# Convert a DataFrame to an Arrow table, with dictionary-encoded string columns; object columns of mixed types (e.g. chromosomes read from
+# TSV as both numbers and strings) are stored as strings, as they would be written to TSV
+def to_arrow(pa, data):
+    data = data.copy(deep=False)
+    for column in data.columns:
+        if data[column].dtype == object:
+            try:
+                pa.array(data[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                data[column] = data[column].map(lambda value: value if pd.isna(value) else str(value))
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    for idx, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(idx, field.name, pa.compute.dictionary_encode(table.column(idx)))
+    return table
+
+# Convert an Arrow table to a DataFrame, with the dictionary-encoded columns decoded to strings, and missing strings as NaN
+def from_arrow(pa, table):
+    for idx, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(idx, field.name, table.column(idx).cast(field.type.value_type))
+    data = table.to_pandas()
+    for column in data.columns:
+        if data[column].dtype == object:
+            data[column] = data[column].where(data[column].notna(), np.nan)
+    return data
+
+# Read an Arrow table from a columnar file, with only the given columns if any
+def read_arrow(pa, path, columns=None):
+    if table_format(path) == 'feather':
+        return pa.feather.read_table(path, columns=columns, memory_map=True)
+    return pa.parquet.read_table(path, columns=columns)
+
+# Get the column names of a table file, without reading its rows
+def table_columns(path):
+    if not is_columnar(path):
+        with open_file(path) as f:
+            return f.readline().rstrip('\r\n').split('\t')
+    pa = import_pyarrow(path)
+    if table_format(path) == 'feather':
+        return pa.ipc.open_file(pa.memory_map(path)).schema.names
+    return pa.parquet.read_schema(path).names
+
+# Read a table file into a DataFrame, with only the given columns if any; csv_options (e.g. dtype=str) only apply to TSV files
+def read_table(path, columns=None, **csv_options):
+    if not is_columnar(path):
+        return read_tsv(path, usecols=columns, **csv_options)
+    pa = import_pyarrow(path)
+    return from_arrow(pa, read_arrow(pa, path, columns))
+
+# Read a table file as DataFrames of at most chunksize rows; a columnar file with no rows gives a single empty DataFrame, with its columns
+def read_table_chunks(path, chunksize, columns=None, **csv_options):
+    if not is_columnar(path):
+        yield from read_tsv_chunks(path, chunksize, usecols=columns, **csv_options)
+        return
+    pa = import_pyarrow(path)
+    table = read_arrow(pa, path, columns)
+    for start in range(0, max(table.num_rows, 1), chunksize):
+        yield from_arrow(pa, table.slice(start, chunksize))
+
+# Write a DataFrame to a table file
+def write_table(data, path):
+    file_format = table_format(path)
+    if file_format == 'tsv':
+        write_tsv(data, path, index=False)
+        return
+    pa = import_pyarrow(path)
+    if file_format == 'feather':
+        pa.feather.write_feather(to_arrow(pa, data), path)
+    else:
+        pa.parquet.write_table(to_arrow(pa, data), path)
+
+# Writes DataFrames (e.g. processed chunks) one after the other to a table file; TSV files (compressed or not) are written to as they come,
+# while columnar files keep the (dictionary-encoded) chunks in memory and are written once, on close, with a dictionary shared by all chunks
+class TableWriter:
+
+    def __init__(self, path):
+        self.path = path
+        self.n_chunks = 0
+        self.file = None
+        self.tables = [] if is_columnar(path) else None
+        self.pa = import_pyarrow(path) if is_columnar(path) else None
+
+    def write(self, data):
+        if self.tables is None:
+            if self.file is None:
+                self.file = open_file(self.path, 'w', newline='')
+            data.to_csv(self.file, sep='\t', index=False, header=self.n_chunks == 0)
+        else:
+            self.tables.append(to_arrow(self.pa, data))
+        self.n_chunks += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if not self.tables:
+            return
+        table = self.pa.concat_tables(self.tables, promote_options='default').unify_dictionaries().combine_chunks()
+        if table_format(self.path) == 'feather':
+            self.pa.feather.write_feather(table, self.path)
+        else:
+            self.pa.parquet.write_table(table, self.path)
+        self.tables = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        elif self.file is not None:
+            self.file.close()
+
+# Get the path of an uncompressed TSV file with the rows of a table file, for steps that read the rows of a TSV file directly (e.g. by byte
+# offset): the file itself if it is an uncompressed TSV file, or else a temporary TSV export (or decompressed copy) of it in tmp_dir, removed on exit
+@contextmanager
+def tsv_file(path, tmp_dir=None, chunksize=100000):
+    if not is_columnar(path) and file_compression(path) is None:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile('w', dir=tmp_dir, prefix=f"{os.path.basename(path)}.", suffix='.tsv', delete=False) as f:
+        tsv_path = f.name
+        if not is_columnar(path):
+            with open_file(path, 'rb') as f_in:
+                shutil.copyfileobj(f_in, f.buffer)
+        else:
+            for chunk_no, chunk in enumerate(read_table_chunks(path, chunksize)):
+                chunk.to_csv(f, sep='\t', index=False, header=chunk_no == 0)
+    try:
+        yield tsv_path
+    finally:
+        os.remove(tsv_path)